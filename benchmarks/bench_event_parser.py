@@ -0,0 +1,115 @@
+"""
+Микробенчмарк разбора событий: исходная реализация parse_event
+(последовательный перебор re.search по исходным шаблонам) против
+IntentMatcher с отсевом шаблонов по обязательным подстрокам. Измеряется
+parse_event целиком, вместе с записью метрики этапа intent.
+
+Команды и вопросы без команд (самый частый случай) измеряются отдельно.
+Бенчмарк завершается с ошибкой, если IntentMatcher не быстрее исходной
+реализации хотя бы в одной из групп.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_event_parser
+"""
+import re
+import sys
+import timeit
+
+from service.nlp.event_parser import parse_event
+
+# Шаблоны и parse_event до появления IntentMatcher
+BASELINE_PATTERNS = {
+    "NEXT_STEP": [
+        r"(след(ующий|ующую|лежащую команду|шаг))",
+        r"(давай следующий шаг)",
+        r"(какой следующий шаг)",
+        r"(переходи к следующему этапу)",
+    ],
+    "PREV_STEP": [
+        r"(пред(ыдущий|ущий шаг))",
+        r"(вернись к предыдущему шагу)",
+    ],
+    "STOP_TIMER": [
+        r"(останови|выключи)\s+(таймер|отсчет)",
+    ],
+    "CONTINUE_TIMER": [
+        r"(продолжи|включи)\s+(таймер|отсчет)",
+    ],
+    "ADD_TIME": [
+        r"(добавь|прибавь|увеличь)(таймер|время)\s+(\d+)\s?(минут|секунд|часов)",
+    ],
+}
+
+
+def parse_event_baseline(text):
+    text = text.lower()
+
+    for event_name, patterns in BASELINE_PATTERNS.items():
+        for pattern in patterns:
+            match = re.search(pattern, text)
+            if match:
+                if event_name == "ADD_TIME":
+                    try:
+                        time_value = int(match.group(2))
+                        time_unit = match.group(3)
+                        return event_name, {"value": time_value,
+                                            "unit": time_unit}
+                    except (IndexError, ValueError):
+                        pass
+                return event_name, None
+    return None, None
+
+
+# Команда -> ожидаемый результат parse_event
+COMMANDS = {
+    "какой следующий шаг": ("NEXT_STEP", None),
+    "вернись к предыдущему шагу": ("PREV_STEP", None),
+    "останови таймер": ("STOP_TIMER", None),
+    "включи таймер": ("CONTINUE_TIMER", None),
+    "добавь время 5 минут": ("ADD_TIME", {"value": 5, "unit": "минут"}),
+    "добавь 2 часов": ("ADD_TIME", {"value": 2, "unit": "часов"}),
+}
+QUESTIONS = [
+    "сколько сахара нужно положить",
+    "при какой температуре выпекать тесто",
+    "сколько яиц надо взять",
+    "как долго варить рис на медленном огне",
+]
+
+
+def measure(func, texts, number):
+    seconds = timeit.timeit(lambda: [func(text) for text in texts], number=number)
+    return seconds / (number * len(texts)) * 1e6
+
+
+def main(number=3000, repeat=5):
+    for command, expected in COMMANDS.items():
+        assert parse_event(command) == expected, command
+        # Исходная реализация распознает то же событие (слоты ADD_TIME она
+        # не извлекала)
+        assert parse_event_baseline(command)[0] in (expected[0], None), command
+    for question in QUESTIONS:
+        assert parse_event(question) == (None, None), question
+        assert parse_event_baseline(question) == (None, None), question
+
+    slower = []
+    for group, texts in (("команды", list(COMMANDS)), ("вопросы", QUESTIONS)):
+        # Замеры чередуются, чтобы фоновая нагрузка влияла на обе
+        # реализации одинаково
+        baseline = matcher = float("inf")
+        for _ in range(repeat):
+            baseline = min(baseline, measure(parse_event_baseline, texts, number))
+            matcher = min(matcher, measure(parse_event, texts, number))
+        print(
+            f"{group:>8}: исходный re.search {baseline:.2f} мкс, "
+            f"IntentMatcher {matcher:.2f} мкс (x{baseline / matcher:.1f})"
+        )
+        if matcher >= baseline:
+            slower.append(group)
+
+    if slower:
+        sys.exit(f"IntentMatcher не быстрее исходной реализации: {', '.join(slower)}")
+
+
+if __name__ == "__main__":
+    main()
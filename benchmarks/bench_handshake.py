@@ -0,0 +1,123 @@
+"""
+Бенчмарк пропускной способности рукопожатий websocket с проверкой JWT:
+без аутентификации, с аутентификацией и кэшем проверенных токенов (клиенты
+переподключаются с одним токеном) и с аутентификацией без кэша. Сервер
+запускается в том же процессе с тем же process_request, что и Server, и
+закрывает соединение сразу после рукопожатия и получения claims;
+отклоненные рукопожатия тоже измеряются (неверный токен).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_handshake --handshakes 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+
+import jwt
+import websockets
+
+from jwt_utils import HandshakeAuthenticator, JWTVerifier
+
+SECRET = "voicestream-handshake-benchmark-secret"
+
+
+def make_handler(authenticator):
+    async def handler(websocket):
+        if authenticator is not None:
+            # Как Server.handle_websocket: claims соединения берутся из кэша
+            authenticator.claims(websocket)
+        await websocket.close()
+
+    return handler
+
+
+async def run_clients(uri, handshakes, concurrency, expect_accept):
+    counter = iter(range(handshakes))
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for _ in counter:
+            try:
+                async with websockets.connect(uri) as websocket:
+                    await websocket.wait_closed()
+                accepted = True
+            except websockets.InvalidStatusCode:
+                accepted = False
+            if accepted != expect_accept:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, failures
+
+
+async def bench(name, authenticator, query, args, expect_accept=True):
+    process_request = authenticator.process_request if authenticator else None
+    async with websockets.serve(
+        make_handler(authenticator),
+        "127.0.0.1",
+        0,
+        process_request=process_request,
+    ) as server:
+        port = server.sockets[0].getsockname()[1]
+        uri = f"ws://127.0.0.1:{port}/{query}"
+        # Прогрев: соединения, импорт, первая проверка токена
+        await run_clients(uri, args.concurrency, args.concurrency, expect_accept)
+        seconds, failures = await run_clients(
+            uri, args.handshakes, args.concurrency, expect_accept
+        )
+    line = (
+        f"{name:>24}: {args.handshakes / seconds:8.0f} рукопожатий/с"
+        f" ({seconds / args.handshakes * 1e3:.2f} мс)"
+    )
+    if authenticator is not None:
+        verifier = authenticator.verifier
+        line += f", кэш: {verifier.hits} попаданий / {verifier.misses} промахов"
+    if failures:
+        line += f", неожиданных результатов: {failures}"
+    print(line)
+
+
+async def main_async(args):
+    token = jwt.encode(
+        {"sub": "bench", "exp": int(time.time()) + 3600}, SECRET, "HS256"
+    )
+    await bench("без аутентификации", None, "", args)
+    await bench(
+        "JWT, кэш",
+        HandshakeAuthenticator(JWTVerifier(SECRET, cache_size=1024)),
+        f"?token={token}",
+        args,
+    )
+    await bench(
+        "JWT, без кэша",
+        HandshakeAuthenticator(JWTVerifier(SECRET, cache_size=0)),
+        f"?token={token}",
+        args,
+    )
+    await bench(
+        "JWT, неверный токен",
+        HandshakeAuthenticator(JWTVerifier(SECRET)),
+        f"?token={token[:-2]}xx",
+        args,
+        expect_accept=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure websocket handshake throughput with JWT "
+        "authentication"
+    )
+    parser.add_argument(
+        "--handshakes", type=int, default=2000, help="Handshakes per scenario"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=32, help="Concurrent clients"
+    )
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Сравнение бэкендов модели QA по точности и задержке на фиксированном наборе
+вопросов.
+
+Эталон - исходная модель fp32 (бэкенд torch). Для каждого бэкенда
+считаются совпадение ответа с эталоном (exact match), F1 по словам с
+эталоном и с ожидаемым ответом, а также задержка одного вопроса.
+
+Вопросы проходят тот же путь, что и на сервере: шаги рецепта находятся
+RecipeStore.retrieve, ответ вычисляет QAService.answer (собственная
+сборка входа из токенов шагов и один проход модели). Кэш ответов
+очищается перед каждым замером, поэтому каждый вопрос запускает модель.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_qa_backends \\
+        --candidate int8=./models/mdeberta-v3-base-squad2-int8 \\
+        --candidate onnx=./models/mdeberta-v3-base-squad2-onnx
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from collections import Counter
+
+from service.nlp.qa_service import QAService
+from service.nlp.qa_system import qa_pipeline
+from service.nlp.recipe_store import RecipeStore
+
+# (вопрос, ожидаемый ответ) по рецепту по умолчанию RecipeStore
+QUESTIONS = [
+    ("сколько сахара", "1 стакан"),
+    ("сколько муки нужно", "2 стакана"),
+    ("сколько яиц", "2"),
+    ("сколько молока", "1 стакан"),
+    ("сколько разрыхлителя", "1 чайную ложку"),
+    ("при какой температуре выпекать", "180 градусов Цельсия"),
+    ("сколько минут выпекать", "30 минут"),
+    ("где смешать муку", "в большой миске"),
+    ("куда вылить тесто", "в форму для выпекания"),
+    ("что добавить к муке", "молоко и яйца"),
+]
+
+
+def token_f1(prediction, reference):
+    prediction_tokens = prediction.lower().split()
+    reference_tokens = reference.lower().split()
+    common = sum(
+        (Counter(prediction_tokens) & Counter(reference_tokens)).values()
+    )
+    if common == 0:
+        return 0.0
+    precision = common / len(prediction_tokens)
+    recall = common / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+async def run_backend(backend, directory, store, repeats):
+    # Пайплайн процесса загружается заново с выбранным бэкендом
+    os.environ["QA_BACKEND"] = backend
+    os.environ["QA_MODEL_DIR"] = directory
+    qa_pipeline.reset()
+    service = QAService()
+    service.clear()
+
+    contexts = [store.retrieve(question) for question, _ in QUESTIONS]
+    await service.answer(contexts[0], QUESTIONS[0][0])  # прогрев
+
+    answers = []
+    latencies = []
+    for (question, _), steps in zip(QUESTIONS, contexts):
+        for _ in range(repeats):
+            service.answers.clear()
+            started = time.perf_counter()
+            answer = await service.answer(steps, question)
+            latencies.append((time.perf_counter() - started) * 1000)
+        answers.append(answer.strip())
+    latencies.sort()
+    return answers, {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare question-answering backends"
+    )
+    parser.add_argument(
+        "--model-dir",
+        default="./models/mdeberta-v3-base-squad2",
+        help="Directory of the reference fp32 model",
+    )
+    parser.add_argument(
+        "--candidate",
+        action="append",
+        default=[],
+        help="Backend to compare as BACKEND=DIR (int8 or onnx)",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="Runs of every question"
+    )
+    parser.add_argument(
+        "--recipes-dir",
+        default=None,
+        help="Recipe directory (default: the built-in recipe, which the "
+        "expected answers refer to)",
+    )
+    parser.add_argument(
+        "--qa-context-steps",
+        type=int,
+        default=2,
+        help="Retrieved steps per question, as on the server",
+    )
+    parser.add_argument("--output", help="Write the report as JSON here")
+    args = parser.parse_args()
+
+    backends = [("torch", args.model_dir)]
+    backends += [tuple(c.split("=", 1)) for c in args.candidate]
+
+    store = RecipeStore.from_directory(args.recipes_dir, args.qa_context_steps)
+    report = {}
+    reference = None
+    for backend, directory in backends:
+        answers, latency = asyncio.run(
+            run_backend(backend, directory, store, args.repeats)
+        )
+        if reference is None:
+            reference = answers
+        report[backend] = {
+            **latency,
+            "exact_match_vs_fp32": statistics.mean(
+                a == r for a, r in zip(answers, reference)
+            ),
+            "f1_vs_fp32": statistics.mean(
+                token_f1(a, r) for a, r in zip(answers, reference)
+            ),
+            "f1_vs_expected": statistics.mean(
+                token_f1(a, expected)
+                for a, (_, expected) in zip(answers, QUESTIONS)
+            ),
+            "answers": answers,
+        }
+        print(
+            f"{backend:>6}: {latency['mean_ms']:.1f} мс (p95 "
+            f"{latency['p95_ms']:.1f}), EM с fp32 "
+            f"{report[backend]['exact_match_vs_fp32']:.2f}, F1 с ожидаемым "
+            f"{report[backend]['f1_vs_expected']:.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Нагрузочный тест сервера: N одновременных сессий websocket, каждая из
+которых воспроизводит WAV-файлы в реальном времени (или в k раз быстрее)
+теми же порциями, что и браузерный клиент (test/client-test): AudioWorklet
+отдает по 128 фреймов на частоте AudioContext, после понижения частоты до
+16 кГц это около 43 сэмплов int16 на сообщение при 48 кГц.
+
+Каждый WAV-файл считается одним высказыванием. Конфигурация по умолчанию
+выбирает стратегию vosk_asr_vad_v1, поэтому высказывание должно начинаться
+с ключевого слова активации, за которым следует команда или вопрос.
+Ответом на высказывание считается первое сообщение с событием, ответом QA,
+распознанным текстом или ошибкой (например, "No system call detected.");
+ответы-ошибки учитываются отдельно. Отчет содержит задержку от конца
+высказывания до ответа, коэффициент реального времени, число неудачных
+сессий, высказываний без ответа и ответов-ошибок, а также загрузку CPU и
+RSS процессов сервера (при заданном --server-pid).
+
+Запуск из корня репозитория на работающем сервере:
+    python -m benchmarks.load_test --sessions 8 --wav test-16khz.wav \\
+        --server-pid $(pgrep -f main.py | head -1) --output report.json
+    python -m benchmarks.load_test ... --baseline report.json
+
+С аутентификацией на сервере токен передается через --token.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import subprocess
+import time
+import wave
+
+import websockets
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# Размер блока AudioWorklet (render quantum) в фреймах
+RENDER_QUANTUM = 128
+
+
+def load_wav(path):
+    """
+    Читает WAV-файл в формате сервера (моно, 16-bit, 16 кГц).
+    """
+    with wave.open(path, "rb") as wf:
+        if (
+            wf.getnchannels() != 1
+            or wf.getsampwidth() != SAMPLE_WIDTH
+            or wf.getframerate() != SAMPLE_RATE
+        ):
+            raise ValueError(
+                f"{path}: WAV-файл должен быть моно, 16-bit, 16 kHz"
+            )
+        return wf.readframes(wf.getnframes())
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.mean(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+class SessionResult:
+    def __init__(self, index):
+        self.index = index
+        self.failed = None
+        self.latencies = []
+        self.dropped_utterances = 0
+        self.audio_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.messages = 0
+        self.partials = 0
+        self.error_replies = 0
+
+
+async def run_session(index, args, utterances, config):
+    """
+    Воспроизводит высказывания в одной сессии и измеряет задержки.
+    """
+    result = SessionResult(index)
+    frame_bytes = args.frame_samples * SAMPLE_WIDTH
+    silence = bytes(int(args.gap_seconds * SAMPLE_RATE) * SAMPLE_WIDTH)
+    # Время окончания каждого высказывания и событие его результата
+    utterance_ends = []
+    answered = []
+
+    async def receive(websocket):
+        async for message in websocket:
+            now = time.perf_counter()
+            result.messages += 1
+            data = json.loads(message)
+            if data.get("type") == "partial":
+                result.partials += 1
+                continue
+            if data.get("type") in ("final", "skipped"):
+                # Итоговый текст vosk_asr_vad_v1 предшествует ответу на
+                # высказывание, пропуск аудио ответом не является
+                continue
+            if "error" in data:
+                result.error_replies += 1
+            # Первый ответ после конца высказывания
+            for number, ended_at in enumerate(utterance_ends):
+                if not answered[number].is_set():
+                    result.latencies.append(now - ended_at)
+                    answered[number].set()
+                    break
+
+    await asyncio.sleep(index * args.ramp_seconds / max(1, args.sessions))
+    try:
+        extra_headers = (
+            {"Authorization": f"Bearer {args.token}"} if args.token else None
+        )
+        async with websockets.connect(
+            args.url, max_size=None, extra_headers=extra_headers
+        ) as websocket:
+            await websocket.send(json.dumps({"type": "config", "data": config}))
+            receiver = asyncio.create_task(receive(websocket))
+
+            started = time.perf_counter()
+            sent_samples = 0
+            for repeat in range(args.repeat):
+                for audio in utterances:
+                    for stream, is_speech in ((audio, True), (silence, False)):
+                        for offset in range(0, len(stream), frame_bytes):
+                            frame = stream[offset:offset + frame_bytes]
+                            await websocket.send(frame)
+                            sent_samples += len(frame) // SAMPLE_WIDTH
+                            # Темп воспроизведения по абсолютному времени
+                            delay = (
+                                started
+                                + sent_samples / (SAMPLE_RATE * args.speed)
+                                - time.perf_counter()
+                            )
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                        if is_speech:
+                            utterance_ends.append(time.perf_counter())
+                            answered.append(asyncio.Event())
+
+            result.audio_seconds = sent_samples / SAMPLE_RATE
+            deadline = time.perf_counter() + args.result_timeout
+            for event in answered:
+                remaining = deadline - time.perf_counter()
+                try:
+                    await asyncio.wait_for(event.wait(), max(0.0, remaining))
+                except asyncio.TimeoutError:
+                    result.dropped_utterances += 1
+            result.wall_seconds = time.perf_counter() - started
+            receiver.cancel()
+    except (OSError, websockets.WebSocketException) as e:
+        result.failed = f"{type(e).__name__}: {e}"
+        result.dropped_utterances += sum(
+            1 for event in answered if not event.is_set()
+        )
+    return result
+
+
+class ProcessSampler:
+    """
+    Периодически снимает CPU и RSS процессов сервера и их потомков
+    (рабочих процессов) из /proc.
+    """
+
+    def __init__(self, pids, interval=0.5):
+        self.pids = pids
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_mb = []
+        self.ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def _tree(self):
+        children = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry))
+        pids, stack = set(), list(self.pids)
+        while stack:
+            pid = stack.pop()
+            if pid not in pids:
+                pids.add(pid)
+                stack.extend(children.get(pid, []))
+        return pids
+
+    def _snapshot(self):
+        cpu_ticks, rss_pages = 0, 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])
+                rss_pages += int(fields[21])
+            except (OSError, IndexError, ValueError):
+                continue
+        return cpu_ticks, rss_pages
+
+    async def run(self):
+        previous_ticks, _ = self._snapshot()
+        previous_time = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.interval)
+            ticks, pages = self._snapshot()
+            now = time.perf_counter()
+            self.cpu_percent.append(
+                100.0 * (ticks - previous_ticks) / self.ticks
+                / (now - previous_time)
+            )
+            self.rss_mb.append(pages * self.page_size / 2 ** 20)
+            previous_ticks, previous_time = ticks, now
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(report, baseline):
+    """
+    Печатает изменение основных метрик относительно прошлого отчета.
+    """
+    rows = [
+        ("latency p50, s", ("latency_seconds", "p50")),
+        ("latency p95, s", ("latency_seconds", "p95")),
+        ("real-time factor p95", ("real_time_factor", "p95")),
+        ("cpu mean, %", ("cpu_percent", "mean")),
+        ("rss max, MB", ("rss_mb", "max")),
+        ("failed sessions", ("failed_sessions",)),
+        ("dropped utterances", ("dropped_utterances",)),
+        ("error replies", ("error_replies",)),
+    ]
+    print(f"\nСравнение с {baseline.get('revision')}:")
+    for name, path in rows:
+        old, new = baseline, report
+        for key in path:
+            old = old.get(key) if isinstance(old, dict) else None
+            new = new.get(key) if isinstance(new, dict) else None
+        if old is None or new is None:
+            continue
+        change = f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+        print(f"  {name:<24} {old:10.3f} -> {new:10.3f}{change}")
+
+
+async def main_async(args):
+    utterances = [load_wav(path) for path in args.wav]
+    config = json.loads(args.config)
+
+    sampler = None
+    sampler_task = None
+    if args.server_pid:
+        sampler = ProcessSampler(args.server_pid)
+        sampler_task = asyncio.create_task(sampler.run())
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_session(index, args, utterances, config)
+        for index in range(args.sessions)
+    ])
+    elapsed = time.perf_counter() - started
+    if sampler_task is not None:
+        sampler_task.cancel()
+
+    latencies = [latency for r in results for latency in r.latencies]
+    completed = [r for r in results if r.failed is None and r.audio_seconds]
+    report = {
+        "revision": git_revision(),
+        "url": args.url,
+        "sessions": args.sessions,
+        "speed": args.speed,
+        "frame_samples": args.frame_samples,
+        "config": config,
+        "elapsed_seconds": elapsed,
+        "audio_seconds": sum(r.audio_seconds for r in results),
+        "latency_seconds": percentiles(latencies),
+        # Время сессии (до последнего ответа) к длительности аудио; при
+        # воспроизведении в реальном времени не меньше 1 / speed
+        "real_time_factor": percentiles(
+            [r.wall_seconds / r.audio_seconds for r in completed]
+        ),
+        "failed_sessions": sum(1 for r in results if r.failed),
+        "failures": [r.failed for r in results if r.failed],
+        "dropped_utterances": sum(r.dropped_utterances for r in results),
+        "error_replies": sum(r.error_replies for r in results),
+        "partial_messages": sum(r.partials for r in results),
+        "cpu_percent": percentiles(sampler.cpu_percent) if sampler else None,
+        "rss_mb": percentiles(sampler.rss_mb) if sampler else None,
+    }
+
+    print(json.dumps(
+        {key: value for key, value in report.items() if key != "failures"},
+        indent=2, ensure_ascii=False,
+    ))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concurrent websocket streaming load test"
+    )
+    parser.add_argument("--url", default="ws://127.0.0.1:8765")
+    parser.add_argument("--token", default=os.environ.get("JWT_TOKEN"),
+                        help="JWT sent as 'Authorization: Bearer' when the "
+                        "server requires authentication (default: the "
+                        "JWT_TOKEN environment variable)")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="Number of concurrent sessions")
+    parser.add_argument("--wav", nargs="+", required=True,
+                        help="Mono 16-bit 16 kHz WAV files, one utterance "
+                        "each, replayed in order by every session; with the "
+                        "default config every utterance starts with an "
+                        "activation keyword")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Times every session replays the WAV files")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed relative to real time")
+    parser.add_argument("--context-rate", type=int, default=48000,
+                        help="AudioContext sample rate of the emulated "
+                        "browser; sets the frame size")
+    parser.add_argument("--frame-samples", type=int, default=None,
+                        help="Samples per websocket message (default: one "
+                        "AudioWorklet render quantum after downsampling)")
+    parser.add_argument("--gap-seconds", type=float, default=1.0,
+                        help="Silence sent after every utterance")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0,
+                        help="Spread session starts over this time")
+    parser.add_argument("--result-timeout", type=float, default=30.0,
+                        help="Seconds to wait for results after the audio")
+    parser.add_argument(
+        "--config",
+        default=json.dumps({
+            "language": None,
+            "processing_strategy": "vosk_asr_vad_v1",
+            "processing_args": {
+                "chunk_length_seconds": 5,
+                "chunk_offset_seconds": 0.1,
+            },
+        }),
+        help="JSON of the config message data sent by every session",
+    )
+    parser.add_argument("--server-pid", type=int, nargs="*", default=[],
+                        help="Server process ids to sample CPU and RSS "
+                        "(child processes are included)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline",
+                        help="Previous JSON report to compare against")
+    args = parser.parse_args()
+    if args.frame_samples is None:
+        args.frame_samples = math.ceil(
+            RENDER_QUANTUM * SAMPLE_RATE / args.context_rate
+        )
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
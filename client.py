@@ -1,8 +1,13 @@
 # isort: skip_file
 
+import time
+
 from service.buffering_strategy.buffering_strategy_factory import (
     BufferingStrategyFactory,
 )
+from utils.audio_codecs import PCM_S16LE, get_decoder
+from utils.resampler import INT16, AudioFormatConverter
+from utils.ring_buffer import AudioRingBuffer
 
 
 class Client:
@@ -15,23 +20,69 @@ class Client:
 
     Атрибуты:
         client_id (str): Уникальный идентификатор клиента.
-        buffer (bytearray): Буфер для хранения входящих аудиоданных.
+        buffer (AudioRingBuffer): Кольцевой буфер фиксированной емкости для
+                                  входящих сэмплов int16.
         config (dict): Настройки конфигурации клиента, такие как длина фрагмента
                        и смещение.
         file_counter (int): Счетчик обработанных аудиофайлов.
-        total_samples (int): Общее количество аудиосэмплов, полученных от
-                             данного клиента.
+        total_samples (int): Общее количество аудиосэмплов, принятых в
+                             буфер от данного клиента.
+        samples_since_dispatch (int): Сэмплы, принятые после последнего
+                                      вызова стратегии буферизации.
+        last_dispatch (float): Время последнего вызова стратегии
+                               (time.monotonic()).
+        closed (bool): Клиент отключился; конвейеры не создают для него
+                       новых сессий.
+        flush_handle (asyncio.TimerHandle): Запланированный сервером вызов
+                                            стратегии для аудио, после
+                                            которого не пришло новых
+                                            сообщений, или None.
+        max_buffer_seconds (float): Предел емкости буфера, который клиент
+                                    может задать, или None.
+        recipe_id (str): Рецепт, для которого отслеживается шаг.
+        recipe_step (int): Текущий шаг рецепта сессии (с нуля) или None;
+                           хранится в клиенте, чтобы не теряться при
+                           пересоздании стратегии буферизации.
+        claims (dict): Данные JWT-токена, с которым подключился клиент
+                       (пустой словарь без аутентификации).
         sampling_rate (int): Частота дискретизации аудиоданных в Гц.
         samples_width (int): Ширина каждого аудиосэмпла в битах.
+        decoder: Декодер входящих сообщений в сэмплы int16 по
+                 config["audio_encoding"] или None для сырого PCM.
+        converter (AudioFormatConverter): Преобразователь аудио клиента в
+                                          моно int16 с частотой
+                                          sampling_rate или None, если
+                                          преобразование не нужно.
     """
 
-    def __init__(self, client_id, sampling_rate, samples_width):
+    def __init__(self, client_id, sampling_rate, samples_width,
+                 max_buffer_seconds=None):
         self.client_id = client_id
-        self.buffer = bytearray()
         self.scratch_buffer = bytearray()
         self.config = {
             "language": None,
-            "processing_strategy": "realtime_vosk_transcribe",  # realtime_vosk_transcribe
+            # Кодирование входящего аудио: "pcm_s16le", "mulaw", "alaw" или
+            # "ima_adpcm" (каждое сообщение - самостоятельный блок)
+            "audio_encoding": PCM_S16LE,
+            # Формат аудио клиента; сервер сам сводит каналы в моно и
+            # передискретизирует в sampling_rate (None - частота сервера)
+            "sample_rate": None,
+            "channels": 1,
+            "sample_format": INT16,
+            # Емкость буфера входящего аудио и политика при переполнении:
+            # "drop_oldest" или "reject"
+            "buffer_capacity_seconds": 30,
+            "buffer_overflow": "drop_oldest",
+            # Приоритет сессии: клиент может только понизить его (< 0 -
+            # фоновая сессия, которая первой перестает обрабатываться при
+            # перегрузке сервера)
+            "priority": 0,
+            # Стратегия буферизации вызывается не на каждое сообщение, а
+            # когда накопилось столько миллисекунд аудио или прошло столько
+            # же времени с прошлого вызова; 0 - на каждое сообщение
+            "dispatch_interval_ms": 100,
+            # "vosk_asr_vad_v1", "vosk_asr_vad" или "realtime_vosk_transcribe"
+            "processing_strategy": "vosk_asr_vad_v1",
             "processing_args": {
                 "chunk_length_seconds": 5,
                 "chunk_offset_seconds": 0.1,
@@ -39,8 +90,20 @@ class Client:
         }
         self.file_counter = 0
         self.total_samples = 0
+        self.samples_since_dispatch = 0
+        self.last_dispatch = time.monotonic()
+        self.flush_handle = None
+        self.closed = False
         self.sampling_rate = sampling_rate
         self.samples_width = samples_width
+        self.max_buffer_seconds = max_buffer_seconds
+        self.claims = {}
+        self.recipe_id = None
+        self.recipe_step = None
+        self.decoder = None
+        self.converter = None
+        self.apply_limits()
+        self.buffer = self.create_buffer()
         self.buffering_strategy = (
             BufferingStrategyFactory.create_buffering_strategy(
                 self.config["processing_strategy"],
@@ -51,29 +114,145 @@ class Client:
 
     def update_config(self, config_data):
         """
-        Обновляет конфигурацию клиента.
+        Обновляет конфигурацию клиента. Новая конфигурация сначала
+        проверяется целиком и применяется, только если она корректна.
 
         Параметры:
             config_data (dict): Новый набор параметров конфигурации.
+
+        Исключения:
+            ValueError: Если конфигурация некорректна; текущая конфигурация
+                        клиента при этом не меняется.
         """
-        self.config.update(config_data)
-        self.buffering_strategy = (
-            BufferingStrategyFactory.create_buffering_strategy(
-                self.config["processing_strategy"],
+        config = dict(self.config)
+        config.update(config_data)
+        self.apply_limits(config)
+        decoder = get_decoder(config["audio_encoding"])
+        converter = self.create_converter(config)
+        buffer = self.buffer
+        if (
+            int(config["buffer_capacity_seconds"] * self.sampling_rate)
+            != self.buffer.capacity
+            or config["buffer_overflow"] != self.buffer.overflow
+        ):
+            buffer = self.create_buffer(config)
+
+        # Стратегия создается до применения конфигурации: неизвестный тип
+        # или некорректные processing_args отклоняют всю конфигурацию.
+        # Стратегия читает буфер клиента при создании, поэтому на это время
+        # подставляется новый буфер
+        previous_buffer, self.buffer = self.buffer, buffer
+        try:
+            strategy = BufferingStrategyFactory.create_buffering_strategy(
+                config["processing_strategy"],
                 self,
-                **self.config["processing_args"],
+                **config["processing_args"],
+            )
+        except Exception:
+            self.buffer = previous_buffer
+            raise
+
+        # Задания прежней стратегии не должны обращаться к распознавателю
+        # сессии параллельно с новой
+        self.buffering_strategy.close()
+        self.config = config
+        self.decoder = decoder
+        self.converter = converter
+        self.buffer = buffer
+        self.buffering_strategy = strategy
+
+    def apply_limits(self, config=None):
+        """
+        Ограничивает настройки клиента пределами сервера: емкость буфера -
+        max_buffer_seconds, приоритет - не выше 0.
+
+        Параметры:
+            config (dict): Проверяемая конфигурация; по умолчанию
+                           self.config.
+        """
+        config = self.config if config is None else config
+        if self.max_buffer_seconds is not None:
+            config["buffer_capacity_seconds"] = min(
+                config["buffer_capacity_seconds"], self.max_buffer_seconds
             )
+        config["priority"] = min(int(config["priority"]), 0)
+
+    def create_converter(self, config):
+        """
+        Возвращает преобразователь аудио для формата из конфигурации. При
+        неизменном формате возвращается текущий преобразователь, чтобы
+        сохранить состояние передискретизатора.
+
+        Параметры:
+            config (dict): Конфигурация клиента.
+
+        Возвращает:
+            AudioFormatConverter: Преобразователь или None, если
+                                  преобразование не нужно.
+        """
+        audio_format = (
+            config["sample_rate"] or self.sampling_rate,
+            config["channels"],
+            config["sample_format"],
+        )
+        if self.converter is not None and audio_format == (
+            self.converter.sample_rate,
+            self.converter.channels,
+            self.converter.sample_format,
+        ):
+            return self.converter
+        if AudioFormatConverter.is_needed(audio_format[0], self.sampling_rate,
+                                          *audio_format[1:]):
+            return AudioFormatConverter(
+                audio_format[0], self.sampling_rate, *audio_format[1:]
+            )
+        return None
+
+    def create_buffer(self, config=None):
+        """
+        Создает кольцевой буфер по конфигурации клиента.
+
+        Параметры:
+            config (dict): Конфигурация; по умолчанию self.config.
+
+        Возвращает:
+            AudioRingBuffer: Пустой буфер.
+        """
+        config = self.config if config is None else config
+        return AudioRingBuffer(
+            int(config["buffer_capacity_seconds"] * self.sampling_rate),
+            config["buffer_overflow"],
         )
 
     def append_audio_data(self, audio_data):
         """
-        Добавляет аудиоданные в буфер клиента.
+        Добавляет аудиоданные в буфер клиента, предварительно декодируя их,
+        если клиент передает сжатое аудио, и преобразуя к моно int16 с
+        частотой сервера.
 
         Параметры:
             audio_data (bytes): Входящие аудиоданные.
+
+        Возвращает:
+            int: Число принятых сэмплов (0 для пустого сообщения или если
+                 буфер переполнен и политика "reject").
+
+        Исключения:
+            ValueError: Если сообщение не декодируется (например, блок
+                        IMA-ADPCM короче заголовка).
         """
-        self.buffer.extend(audio_data)
-        self.total_samples += len(audio_data) / self.samples_width
+        if not audio_data:
+            return 0
+        audio = audio_data if self.decoder is None else self.decoder(audio_data)
+        if self.converter is not None:
+            audio = self.converter.convert(audio)
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            written = self.buffer.write(audio)
+        else:
+            written = self.buffer.write_samples(audio)
+        self.total_samples += written
+        self.samples_since_dispatch += written
+        return written
 
     def clear_buffer(self):
         """
@@ -96,6 +275,21 @@ class Client:
         """
         return f"{self.client_id}_{self.file_counter}.wav"
 
+    def dispatch_due(self):
+        """
+        Проверяет, пора ли вызвать стратегию буферизации: с прошлого вызова
+        накоплено не меньше dispatch_interval_ms аудио или прошло не меньше
+        dispatch_interval_ms времени.
+
+        Возвращает:
+            bool: True, если стратегию нужно вызвать.
+        """
+        interval = self.config["dispatch_interval_ms"] / 1000
+        return (
+            self.samples_since_dispatch >= interval * self.sampling_rate
+            or time.monotonic() - self.last_dispatch >= interval
+        )
+
     def process_audio(self, websocket, vad_pipline, asr_pipeline):
         """
         Обрабатывает аудиоданные, используя заданную стратегию буферизации.
@@ -104,6 +298,8 @@ class Client:
             websocket: Веб-сокет для отправки результатов обработки.
             asr_pipeline: Конвейер автоматического распознавания речи (ASR).
         """
+        self.samples_since_dispatch = 0
+        self.last_dispatch = time.monotonic()
         self.buffering_strategy.process_audio(
             websocket, vad_pipline, asr_pipeline
         )
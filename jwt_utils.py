@@ -1,22 +1,253 @@
+import http
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
 import jwt
 from jwt import InvalidTokenError, ExpiredSignatureError
 
-# Секретный ключ (должен быть защищён)
-SECRET_KEY = "your-secret-key"
+# Параметры строки запроса, в которых ищется токен (браузерный WebSocket не
+# позволяет задать заголовок Authorization)
+TOKEN_QUERY_PARAMS = ("token", "access_token")
+
+
+class JWTVerifier:
+    """
+    Проверка JWT-токенов с кэшем проверенных токенов.
+
+    Подпись проверяется один раз; затем claims берутся из кэша по самому
+    токену до истечения его срока (claim "exp") или cache_ttl_seconds.
+    Кэш ограничен cache_size записями: при переполнении сначала удаляются
+    истекшие записи, затем давно не использовавшиеся.
+
+    Атрибуты:
+        key: Секрет (HS*) или открытый ключ (RS*/ES*) для проверки подписи.
+        algorithms (list): Допустимые алгоритмы подписи.
+        audience (str): Ожидаемый claim "aud" или None.
+        issuer (str): Ожидаемый claim "iss" или None.
+        cache_size (int): Предел числа записей кэша; 0 отключает кэш.
+        cache_ttl_seconds (float): Наибольшее время жизни записи кэша.
+    """
+
+    def __init__(self, key, algorithms=("HS256",), audience=None, issuer=None,
+                 leeway=0, cache_size=1024, cache_ttl_seconds=300.0):
+        if not key:
+            raise ValueError("Не задан секрет или открытый ключ для проверки JWT")
+        self.key = key
+        self.algorithms = list(algorithms)
+        self._check_key()
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        # Токен -> (claims, время истечения записи по time.time())
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_key(self):
+        """
+        Проверяет, что ключ подходит ко всем допустимым алгоритмам, чтобы
+        ошибка настройки обнаружилась при запуске, а не при первом
+        рукопожатии.
+
+        :raises: ValueError, если алгоритм неизвестен или ключ ему не
+                 подходит (например, PEM-ключ с HS*).
+        """
+        is_pem = self.key.lstrip().startswith("-----BEGIN")
+        supported = jwt.algorithms.get_default_algorithms()
+        for name in self.algorithms:
+            if name.upper().startswith("HS") and is_pem:
+                raise ValueError(
+                    f"Алгоритм {name} требует секрет, а задан PEM-ключ; "
+                    f"для открытого ключа укажите RS*/ES* в --jwt-algorithms"
+                )
+            if name not in supported:
+                raise ValueError(
+                    f"Алгоритм JWT {name} недоступен (для RS*/ES* нужен "
+                    f"PyJWT[crypto])"
+                )
+            try:
+                supported[name].prepare_key(self.key)
+            except (jwt.PyJWTError, ValueError, TypeError) as e:
+                raise ValueError(
+                    f"Ключ JWT не подходит к алгоритму {name}: {e}"
+                )
+
+    def verify(self, token):
+        """
+        Проверяет JWT-токен.
+
+        :param token: JWT-токен в виде строки.
+        :return: Декодированные данные (claims), если токен валиден.
+        :raises: ValueError, если токен невалиден или истёк.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.cache.get(token)
+            if entry is not None:
+                if entry[1] > now:
+                    self.cache.move_to_end(token)
+                    self.hits += 1
+                    return entry[0]
+                del self.cache[token]
+            self.misses += 1
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+            )
+        except ExpiredSignatureError:
+            raise ValueError("JWT-токен истёк")
+        except InvalidTokenError:
+            raise ValueError("JWT-токен невалиден")
+        except jwt.PyJWTError as e:
+            # Например, InvalidKeyError: ключ не подходит к алгоритму
+            logging.error(f"Ошибка проверки JWT: {e}")
+            raise ValueError("JWT-токен не удалось проверить")
+
+        if self.cache_size > 0:
+            expires = now + self.cache_ttl_seconds
+            if "exp" in claims:
+                expires = min(expires, claims["exp"] + self.leeway)
+            with self.lock:
+                self.cache[token] = (claims, expires)
+                self.cache.move_to_end(token)
+                if len(self.cache) > self.cache_size:
+                    self._evict(now)
+        return claims
+
+    def _evict(self, now):
+        for token in [t for t, (_, expires) in self.cache.items() if expires <= now]:
+            del self.cache[token]
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+
+def token_from_request(path, headers):
+    """
+    Извлекает токен из запроса рукопожатия websocket: из заголовка
+    "Authorization: Bearer <токен>" или из параметра строки запроса
+    token / access_token.
+
+    :param path: Путь запроса со строкой запроса.
+    :param headers: Заголовки запроса.
+    :return: Токен или None.
+    """
+    authorization = headers.get("Authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    if scheme.lower() == "bearer" and credentials.strip():
+        return credentials.strip()
+
+    query = parse_qs(urlsplit(path).query)
+    for name in TOKEN_QUERY_PARAMS:
+        if query.get(name):
+            return query[name][0]
+    return None
+
+
+class HandshakeAuthenticator:
+    """
+    Проверка JWT при рукопожатии websocket (process_request в
+    websockets.serve): соединение без валидного токена получает HTTP 401 и
+    не доходит до обработчика, поэтому сообщения сессии не проверяются.
+    """
+
+    def __init__(self, verifier):
+        """
+        :param verifier: JWTVerifier.
+        """
+        self.verifier = verifier
+
+    async def process_request(self, path, headers):
+        """
+        Проверяет токен запроса рукопожатия.
+
+        :return: None, чтобы продолжить рукопожатие, или ответ HTTP 401.
+        """
+        token = token_from_request(path, headers)
+        if token is None:
+            return self._unauthorized("JWT-токен не передан")
+        try:
+            self.verifier.verify(token)
+        except ValueError as e:
+            return self._unauthorized(str(e))
+        return None
+
+    def claims(self, websocket):
+        """
+        Возвращает claims соединения, прошедшего рукопожатие (из кэша
+        проверенных токенов).
+        """
+        return self.verifier.verify(
+            token_from_request(websocket.path, websocket.request_headers)
+        )
+
+    @staticmethod
+    def _unauthorized(message):
+        logging.info(f"Рукопожатие отклонено: {message}")
+        return (
+            http.HTTPStatus.UNAUTHORIZED,
+            [("WWW-Authenticate", "Bearer")],
+            (message + "\n").encode("utf-8"),
+        )
+
+
+_verifier = None
+
+
+def configure_jwt(secret=None, secret_file=None, public_key_file=None,
+                  **kwargs):
+    """
+    Создает общий для процесса JWTVerifier.
+
+    Ключ берется из public_key_file, secret_file или secret (в этом
+    порядке), а если они не заданы - из переменной окружения JWT_SECRET.
+
+    :param kwargs: Остальные параметры JWTVerifier.
+    :return: JWTVerifier или None, если ключ не задан (аутентификация
+             отключена).
+    """
+    global _verifier
+    key = secret or os.environ.get("JWT_SECRET")
+    for path in (public_key_file, secret_file):
+        if path:
+            with open(path, encoding="utf-8") as f:
+                key = f.read().strip()
+            break
+    _verifier = JWTVerifier(key, **kwargs) if key else None
+    return _verifier
+
+
+def get_jwt_verifier():
+    """
+    Возвращает общий JWTVerifier, создавая его по переменной окружения
+    JWT_SECRET, если он еще не настроен.
+    """
+    if _verifier is None:
+        configure_jwt()
+    return _verifier
+
 
 def verify_jwt(token: str):
     """
-    Проверяет JWT-токен.
+    Проверяет JWT-токен общим JWTVerifier процесса.
 
     :param token: JWT-токен в виде строки.
     :return: Декодированные данные, если токен валиден.
     :raises: ValueError, если токен невалиден или истёк.
     """
-    try:
-        # Расшифровываем и проверяем токен
-        decoded_token = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return decoded_token
-    except ExpiredSignatureError:
-        raise ValueError("JWT-токен истёк")
-    except InvalidTokenError:
-        raise ValueError("JWT-токен невалиден")
+    verifier = get_jwt_verifier()
+    if verifier is None:
+        raise RuntimeError("Проверка JWT не настроена: задайте секрет или ключ")
+    return verifier.verify(token)
@@ -1,11 +1,31 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import argparse
 import asyncio
 import json
 import logging
+import os
+import sys
 
 from service.asr.asr_factory import ASRFactory
+from service.executor.capacity_manager import configure_capacity_manager
+from service.executor.inference_executor import configure_executor
+from service.metrics.http_endpoint import start_metrics_server
+from service.metrics.instrumented import InstrumentedASR, InstrumentedVAD
+from service.models.model_registry import get_model_registry
+from service.nlp.event_parser import load_event_patterns
+from service.nlp.qa_batcher import QABatcher
+from service.nlp.qa_service import configure_qa_service
+from service.nlp.recipe_store import configure_recipe_store
 from service.vad.vad_factory import VADFactory
+from jwt_utils import HandshakeAuthenticator, configure_jwt, get_jwt_verifier
 from server import Server
+from supervisor import WorkerSupervisor
+from utils.lazy_resource import preload_all, resource_report
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 
 def parse_args():
@@ -29,13 +49,13 @@ def parse_args():
         "--vad-type",
         type=str,
         default="vosk",
-        help="Type of ASR pipeline to use (e.g., 'whisper')",
+        help="Type of VAD pipeline to use ('vosk' or 'energy')",
     )
     parser.add_argument(
         "--vad-args",
         type=str,
         default='{"model_size": "large-v3"}',
-        help="JSON string of additional arguments for ASR pipeline",
+        help="JSON string of additional arguments for VAD pipeline",
     )
     parser.add_argument(
         "--host",
@@ -59,6 +79,187 @@ def parse_args():
         default=None,
         help="The path to the SSL key file if using secure websockets",
     )
+    parser.add_argument(
+        "--inference-workers",
+        type=int,
+        default=None,
+        help="Number of inference threads (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--inference-queue-size",
+        type=int,
+        default=None,
+        help="Number of pending inference jobs after which buffering "
+        "strategies defer new chunks (default: 4 * inference workers)",
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=None,
+        help="Maximum number of concurrent sessions per process; further "
+        "connections are closed with code 1013 (default: unlimited)",
+    )
+    parser.add_argument(
+        "--max-load",
+        type=float,
+        default=0.9,
+        help="Inference thread utilization (0-1) above which new sessions "
+        "are rejected and background sessions are paused",
+    )
+    parser.add_argument(
+        "--shed-load",
+        type=float,
+        default=0.75,
+        help="Inference thread utilization (0-1) above which partial "
+        "results are no longer computed",
+    )
+    parser.add_argument(
+        "--max-queued-seconds",
+        type=float,
+        default=None,
+        help="Audio seconds waiting to be decoded across all sessions above "
+        "which new sessions are rejected (default: unlimited)",
+    )
+    parser.add_argument(
+        "--admission-wait",
+        type=float,
+        default=0.0,
+        help="Seconds a new connection waits for capacity before it is "
+        "rejected",
+    )
+    parser.add_argument(
+        "--max-buffer-seconds",
+        type=float,
+        default=60.0,
+        help="Upper limit for the per-client buffer_capacity_seconds",
+    )
+    parser.add_argument(
+        "--jwt-secret-file",
+        type=str,
+        default=None,
+        help="File with the HMAC secret for JWT authentication of websocket "
+        "handshakes (alternatively set JWT_SECRET); without a secret or key "
+        "authentication is disabled",
+    )
+    parser.add_argument(
+        "--jwt-public-key-file",
+        type=str,
+        default=None,
+        help="PEM public key for RS*/ES* signed tokens",
+    )
+    parser.add_argument(
+        "--jwt-algorithms",
+        nargs="+",
+        default=["HS256"],
+        help="Accepted JWT signature algorithms",
+    )
+    parser.add_argument(
+        "--jwt-audience", type=str, default=None, help="Required 'aud' claim"
+    )
+    parser.add_argument(
+        "--jwt-issuer", type=str, default=None, help="Required 'iss' claim"
+    )
+    parser.add_argument(
+        "--jwt-cache-size",
+        type=int,
+        default=1024,
+        help="Number of verified tokens kept in the cache (0 disables it)",
+    )
+    parser.add_argument(
+        "--qa-process-pool",
+        action="store_true",
+        help="Run the question-answering model in a process pool",
+    )
+    parser.add_argument(
+        "--qa-workers",
+        type=int,
+        default=1,
+        help="Number of processes in the question-answering pool",
+    )
+    parser.add_argument(
+        "--qa-cache-size",
+        type=int,
+        default=256,
+        help="Number of question-answering results kept in the answer cache",
+    )
+    parser.add_argument(
+        "--qa-cache-ttl",
+        type=float,
+        default=600.0,
+        help="Seconds a cached question-answering result stays valid",
+    )
+    parser.add_argument(
+        "--recipes-dir",
+        type=str,
+        default=None,
+        help="Directory with recipes (*.json, *.txt) used as question-"
+        "answering context (default: built-in sample recipe)",
+    )
+    parser.add_argument(
+        "--qa-context-steps",
+        type=int,
+        default=2,
+        help="Number of best-matching recipe steps passed to the "
+        "question-answering model",
+    )
+    parser.add_argument(
+        "--qa-batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of questions from all sessions answered in one "
+        "padded model pass (default: 1, no batching)",
+    )
+    parser.add_argument(
+        "--qa-batch-wait-ms",
+        type=float,
+        default=5.0,
+        help="Milliseconds to wait for a question-answering batch to fill",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of server processes sharing the host and port through "
+        "SO_REUSEPORT; models are loaded once before forking (default: 1)",
+    )
+    parser.add_argument(
+        "--heartbeat-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds without a heartbeat after which a worker process is "
+        "restarted (used with --workers > 1)",
+    )
+    parser.add_argument(
+        "--event-patterns",
+        type=str,
+        default=None,
+        help="Path to a JSON file with voice command patterns "
+        "({\"EVENT\": [\"regex\", ...]}) replacing the built-in ones",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://<metrics-host>:<port>/metrics "
+        "(worker N of --workers uses port + N)",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        type=str,
+        default="127.0.0.1",
+        help="Host for the metrics endpoint",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load all models before accepting connections instead of on "
+        "first use (always done with --workers > 1)",
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print import, model loading and server startup times",
+    )
     parser.add_argument(
         "--log-level",
         type=str,
@@ -69,19 +270,102 @@ def parse_args():
     return parser.parse_args()
 
 
-async def run_server(args):
+def create_pipelines(args):
+    """
+    Создает конвейеры VAD и ASR.
+
+    Модели конвейеров, spaCy и QA загружаются при первом использовании;
+    preload_all() загружает их заранее.
+    """
+    asr_args = json.loads(args.asr_args)
+    vad_args = json.loads(args.vad_args)
+
+    asr_pipeline = ASRFactory.create_asr_pipeline(args.asr_type, **asr_args)
+    vad_pipeline = VADFactory.create_vad_pipeline(args.vad_type, **vad_args)
+    # Длительность вызовов конвейеров попадает в метрики этапов
+    return InstrumentedVAD(vad_pipeline), InstrumentedASR(asr_pipeline)
+
+
+def print_startup_profile(stages):
+    """
+    Печатает время этапов запуска и загрузки тяжелых ресурсов. Ресурсы,
+    которые еще не загружены, будут загружены при первом использовании.
+
+    Аргументы:
+        stages (list): Пары (этап, секунды).
+    """
+    print("Профиль запуска:")
+    for name, seconds in stages:
+        print(f"  {name:<48} {seconds:8.3f} с")
+    for name, seconds in resource_report():
+        loaded = f"{seconds:8.3f} с" if seconds is not None else "отложена"
+        print(f"  загрузка: {name:<38} {loaded:>10}")
+    for model in get_model_registry().report():
+        rss = (
+            f"{model['rss_bytes'] / 2 ** 20:.0f} МБ"
+            if model["rss_bytes"] is not None else "?"
+        )
+        print(
+            f"  модель: {model['path']} (пользователей: {model['refs']}, "
+            f"память: {rss}, на диске: {model['disk_bytes'] / 2 ** 20:.0f} МБ)"
+        )
+
+
+async def send_heartbeats(heartbeat_fd, interval):
+    """
+    Периодически сообщает супервизору, что цикл событий рабочего процесса
+    не заблокирован.
+    """
+    while True:
+        try:
+            os.write(heartbeat_fd, b".")
+        except BlockingIOError:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run_server(args, pipelines=None, heartbeat_fd=None, worker_index=0):
     logging.basicConfig()
     logging.getLogger().setLevel(args.log_level.upper())
 
-    try:
-        asr_args = json.loads(args.asr_args)
-        vad_args = json.loads(args.vad_args)
-    except json.JSONDecodeError as e:
-        print(f"Ошибка парсинга JSON аргументов: {e}")
-        return
+    stages = [("импорт модулей", _IMPORT_SECONDS)]
+    if pipelines is None:
+        started = time.perf_counter()
+        try:
+            pipelines = create_pipelines(args)
+        except json.JSONDecodeError as e:
+            print(f"Ошибка парсинга JSON аргументов: {e}")
+            return
+        stages.append(("создание конвейеров", time.perf_counter() - started))
+        if args.preload:
+            started = time.perf_counter()
+            preload_all()
+            stages.append(("загрузка моделей", time.perf_counter() - started))
+    vad_pipeline, asr_pipeline = pipelines
 
-    asr_pipeline = ASRFactory.create_asr_pipeline(args.asr_type, **asr_args)
-    vad_pipeline = VADFactory.create_vad_pipeline(args.vad_type, **asr_args)
+    configure_executor(
+        workers=args.inference_workers,
+        queue_size=args.inference_queue_size,
+        qa_process_pool=args.qa_process_pool,
+        qa_workers=args.qa_workers,
+    )
+    capacity_manager = configure_capacity_manager(
+        max_sessions=args.max_sessions,
+        max_load=args.max_load,
+        shed_load=args.shed_load,
+        max_queued_seconds=args.max_queued_seconds,
+        admission_wait_seconds=args.admission_wait,
+        max_buffer_seconds=args.max_buffer_seconds,
+    )
+    verifier = get_jwt_verifier()
+    batcher = None
+    if args.qa_batch_size > 1:
+        batcher = QABatcher(args.qa_batch_size, args.qa_batch_wait_ms)
+    configure_qa_service(
+        max_entries=args.qa_cache_size,
+        ttl_seconds=args.qa_cache_ttl,
+        batcher=batcher,
+    )
 
     server = Server(
         vad_pipeline,
@@ -92,15 +376,84 @@ async def run_server(args):
         samples_width=2,
         certfile=args.certfile,
         keyfile=args.keyfile,
+        reuse_port=args.workers > 1,
+        capacity_manager=capacity_manager,
+        authenticator=(
+            HandshakeAuthenticator(verifier) if verifier is not None else None
+        ),
     )
 
+    started = time.perf_counter()
     await server.start()
+    if args.metrics_port is not None:
+        await start_metrics_server(
+            args.metrics_host, args.metrics_port + worker_index
+        )
+    stages.append(("запуск сервера", time.perf_counter() - started))
+    if args.startup_profile and heartbeat_fd is None:
+        print_startup_profile(stages)
+    if heartbeat_fd is not None:
+        asyncio.create_task(
+            send_heartbeats(heartbeat_fd, args.heartbeat_timeout / 3)
+        )
     await asyncio.Future()  # Блокирует выполнение, чтобы сервер оставался активным
 
 
+def run_workers(args):
+    """
+    Загружает модели один раз и запускает args.workers рабочих процессов,
+    разделяющих их в режиме copy-on-write.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    stages = [("импорт модулей", _IMPORT_SECONDS)]
+    started = time.perf_counter()
+    try:
+        pipelines = create_pipelines(args)
+    except json.JSONDecodeError as e:
+        print(f"Ошибка парсинга JSON аргументов: {e}")
+        return
+    stages.append(("создание конвейеров", time.perf_counter() - started))
+    # Модели загружаются до fork, чтобы рабочие процессы разделяли их
+    started = time.perf_counter()
+    preload_all()
+    stages.append(("загрузка моделей", time.perf_counter() - started))
+    if args.startup_profile:
+        print_startup_profile(stages)
+
+    def worker(index, heartbeat_fd):
+        os.set_blocking(heartbeat_fd, False)
+        asyncio.run(run_server(args, pipelines, heartbeat_fd, index))
+
+    supervisor = WorkerSupervisor(
+        worker, args.workers, heartbeat_timeout=args.heartbeat_timeout
+    )
+    supervisor.start()
+
+
 def main():
     args = parse_args()
-    asyncio.run(run_server(args))
+    if args.event_patterns:
+        load_event_patterns(args.event_patterns)
+    configure_recipe_store(args.recipes_dir, args.qa_context_steps)
+    # Ключ JWT проверяется до запуска рабочих процессов: неподходящий ключ
+    # (например, PEM-ключ с HS256) останавливает сервер при старте
+    try:
+        configure_jwt(
+            secret_file=args.jwt_secret_file,
+            public_key_file=args.jwt_public_key_file,
+            algorithms=args.jwt_algorithms,
+            audience=args.jwt_audience,
+            issuer=args.jwt_issuer,
+            cache_size=args.jwt_cache_size,
+        )
+    except ValueError as e:
+        sys.exit(f"Ошибка настройки JWT: {e}")
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        asyncio.run(run_server(args))
 
 
 if __name__ == "__main__":
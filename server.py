@@ -1,11 +1,29 @@
+import asyncio
 import json
 import logging
 import ssl
+import time
 import uuid
 
 import websockets
 
 from client import Client
+from service.executor.capacity_manager import (
+    BACKGROUND,
+    get_capacity_manager,
+)
+from service.executor.inference_executor import get_executor
+from service.metrics.instrumented import MeteredWebSocket
+from service.metrics.registry import (
+    REGISTRY,
+    STRATEGY_DISPATCHES,
+    WEBSOCKET_MESSAGES,
+    CallbackMetric,
+)
+
+# Через сколько секунд повторяется отложенный вызов стратегии фоновой
+# сессии, пока сервер перегружен
+SHED_RETRY_SECONDS = 0.1
 
 
 class Server:
@@ -22,6 +40,13 @@ class Server:
         port (int): Порт, на котором сервер принимает подключения.
         sampling_rate (int): Частота дискретизации аудиоданных в Гц.
         samples_width (int): Ширина каждого аудиосэмпла в битах.
+        reuse_port (bool): Открывать сокет с SO_REUSEPORT, чтобы несколько
+                           процессов принимали соединения на одном порту.
+        capacity (CapacityManager): Контроль допуска сессий и сброса
+                                    нагрузки.
+        authenticator (HandshakeAuthenticator): Проверка JWT при
+                                                рукопожатии или None, если
+                                                аутентификация отключена.
         connected_clients (dict): Словарь, сопоставляющий ID клиентов с объектами
                                   Client.
     """
@@ -36,6 +61,9 @@ class Server:
         samples_width=2,
         certfile=None,
         keyfile=None,
+        reuse_port=False,
+        capacity_manager=None,
+        authenticator=None,
     ):
         self.vad_pipline = vad_pipline
         self.asr_pipeline = asr_pipeline
@@ -45,7 +73,69 @@ class Server:
         self.samples_width = samples_width
         self.certfile = certfile
         self.keyfile = keyfile
+        self.reuse_port = reuse_port
         self.connected_clients = {}
+        self.capacity = capacity_manager or get_capacity_manager()
+        self.capacity.attach(self.connected_clients)
+        self.authenticator = authenticator
+        self.register_metrics()
+
+    def register_metrics(self):
+        """
+        Регистрирует метрики состояния сервера. Значения вычисляются только
+        при запросе метрик.
+        """
+        REGISTRY.register(CallbackMetric(
+            "voicestream_connected_clients",
+            "Number of connected websocket clients",
+            lambda: len(self.connected_clients),
+        ))
+        # Метрики сессий агрегируются: метка с client_id (новый UUID на
+        # каждое подключение) порождала бы неограниченное число рядов
+        REGISTRY.register(CallbackMetric(
+            "voicestream_buffered_bytes",
+            "Audio bytes buffered across all clients",
+            lambda: sum(self.client_buffered_bytes()),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_client_buffered_bytes_max",
+            "Largest audio buffer of a single client, in bytes",
+            lambda: max(self.client_buffered_bytes(), default=0),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_pending_chunks",
+            "Chunks queued or being processed across all clients",
+            lambda: sum(self.client_pending_chunks()),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_client_pending_chunks_max",
+            "Most chunks queued or being processed for a single client",
+            lambda: max(self.client_pending_chunks(), default=0),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_inference_pending",
+            "Inference jobs queued or running in the executor",
+            lambda: get_executor().pending,
+        ))
+        self.capacity.register_metrics()
+
+    def client_buffered_bytes(self):
+        """
+        Возвращает объем буферизованного аудио каждого клиента в байтах.
+        """
+        return [
+            len(client.buffer) for client in list(self.connected_clients.values())
+        ]
+
+    def client_pending_chunks(self):
+        """
+        Возвращает число фрагментов в очереди каждого клиента.
+        """
+        return [
+            client.buffering_strategy.scheduler.depth
+            for client in list(self.connected_clients.values())
+            if hasattr(client.buffering_strategy, "scheduler")
+        ]
 
     async def handle_audio(self, client, websocket):
         """
@@ -56,6 +146,12 @@ class Server:
         клиента. Если сообщение является строкой, предполагается, что это
         конфигурационные данные.
 
+        Мелкие аудиосообщения объединяются в буфере: стратегия буферизации
+        вызывается с интервалом config["dispatch_interval_ms"] (по объему
+        аудио или по времени), а не на каждое сообщение. Если сообщения
+        перестают приходить, накопленное аудио передается стратегии по
+        таймеру (schedule_flush).
+
         Аргументы:
             client (Client): Объект клиента, отправившего данные.
             websocket: WebSocket-соединение с клиентом.
@@ -63,43 +159,152 @@ class Server:
         while True:
             message = await websocket.recv()
 
+            WEBSOCKET_MESSAGES.inc("received")
             if isinstance(message, bytes):
-                client.append_audio_data(message)
+                try:
+                    written = client.append_audio_data(message)
+                except ValueError as e:
+                    # Некорректное сообщение отбрасывается, соединение
+                    # остается открытым
+                    await websocket.send(json.dumps({"error": str(e)}))
+                    continue
+                self.capacity.record_audio(written / client.sampling_rate)
+                if not client.dispatch_due():
+                    self.schedule_flush(client, websocket)
+                    continue
+                if self.capacity.should_shed(BACKGROUND, client.config["priority"]):
+                    # Фоновая сессия при перегрузке: аудио остается в
+                    # ограниченном буфере клиента до снижения нагрузки
+                    self.schedule_flush(client, websocket, SHED_RETRY_SECONDS)
+                    continue
             elif isinstance(message, str):
                 config = json.loads(message)
                 if config.get("type") == "config":
-                    client.update_config(config["data"])
+                    try:
+                        client.update_config(config["data"])
+                    except (ValueError, TypeError) as e:
+                        # Конфигурация не применена, клиент продолжает
+                        # работать с прежней
+                        await websocket.send(json.dumps({"error": str(e)}))
+                        continue
                     logging.debug(f"Updated config: {client.config}")
                     continue
             else:
                 print(f"Unexpected message type from {client.client_id}")
 
-            # Синхронная обработка аудиоданных (асинхронность внутри стратегии буферизации)
-            client.process_audio(
-                websocket, self.vad_pipline, self.asr_pipeline
+            self.dispatch(client, websocket)
+
+    def dispatch(self, client, websocket):
+        """
+        Вызывает стратегию буферизации клиента и отменяет его отложенный
+        вызов по таймеру.
+
+        Аргументы:
+            client (Client): Объект клиента.
+            websocket: WebSocket-соединение с клиентом.
+        """
+        if client.flush_handle is not None:
+            client.flush_handle.cancel()
+            client.flush_handle = None
+        # Синхронная обработка аудиоданных (асинхронность внутри стратегии буферизации)
+        STRATEGY_DISPATCHES.inc()
+        client.process_audio(
+            websocket, self.vad_pipline, self.asr_pipeline
+        )
+
+    def schedule_flush(self, client, websocket, delay=None):
+        """
+        Планирует вызов стратегии буферизации к моменту, когда истечет
+        dispatch_interval_ms с прошлого вызова, если он еще не
+        запланирован. Без этого аудио, после которого сообщения перестали
+        приходить (конец фразы), ждало бы следующего сообщения.
+
+        Аргументы:
+            client (Client): Объект клиента.
+            websocket: WebSocket-соединение с клиентом.
+            delay (float): Задержка в секундах; по умолчанию - остаток
+                           интервала.
+        """
+        if client.flush_handle is not None:
+            return
+        if delay is None:
+            delay = max(
+                0.0,
+                client.config["dispatch_interval_ms"] / 1000
+                - (time.monotonic() - client.last_dispatch),
             )
+        client.flush_handle = asyncio.get_running_loop().call_later(
+            delay, self.flush, client, websocket
+        )
+
+    def flush(self, client, websocket):
+        """
+        Вызов стратегии буферизации по таймеру schedule_flush.
+
+        Аргументы:
+            client (Client): Объект клиента.
+            websocket: WebSocket-соединение с клиентом.
+        """
+        client.flush_handle = None
+        if self.connected_clients.get(client.client_id) is not client:
+            return
+        if client.samples_since_dispatch == 0:
+            return
+        if self.capacity.should_shed(BACKGROUND, client.config["priority"]):
+            self.schedule_flush(client, websocket, SHED_RETRY_SECONDS)
+            return
+        self.dispatch(client, websocket)
 
     async def handle_websocket(self, websocket):
         """
         Управляет WebSocket-соединением с клиентом.
 
         Метод создает нового клиента, добавляет его в список подключенных
-        клиентов, а затем вызывает метод обработки аудио.
+        клиентов, а затем вызывает метод обработки аудио. Если сервер
+        перегружен, соединение закрывается с кодом 1013 (Try Again Later).
 
         Аргументы:
             websocket: WebSocket-соединение с клиентом.
         """
+        claims = {}
+        if self.authenticator is not None:
+            try:
+                # Токен проверен при рукопожатии, claims берутся из кэша
+                claims = self.authenticator.claims(websocket)
+            except ValueError as e:
+                await websocket.close(1008, str(e))
+                return
+
+        reason = await self.capacity.admit()
+        if reason is not None:
+            await websocket.close(1013, f"Server overloaded: {reason}")
+            return
+
         client_id = str(uuid.uuid4())
-        client = Client(client_id, self.sampling_rate, self.samples_width)
+        client = Client(
+            client_id,
+            self.sampling_rate,
+            self.samples_width,
+            max_buffer_seconds=self.capacity.max_buffer_seconds,
+        )
+        client.claims = claims
         self.connected_clients[client_id] = client
 
         print(f"Client {client_id} connected")
 
         try:
-            await self.handle_audio(client, websocket)
+            await self.handle_audio(client, MeteredWebSocket(websocket))
         except websockets.ConnectionClosed as e:
             print(f"Connection with {client_id} closed: {e}")
         finally:
+            if client.flush_handle is not None:
+                client.flush_handle.cancel()
+                client.flush_handle = None
+            # Очереди стратегии останавливаются до освобождения сессии,
+            # иначе ожидающий фрагмент создал бы ее заново
+            client.buffering_strategy.close()
+            self.asr_pipeline.release(client)
+            self.vad_pipline.release(client)
             del self.connected_clients[client_id]
 
     def start(self):
@@ -108,8 +313,14 @@ class Server:
 
         Если указан файл сертификата, сервер настраивается для работы через
         защищенные соединения (wss). В противном случае сервер принимает
-        обычные соединения (ws).
+        обычные соединения (ws). Если задана аутентификация, токен
+        проверяется при рукопожатии.
         """
+        process_request = (
+            self.authenticator.process_request
+            if self.authenticator is not None
+            else None
+        )
         if self.certfile:
             # Создание SSL-контекста для обеспечения зашифрованных соединений
             ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
@@ -126,7 +337,12 @@ class Server:
 
             # Передаем SSL-контекст в функцию serve
             return websockets.serve(
-                self.handle_websocket, self.host, self.port, ssl=ssl_context
+                self.handle_websocket,
+                self.host,
+                self.port,
+                ssl=ssl_context,
+                reuse_port=self.reuse_port,
+                process_request=process_request,
             )
         else:
             print(
@@ -134,5 +350,10 @@ class Server:
                 f"{self.host}:{self.port}"
             )
             return websockets.serve(
-                self.handle_websocket, self.host, self.port, origins=None  # Разрешить любые источники и отсутствие Origin
+                self.handle_websocket,
+                self.host,
+                self.port,
+                origins=None,  # Разрешить любые источники и отсутствие Origin
+                reuse_port=self.reuse_port,
+                process_request=process_request,
             )
@@ -1,3 +1,5 @@
+from service.models.model_registry import get_model_registry
+
 from .vosk_asr import VoskASR
 
 
@@ -5,6 +7,8 @@ class ASRFactory:
     @staticmethod
     def create_asr_pipeline(asr_type, **kwargs):
         if asr_type == "vosk":
+            # Модели берутся из общего реестра процесса
+            kwargs.setdefault("model_registry", get_model_registry())
             return VoskASR(**kwargs)
         else:
             raise ValueError(f"Не определен ASR: {asr_type}")
@@ -1,13 +1,48 @@
 class ASRInterface:
-    async def transcribe(self, client):
+    async def transcribe(self, client, audio=None):
         """
         Транскрибирует указанные аудиоданные.
 
         :param client: Объект клиента, содержащий все переменные-члены,
                        включая буфер с аудиоданными.
+        :param audio: Аудиоданные фрагмента; по умолчанию
+                      client.scratch_buffer.
         :return: Структура транскрипции, например, см. файл
                  faster_whisper_asr.py.
         """
         raise NotImplementedError(
             "Этот метод должен быть реализован в подклассах."
         )
+
+    async def accept_audio(self, client, data):
+        """
+        Подает новые аудиоданные в потоковый распознаватель сессии клиента.
+
+        :param client: Объект клиента.
+        :param data: Аудиоданные для подачи.
+        :return: Текущая промежуточная гипотеза (строка).
+        """
+        raise NotImplementedError(
+            "Этот метод должен быть реализован в подклассах."
+        )
+
+    async def finalize(self, client):
+        """
+        Завершает гипотезу потокового распознавателя сессии клиента.
+
+        :param client: Объект клиента.
+        :return: Структура транскрипции, как у transcribe().
+        """
+        raise NotImplementedError(
+            "Этот метод должен быть реализован в подклассах."
+        )
+
+    def release(self, client):
+        """
+        Освобождает ресурсы, закрепленные за сессией клиента.
+
+        Вызывается сервером при отключении клиента. По умолчанию ничего не
+        делает.
+
+        :param client: Объект клиента.
+        """
@@ -0,0 +1,363 @@
+"""
+Пакетная офлайн-расшифровка аудиофайлов моделью Vosk.
+
+    python -m service.asr.batch_transcribe recordings/ --output-dir out/
+    python -m service.asr.batch_transcribe manifest.jsonl --output-dir out/ \\
+        --workers 8 --format srt jsonl
+
+Файлы декодируются потоково через ffmpeg (любой формат, который понимает
+ffmpeg) и распознаются в пуле процессов. Модель загружается один раз в
+родительском процессе, рабочие процессы создаются через fork() и разделяют
+ее страницы памяти в режиме copy-on-write.
+
+Результаты: <output-dir>/<путь файла>.srt и <output-dir>/transcripts.jsonl
+(по записи на файл, с временем слов). transcripts.jsonl служит и журналом
+выполнения: при повторном запуске уже расшифрованные файлы пропускаются.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+
+from vosk import KaldiRecognizer, SetLogLevel
+
+from service.models.model_registry import (
+    download_and_extract_model,
+    load_vosk_model,
+)
+
+AUDIO_EXTENSIONS = (
+    ".wav", ".mp3", ".ogg", ".opus", ".flac", ".m4a", ".aac", ".webm",
+    ".mp4", ".mkv",
+)
+TRANSCRIPTS_FILE = "transcripts.jsonl"
+# Размер порции PCM, читаемой из ffmpeg за один вызов (4000 фреймов)
+READ_CHUNK_BYTES = 8000
+WORDS_PER_LINE = 7
+
+# Модель, загруженная в родительском процессе до fork()
+_model = None
+_settings = {}
+
+
+def find_audio_files(source):
+    """
+    Возвращает пары (ключ, путь) входных файлов.
+
+    :param source: Каталог (обходится рекурсивно) или манифест: текстовый
+                   файл с путем на строку либо JSONL с полем "path".
+                   Относительные пути манифеста отсчитываются от его каталога.
+    :return: Список пар, где ключ - путь относительно каталога источника.
+    """
+    if os.path.isdir(source):
+        base = source
+        paths = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        paths = []
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                path = json.loads(line)["path"] if line.startswith("{") else line
+                paths.append(os.path.join(base, path))
+
+    files = []
+    for path in sorted(paths):
+        key = os.path.relpath(path, base)
+        if key.startswith(".."):
+            key = os.path.abspath(path).lstrip(os.sep)
+        files.append((key, path))
+    return files
+
+
+def load_completed(transcripts_path):
+    """
+    Возвращает ключи файлов, уже записанных в transcripts.jsonl.
+
+    Строка, оборванная прерыванием записи или не являющаяся записью
+    расшифровки (не объект JSON со строкой "key"), пропускается, и ее файл
+    расшифровывается заново.
+    """
+    completed = set()
+    if not os.path.exists(transcripts_path):
+        return completed
+    with open(transcripts_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and isinstance(record.get("key"), str):
+                completed.add(record["key"])
+    return completed
+
+
+def format_timestamp(seconds):
+    """
+    Форматирует время в секундах как метку SRT (ЧЧ:ММ:СС,ммм).
+    """
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def compose_srt(segments, words_per_line=WORDS_PER_LINE):
+    """
+    Собирает субтитры SRT из сегментов со временем слов.
+
+    :param segments: Сегменты {"words": [{"word", "start", "end"}, ...]}.
+    :param words_per_line: Число слов в одном субтитре.
+    :return: Текст SRT.
+    """
+    blocks = []
+    for segment in segments:
+        words = segment["words"]
+        for i in range(0, len(words), words_per_line):
+            line = words[i:i + words_per_line]
+            blocks.append(
+                f"{len(blocks) + 1}\n"
+                f"{format_timestamp(line[0]['start'])} --> "
+                f"{format_timestamp(line[-1]['end'])}\n"
+                f"{' '.join(w['word'] for w in line)}\n"
+            )
+    return "\n".join(blocks)
+
+
+def _segment(result):
+    words = [
+        {
+            "word": w["word"],
+            "start": w["start"],
+            "end": w["end"],
+            "conf": w.get("conf"),
+        }
+        for w in result.get("result", [])
+    ]
+    if not words:
+        return None
+    return {
+        "start": words[0]["start"],
+        "end": words[-1]["end"],
+        "text": result.get("text", ""),
+        "words": words,
+    }
+
+
+def transcribe_path(path, sample_rate=16000):
+    """
+    Декодирует файл через ffmpeg и расшифровывает его моделью _model.
+
+    :param path: Путь к аудиофайлу.
+    :param sample_rate: Частота дискретизации для распознавателя.
+    :return: (сегменты, длительность аудио в секундах).
+    """
+    rec = KaldiRecognizer(_model, sample_rate)
+    rec.SetWords(True)
+
+    # Сообщения ffmpeg пишутся во временный файл: непрочитанный канал stderr
+    # мог бы заполниться и остановить ffmpeg, пока читается stdout
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+                "-ar", str(sample_rate), "-ac", "1", "-f", "s16le", "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+        )
+        segments = []
+        audio_bytes = 0
+        try:
+            while True:
+                data = process.stdout.read(READ_CHUNK_BYTES)
+                if not data:
+                    break
+                audio_bytes += len(data)
+                if rec.AcceptWaveform(data):
+                    segments.append(_segment(json.loads(rec.Result())))
+            segments.append(_segment(json.loads(rec.FinalResult())))
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg завершился с кодом {process.returncode}: {stderr}")
+    return [s for s in segments if s], audio_bytes / 2 / sample_rate
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _process_file(job):
+    """
+    Расшифровывает один файл в рабочем процессе и записывает его SRT.
+
+    :return: Запись для transcripts.jsonl или {"key", "error"}.
+    """
+    key, path = job
+    started = time.perf_counter()
+    try:
+        segments, duration = transcribe_path(path, _settings["sample_rate"])
+    except Exception as e:
+        return {"key": key, "path": path, "error": str(e)}
+
+    if "srt" in _settings["formats"]:
+        srt_path = os.path.join(
+            _settings["output_dir"], os.path.splitext(key)[0] + ".srt"
+        )
+        _write_atomic(srt_path, compose_srt(segments))
+    return {
+        "key": key,
+        "path": path,
+        "duration": round(duration, 3),
+        "processing_seconds": round(time.perf_counter() - started, 3),
+        "text": " ".join(s["text"] for s in segments),
+        "segments": segments,
+    }
+
+
+def run_batch(files, output_dir, workers, formats=("srt", "jsonl"),
+              sample_rate=16000):
+    """
+    Расшифровывает файлы в пуле процессов, пропуская уже расшифрованные.
+
+    :param files: Пары (ключ, путь) от find_audio_files().
+    :param output_dir: Каталог результатов.
+    :param workers: Число рабочих процессов.
+    :param formats: Форматы результатов ("srt", "jsonl").
+    :param sample_rate: Частота дискретизации для распознавателя.
+    :return: Сводка {"files", "skipped", "failed", "audio_seconds",
+             "wall_seconds"}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    transcripts_path = os.path.join(output_dir, TRANSCRIPTS_FILE)
+    completed = load_completed(transcripts_path)
+    pending = [job for job in files if job[0] not in completed]
+
+    _settings.update(
+        output_dir=output_dir, formats=tuple(formats), sample_rate=sample_rate
+    )
+    summary = {
+        "files": 0,
+        "skipped": len(files) - len(pending),
+        "failed": 0,
+        "audio_seconds": 0.0,
+        "wall_seconds": 0.0,
+    }
+    started = time.perf_counter()
+    # Журнал ведется всегда: он нужен для продолжения после прерывания
+    with open(transcripts_path, "a", encoding="utf-8") as journal, \
+            multiprocessing.get_context("fork").Pool(workers) as pool:
+        for record in pool.imap_unordered(_process_file, pending):
+            if "error" in record:
+                summary["failed"] += 1
+                logging.error(f"Ошибка расшифровки {record['path']}: {record['error']}")
+                continue
+            if "jsonl" not in formats:
+                record = {k: v for k, v in record.items() if k != "segments"}
+            journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            journal.flush()
+
+            summary["files"] += 1
+            summary["audio_seconds"] += record["duration"]
+            print(
+                f"[{summary['files']}/{len(pending)}] {record['key']}: "
+                f"{record['duration']:.1f} с аудио за "
+                f"{record['processing_seconds']:.1f} с"
+            )
+    summary["wall_seconds"] = time.perf_counter() - started
+    return summary
+
+
+def main():
+    global _model
+
+    parser = argparse.ArgumentParser(
+        description="Transcribe a directory or manifest of audio files "
+        "offline with Vosk"
+    )
+    parser.add_argument(
+        "source",
+        help="Directory of audio files, or a manifest (one path per line, or "
+        "JSONL with a 'path' field)",
+    )
+    parser.add_argument(
+        "--output-dir", required=True, help="Directory for SRT files and "
+        "transcripts.jsonl; rerunning resumes from transcripts.jsonl"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of transcription processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        choices=["srt", "jsonl"],
+        default=["srt", "jsonl"],
+        help="Outputs to write; without jsonl, transcripts.jsonl keeps only "
+        "the text and resume information",
+    )
+    parser.add_argument(
+        "--model-dir",
+        default="values/vosk-model-small-ru-0.22",
+        help="Vosk model directory",
+    )
+    parser.add_argument(
+        "--model-url",
+        default="https://alphacephei.com/vosk/models/vosk-model-small-ru-0.22.zip",
+        help="URL to download the model from if --model-dir does not exist",
+    )
+    parser.add_argument(
+        "--sample-rate", type=int, default=16000, help="Decoding sample rate"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    SetLogLevel(-1)
+
+    files = find_audio_files(args.source)
+    download_and_extract_model(
+        args.model_url, args.model_dir.rstrip("/") + ".zip", args.model_dir
+    )
+    _model = load_vosk_model(args.model_dir)
+
+    summary = run_batch(
+        files, args.output_dir, args.workers, args.format, args.sample_rate
+    )
+    audio_hours = summary["audio_seconds"] / 3600
+    wall_hours = summary["wall_seconds"] / 3600
+    print(
+        f"Расшифровано файлов: {summary['files']}, пропущено (уже готовы): "
+        f"{summary['skipped']}, с ошибками: {summary['failed']}"
+    )
+    print(
+        f"Аудио: {audio_hours:.3f} ч за {summary['wall_seconds']:.1f} с, "
+        f"пропускная способность: "
+        f"{audio_hours / wall_hours if wall_hours else 0.0:.1f} "
+        f"ч аудио / ч"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LanguageModelPool:
+    """
+    Пул моделей распознавания по языкам с вытеснением давно не
+    использовавшихся (LRU).
+
+    Модель языка загружается при первом запросе через реестр общих моделей.
+    Пока суммарный размер загруженных моделей превышает max_memory_bytes или
+    их число превышает max_models, а также когда модель простаивает дольше
+    idle_seconds, она освобождается, начиная с самой давно использованной.
+    Закрепленные языки (pinned) и языки, у которых есть активные сессии, не
+    вытесняются. Простаивающие модели освобождаются и без новых запросов:
+    фоновый поток процесса проверяет пул каждые idle_seconds / 2.
+
+    Модель загружается под блокировкой своего языка, а блокировка пула
+    берется только для учета: загрузка одного языка не задерживает запросы
+    уже загруженных моделей.
+
+    Атрибуты:
+        models (dict): Язык -> параметры модели {"dir", "url", "zip"}.
+        pinned (set): Языки, модели которых не вытесняются.
+    """
+
+    def __init__(self, models, registry, loader, pinned=(), max_models=None,
+                 max_memory_bytes=None, idle_seconds=None):
+        """
+        Аргументы:
+            models (dict): Язык -> параметры модели.
+            registry (ModelRegistry): Реестр общих моделей.
+            loader: Функция loader(spec, path), загружающая модель языка.
+            pinned (iterable): Закрепленные языки.
+            max_models (int): Предел числа загруженных моделей.
+            max_memory_bytes (int): Предел суммарного размера моделей.
+            idle_seconds (float): Время простоя, после которого модель
+                                  освобождается.
+        """
+        self.models = models
+        self.registry = registry
+        self.loader = loader
+        self.pinned = set(pinned)
+        self.max_models = max_models
+        self.max_memory_bytes = max_memory_bytes
+        self.idle_seconds = idle_seconds
+        # Язык -> [модель, время последнего использования, размер], в
+        # порядке LRU
+        self.loaded = OrderedDict()
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.load_locks = {language: threading.Lock() for language in models}
+        # Процесс, в котором запущен поток проверки простоя (потоки не
+        # переживают fork рабочих процессов)
+        self._sweeper_pid = None
+
+    def get(self, language):
+        """
+        Возвращает модель языка, загружая ее при необходимости.
+
+        Аргументы:
+            language (str): Язык из self.models.
+
+        Возвращает:
+            Загруженная модель.
+        """
+        return self._get(language, session=False)
+
+    def open_session(self, language):
+        """
+        Возвращает модель языка и отмечает активную сессию языка: его модель
+        не будет вытеснена до close_session(). Отметка ставится под той же
+        блокировкой, что и выдача модели, поэтому модель не может быть
+        вытеснена между ними.
+
+        Аргументы:
+            language (str): Язык из self.models.
+
+        Возвращает:
+            Загруженная модель.
+        """
+        return self._get(language, session=True)
+
+    def close_session(self, language):
+        """
+        Снимает отметку активной сессии языка.
+        """
+        with self.lock:
+            count = self.sessions.get(language, 0) - 1
+            if count > 0:
+                self.sessions[language] = count
+            else:
+                self.sessions.pop(language, None)
+            evicted = self._evict()
+        self._release(evicted)
+
+    def sweep(self):
+        """
+        Освобождает модели, простаивающие дольше idle_seconds.
+        """
+        with self.lock:
+            evicted = self._evict()
+        self._release(evicted)
+
+    def _get(self, language, session):
+        self._start_sweeper()
+        model = self._use(language, session)
+        if model is not None:
+            return model
+        with self.load_locks[language]:
+            # Модель могла загрузить другая сессия, пока мы ждали
+            model = self._use(language, session)
+            if model is not None:
+                return model
+            spec = self.models[language]
+            model = self.registry.acquire(
+                spec["dir"], lambda path: self.loader(spec, path)
+            )
+            size = self._size(spec["dir"])
+            # Запись сразу отмечается использованной (и сессия учитывается)
+            # под той же блокировкой, иначе проверка простоя могла бы
+            # вытеснить только что загруженную модель
+            with self.lock:
+                self.loaded[language] = [model, time.monotonic(), size]
+                if session:
+                    self.sessions[language] = self.sessions.get(language, 0) + 1
+                evicted = self._evict(keep=language)
+        self._release(evicted)
+        return model
+
+    def _use(self, language, session):
+        with self.lock:
+            entry = self.loaded.get(language)
+            if entry is None:
+                return None
+            entry[1] = time.monotonic()
+            self.loaded.move_to_end(language)
+            if session:
+                self.sessions[language] = self.sessions.get(language, 0) + 1
+            evicted = self._evict(keep=language)
+        self._release(evicted)
+        return entry[0]
+
+    def _size(self, directory):
+        path = self.registry.key(directory)[0]
+        for model in self.registry.report():
+            if model["path"] == path:
+                # Прирост RSS при загрузке точнее, размер на диске - оценка
+                return model["rss_bytes"] or model["disk_bytes"]
+        return 0
+
+    def _evict(self, keep=None):
+        # Вызывается под self.lock; возвращает вытесненные языки, модели
+        # которых освобождаются в реестре уже без блокировки пула
+        now = time.monotonic()
+        evictable = [
+            language for language in self.loaded
+            if language not in self.pinned
+            and language not in self.sessions
+            and language != keep
+        ]
+        total = None
+        if self.max_memory_bytes is not None:
+            total = sum(entry[2] for entry in self.loaded.values())
+
+        evicted = []
+        for language in evictable:
+            over_count = (
+                self.max_models is not None
+                and len(self.loaded) > self.max_models
+            )
+            over_memory = total is not None and total > self.max_memory_bytes
+            idle = (
+                self.idle_seconds is not None
+                and now - self.loaded[language][1] > self.idle_seconds
+            )
+            if not (over_count or over_memory or idle):
+                continue
+            if total is not None:
+                total -= self.loaded[language][2]
+            del self.loaded[language]
+            evicted.append(language)
+        return evicted
+
+    def _release(self, languages):
+        for language in languages:
+            self.registry.release(self.models[language]["dir"])
+            logging.info(f"Модель языка {language} выгружена из пула")
+
+    def _start_sweeper(self):
+        if self.idle_seconds is None or self._sweeper_pid == os.getpid():
+            return
+        with self.lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+        threading.Thread(
+            target=self._sweep_loop, name="model-pool-sweeper", daemon=True
+        ).start()
+
+    def _sweep_loop(self):
+        interval = max(1.0, self.idle_seconds / 2)
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Ошибка проверки простоя моделей: {e}")
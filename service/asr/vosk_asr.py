@@ -1,66 +1,268 @@
 import os
+import threading
 import wave
 import json
-import subprocess
-import shutil
-from vosk import Model, KaldiRecognizer
+from vosk import KaldiRecognizer
 from utils.audio_utils import save_audio_to_file
+from service.executor.inference_executor import get_executor
+from service.models.model_registry import get_model_registry, load_vosk_model
+from utils.lazy_resource import LazyResource
 from .asr_interface import ASRInterface
+from .model_pool import LanguageModelPool
 
+# Размер порции PCM, подаваемой в распознаватель за один вызов (4000 фреймов)
+FEED_CHUNK_BYTES = 8000
 
-def download_and_extract_model(model_url, model_zip, model_dir):
+
+class VoskSession:
     """
-    Скачивает и извлекает модель Vosk, если она не установлена.
+    Состояние потокового распознавания одного клиента.
 
-    :param model_vosk_url: URL для скачивания модели.
-    :param model_vosk_zip: Имя zip-файла модели.
-    :param model_vosk_dir: Директория для установки модели.
+    Атрибуты:
+        recognizer (KaldiRecognizer): Долгоживущий распознаватель сессии.
+        language (str): Язык модели распознавателя.
+        segments (list): Тексты высказываний, завершенных распознавателем с
+                         последнего finalize.
     """
-    if not os.path.exists(model_dir):
-        print("Скачивание модели...")
-        subprocess.run(["wget", model_url, "-O", model_zip], check=True)
-        subprocess.run(["unzip", model_zip], check=True)
-        extracted_dir = model_zip.replace(".zip", "")
-        shutil.move(extracted_dir, model_dir)
-        os.remove(model_zip)
-        print("Модель успешно скачана и установлена.")
+
+    def __init__(self, recognizer, language):
+        self.recognizer = recognizer
+        self.language = language
+        self.segments = []
 
 
 class VoskASR(ASRInterface):
+    """
+    Распознавание речи на Vosk с выбором модели по языку сессии.
+
+    Язык берется из client.config["language"]; модели языков из
+    language_models загружаются по требованию в пул LanguageModelPool,
+    ограниченный числом моделей (max_loaded_models), их размером
+    (max_models_memory_mb) и временем простоя (model_idle_seconds).
+    Закрепленные языки (pinned_languages, по умолчанию язык по умолчанию)
+    не вытесняются. Для языков, которых нет в language_models, используется
+    default_language.
+    """
+
     def __init__(self, **kwargs):
         self.model_dir = kwargs.get("model_vosk_dir", "values/vosk-model-small-ru-0.22")
         self.model_url = kwargs.get(
             "model_vosk_url", "https://alphacephei.com/vosk/models/vosk-model-small-ru-0.22.zip"
         )
         self.model_zip = kwargs.get("model_vosk_zip", "values/vosk-model-small-ru.zip")
+        self.sample_rate = kwargs.get("sample_rate", 16000)
+        # Потоковый режим: долгоживущий распознаватель на каждую сессию,
+        # данные подаются из памяти без промежуточного WAV-файла
+        self.streaming = kwargs.get("streaming", True)
+
+        # Модель скачивается и загружается при первом распознавании (в
+        # потоке исполнителя), а не при старте сервера; экземпляр модели
+        # общий с другими конвейерами с тем же каталогом (например, VoskVAD)
+        self.model_registry = kwargs.get("model_registry") or get_model_registry()
+
+        # Модели по языкам: язык -> каталог или {"dir", "url", "zip"}
+        self.default_language = kwargs.get("default_language", "ru")
+        self.language_models = {
+            self.default_language: {
+                "dir": self.model_dir,
+                "url": self.model_url,
+                "zip": self.model_zip,
+            }
+        }
+        for language, spec in kwargs.get("language_models", {}).items():
+            self.language_models[language] = (
+                {"dir": spec} if isinstance(spec, str) else dict(spec)
+            )
+        max_memory_mb = kwargs.get("max_models_memory_mb")
+        self.pool = LanguageModelPool(
+            self.language_models,
+            self.model_registry,
+            self._download_and_load,
+            pinned=kwargs.get("pinned_languages", [self.default_language]),
+            max_models=kwargs.get("max_loaded_models"),
+            max_memory_bytes=(
+                max_memory_mb * 2 ** 20 if max_memory_mb is not None else None
+            ),
+            idle_seconds=kwargs.get("model_idle_seconds"),
+        )
+        self._model = LazyResource(f"Vosk ASR model {self.model_dir}",
+                                   self.load_model)
 
+        # Сессии распознавания: client_id -> VoskSession
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """
+        Модель языка по умолчанию, загружаемая при первом обращении.
+        """
+        return self._model.get()
+
+    def load_model(self):
+        """
+        Скачивает (если нужно) и загружает модель языка по умолчанию.
+
+        :return: Загруженная модель.
+        """
+        return self.pool.get(self.default_language)
+
+    def _download_and_load(self, spec, path):
         # Убедимся, что модель загружена и установлена
-        download_and_extract_model(self.model_url, self.model_zip, self.model_dir)
+        return load_vosk_model(path, spec.get("url"), spec.get("zip"))
+
+    def resolve_language(self, client):
+        """
+        Определяет язык модели для сессии клиента.
 
-        # Загружаем модель
-        self.model = Model(self.model_dir)
+        :param client: Объект клиента.
+        :return: Язык из language_models.
+        """
+        language = client.config.get("language")
+        if language in self.language_models:
+            return language
+        return self.default_language
 
-    async def transcribe(self, client):
+    async def transcribe(self, client, audio=None):
         """
         Расшифровывает аудиоданные клиента с использованием Vosk.
 
         :param client: Объект клиента с буфером аудиоданных.
+        :param audio: Аудиоданные фрагмента; по умолчанию
+                      client.scratch_buffer.
         :return: Структура транскрипции.
         """
+        if audio is None:
+            audio = client.scratch_buffer
+
+        if self.streaming:
+            # Декодирование выполняется в пуле потоков, не блокируя цикл
+            # событий
+            text = await get_executor().run(
+                self.transcribe_stream, client, audio
+            )
+        else:
+            text = await self.transcribe_file(client, audio)
+
+        return self.make_transcription(text, self.resolve_language(client))
+
+    async def accept_audio(self, client, data):
+        """
+        Подает новые аудиоданные в распознаватель сессии клиента.
+
+        :param client: Объект клиента.
+        :param data: PCM (моно, 16-bit) для подачи в распознаватель.
+        :return: Текущая промежуточная гипотеза (PartialResult).
+        """
+        return await get_executor().run(self.accept_audio_sync, client, data)
+
+    async def finalize(self, client):
+        """
+        Завершает гипотезу сессии клиента по всем поданным данным.
+
+        :param client: Объект клиента.
+        :return: Структура транскрипции.
+        """
+        text = await get_executor().run(self.finalize_sync, client)
+        return self.make_transcription(text, self.resolve_language(client))
+
+    def make_transcription(self, text, language):
+        """
+        Оформляет распознанный текст в структуру транскрипции.
+        """
+        return {
+            "language": language,
+            "language_probability": None,
+            "text": text,
+            "words": "UNSUPPORTED_BY_VOSK",  # Для Vosk поддержка слов по умолчанию отсутствует
+        }
+
+    def transcribe_stream(self, client, audio):
+        """
+        Расшифровывает фрагмент распознавателем сессии клиента.
+
+        PCM подается в распознаватель срезами memoryview прямо из буфера
+        фрагмента, поэтому на фрагмент не создается ни файл, ни новый
+        распознаватель.
+
+        :param client: Объект клиента.
+        :param audio: Аудиоданные фрагмента.
+        :return: Распознанный текст.
+        """
+        self.accept_audio_sync(client, audio)
+        return self.finalize_sync(client)
+
+    def accept_audio_sync(self, client, data):
+        """
+        Синхронно подает PCM в распознаватель сессии.
+
+        Завершенные распознавателем высказывания (Result) копятся в сессии
+        до вызова finalize_sync().
+
+        :param client: Объект клиента.
+        :param data: bytes-подобный объект с PCM.
+        :return: Текущая промежуточная гипотеза.
+        """
+        if client.sampling_rate != self.sample_rate or client.samples_width != 2:
+            raise ValueError("Аудиоданные должны быть в формате моно, 16-bit, 16 kHz")
+
+        session = self.get_session(client)
+        rec = session.recognizer
+
+        with memoryview(data) as view:
+            for offset in range(0, len(view), FEED_CHUNK_BYTES):
+                # Срез memoryview не копирует буфер; привязка vosk (cffi)
+                # принимает только bytes, поэтому копируется лишь порция
+                if rec.AcceptWaveform(bytes(view[offset:offset + FEED_CHUNK_BYTES])):
+                    session.segments.append(
+                        json.loads(rec.Result()).get("text", "")
+                    )
+
+        return json.loads(rec.PartialResult()).get("partial", "")
+
+    def finalize_sync(self, client):
+        """
+        Синхронно завершает гипотезу сессии.
+
+        :param client: Объект клиента.
+        :return: Распознанный текст всех поданных с прошлого вызова данных.
+        """
+        session = self.get_session(client)
+        # FinalResult сбрасывает состояние декодера, распознаватель
+        # готов к следующему фрагменту
+        session.segments.append(
+            json.loads(session.recognizer.FinalResult()).get("text", "")
+        )
+        text = " ".join(part for part in session.segments if part)
+        session.segments = []
+        return text
+
+    async def transcribe_file(self, client, audio):
+        """
+        Расшифровывает фрагмент через временный WAV-файл.
+
+        :param client: Объект клиента.
+        :param audio: Аудиоданные фрагмента.
+        :return: Распознанный текст.
+        """
         # Сохраняем аудиоданные во временный файл
         file_path = await save_audio_to_file(
-            client.scratch_buffer, client.get_file_name()
+            audio, client.get_file_name(), sample_rate=client.sampling_rate
         )
 
         # Проверяем аудиофайл на соответствие требованиям Vosk
         wf = wave.open(file_path, "rb")
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
             wf.close()
             os.remove(file_path)
-            raise ValueError("Аудиофайл должен быть в формате WAV, моно, 16-bit, 16 kHz")
+            raise ValueError("Аудиофайл должен быть в формате WAV, моно, 16-bit")
 
-        # Создаем распознаватель
-        rec = KaldiRecognizer(self.model, 16000)
+        # Создаем распознаватель с моделью языка клиента; загрузка модели
+        # выполняется в пуле потоков
+        model = await get_executor().run(
+            self.pool.get, self.resolve_language(client)
+        )
+        rec = KaldiRecognizer(model, wf.getframerate())
         text = ""
 
         # Расшифровка аудиофайла
@@ -76,10 +278,53 @@ class VoskASR(ASRInterface):
         wf.close()
         os.remove(file_path)
 
-        # Возвращаем результат в нужной структуре
-        return {
-            "language": "ru",
-            "language_probability": None,
-            "text": text.strip(),
-            "words": "UNSUPPORTED_BY_VOSK",  # Для Vosk поддержка слов по умолчанию отсутствует
-        }
+        return text.strip()
+
+    def get_session(self, client):
+        """
+        Возвращает сессию распознавания клиента, создавая ее при первом
+        обращении.
+
+        :param client: Объект клиента.
+        :return: VoskSession, закрепленная за клиентом.
+        :raises: RuntimeError, если клиент уже отключен (release()).
+        """
+        if client.closed:
+            raise RuntimeError(f"Сессия клиента {client.client_id} закрыта")
+        language = self.resolve_language(client)
+        session = self.sessions.get(client.client_id)
+        if session is not None and session.language != language:
+            # Клиент сменил язык: распознаватель старой модели не подходит
+            self._close_session(client.client_id)
+            session = None
+        if session is None:
+            # Модель может загружаться долго, поэтому без блокировки
+            model = self.pool.open_session(language)
+            session = VoskSession(
+                KaldiRecognizer(model, self.sample_rate), language
+            )
+            with self.sessions_lock:
+                if not client.closed:
+                    self.sessions[client.client_id] = session
+                    return session
+            # Клиент отключился, пока создавалась сессия
+            self.pool.close_session(language)
+            raise RuntimeError(f"Сессия клиента {client.client_id} закрыта")
+        return session
+
+    def release(self, client):
+        """
+        Освобождает распознаватель сессии отключившегося клиента и отмечает
+        клиента закрытым: get_session() больше не создаст для него сессию.
+
+        :param client: Объект клиента.
+        """
+        with self.sessions_lock:
+            client.closed = True
+        self._close_session(client.client_id)
+
+    def _close_session(self, client_id):
+        with self.sessions_lock:
+            session = self.sessions.pop(client_id, None)
+        if session is not None:
+            self.pool.close_session(session.language)
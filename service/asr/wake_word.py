@@ -0,0 +1,68 @@
+import json
+
+from vosk import KaldiRecognizer
+
+# Результаты WakeWordSpotter.accept
+DETECTED = "detected"
+REJECTED = "rejected"
+
+
+class WakeWordSpotter:
+    """
+    Детектор ключевых слов активации на распознавателе Kaldi с грамматикой.
+
+    Распознаватель ограничен грамматикой из ключевых слов и "[unk]", поэтому
+    декодирование на порядки дешевле полного словаря модели и может
+    выполняться непрерывно.
+
+    Атрибуты:
+        keywords (set): Ключевые слова активации в нижнем регистре.
+        recognizer (KaldiRecognizer): Распознаватель с грамматикой.
+    """
+
+    def __init__(self, model, keywords, sample_rate=16000):
+        """
+        Аргументы:
+            model: Загруженная модель Vosk.
+            keywords (list): Ключевые слова активации. Слова, которых нет в
+                             словаре модели, Vosk пропускает с
+                             предупреждением.
+            sample_rate (int): Частота дискретизации в Гц.
+        """
+        self.keywords = {keyword.lower() for keyword in keywords}
+        grammar = json.dumps(sorted(self.keywords) + ["[unk]"], ensure_ascii=False)
+        self.recognizer = KaldiRecognizer(model, sample_rate, grammar)
+
+    def accept(self, data):
+        """
+        Подает PCM в распознаватель и проверяет наличие ключевого слова.
+
+        Аргументы:
+            data (bytes): PCM (моно, 16-bit).
+
+        Возвращает:
+            str: DETECTED, если ключевое слово распознано; REJECTED, если
+                 высказывание завершилось без ключевого слова; None, если
+                 высказывание еще продолжается.
+        """
+        if self.recognizer.AcceptWaveform(data):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            return DETECTED if self.contains_keyword(text) else REJECTED
+
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        if self.contains_keyword(partial):
+            self.recognizer.Reset()
+            return DETECTED
+        return None
+
+    def contains_keyword(self, text):
+        """
+        Проверяет, есть ли в тексте ключевое слово.
+        """
+        return any(word in self.keywords for word in text.split())
+
+    def reset(self):
+        """
+        Сбрасывает состояние распознавателя.
+        """
+        self.recognizer.Reset()
@@ -1,6 +1,6 @@
 from .realtime_vosk_transcribe import RealtimeVoskTranscribe
-from .vosk_asr_vad_v1 import VoskAsrVadv1;
-from .vosk_asr_vad import VoskAsrVad;
+from .vosk_asr_vad_v1 import VoskAsrVadv1
+from .vosk_asr_vad import VoskAsrVad
 
 
 class BufferingStrategyFactory:
@@ -28,8 +28,11 @@ class BufferingStrategyFactory:
         указанному типу. Если тип не распознан, генерируется ValueError.
 
         Аргументы:
-            type (str): Тип стратегии буферизации для создания. В данный момент
-                        поддерживается 'realtime_vosk_transcribe'.
+            type (str): Тип стратегии буферизации для создания:
+                        'vosk_asr_vad_v1' (команды и вопросы по рецепту;
+                        'silence_at_end_of_chunk' - прежнее имя),
+                        'vosk_asr_vad' (запись после ключевой фразы) или
+                        'realtime_vosk_transcribe' (только транскрипция).
             client (Client): Экземпляр клиента, связанный со стратегией
                              буферизации.
             **kwargs: Дополнительные именованные аргументы, специфичные для
@@ -46,10 +49,12 @@ class BufferingStrategyFactory:
                        "realtime_vosk_transcribe", client
                        )
         """
-        return VoskAsrVadv1(client, **kwargs)
-        return VoskAsrVad(client, **kwargs)
-
-        if type == "realtime_vosk_transcribe":
+        # Модели NLP загружает только VoskAsrVadv1
+        if type in ("vosk_asr_vad_v1", "silence_at_end_of_chunk"):
+            return VoskAsrVadv1(client, **kwargs)
+        elif type == "vosk_asr_vad":
+            return VoskAsrVad(client, **kwargs)
+        elif type == "realtime_vosk_transcribe":
             return RealtimeVoskTranscribe(client, **kwargs)
         else:
             raise ValueError(f"Неизвестный тип стратегии буферизации: {type}")
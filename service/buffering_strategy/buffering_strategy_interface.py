@@ -13,6 +13,7 @@ class BufferingStrategyInterface:
     Методы:
         process_audio: Обработка аудиоданных. Этот метод должен быть
                        реализован в подклассах.
+        close: Остановка фоновой обработки стратегии.
     """
 
     def process_audio(self, websocket, vad_pipeline, asr_pipeline):
@@ -37,3 +38,11 @@ class BufferingStrategyInterface:
         raise NotImplementedError(
             "Этот метод должен быть реализован в подклассах."
         )
+
+    def close(self):
+        """
+        Останавливает фоновую обработку стратегии: очереди фрагментов и
+        подачу данных в распознаватель. Вызывается перед заменой стратегии
+        новой конфигурацией и при отключении клиента, до освобождения
+        сессии в конвейерах. По умолчанию ничего не делает.
+        """
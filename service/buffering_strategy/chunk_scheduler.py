@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+# Политики обработки фрагментов, которые накопились, пока декодируется
+# предыдущий
+QUEUE = "queue"
+COALESCE = "coalesce"
+DROP_OLDEST = "drop_oldest"
+
+
+class ChunkJob:
+    """
+    Фрагмент аудио, ожидающий обработки.
+
+    Атрибуты:
+        audio (bytearray): PCM фрагмента.
+        duration (float): Длительность фрагмента в секундах.
+        captured_at (float): Время (time.monotonic) закрытия первого
+                             фрагмента задания.
+        finals (list): Итоговые гипотезы режима partial_results
+                       (asyncio.Future) для фрагментов задания.
+        context (dict): Данные стратегии для обработки задания (веб-сокет,
+                        конвейеры). Через context["websocket"] клиенту
+                        сообщается о пропущенном аудио.
+    """
+
+    def __init__(self, audio, duration, final=None, **context):
+        self.audio = audio
+        self.duration = duration
+        self.captured_at = time.monotonic()
+        self.finals = [final] if final is not None else []
+        self.context = context
+
+    def merge(self, other):
+        """
+        Присоединяет к заданию следующий фрагмент.
+        """
+        self.audio += other.audio
+        self.duration += other.duration
+        self.finals.extend(other.finals)
+
+
+class ChunkScheduler:
+    """
+    Очередь фрагментов одной сессии с единственным обработчиком.
+
+    Пока фрагмент N декодируется, стратегия продолжает накапливать и
+    отправлять в очередь фрагмент N+1. Если обработка не успевает за
+    потоком, политика определяет поведение:
+
+    - "queue": все фрагменты обрабатываются по порядку, задержка растет;
+    - "coalesce": ожидающие фрагменты объединяются в одно задание, которое
+      декодируется за один проход;
+    - "drop_oldest": в очереди остается не больше max_pending фрагментов,
+      самые старые отбрасываются. Перед обработкой следующего задания
+      клиент получает сообщение {"type": "skipped", "seconds": ...} с
+      длительностью отброшенного аудио.
+
+    Атрибуты:
+        handler: Корутина handler(job), обрабатывающая задание.
+        policy (str): Политика переполнения.
+        max_pending (int): Предел очереди для политики "drop_oldest".
+        dropped_chunks (int): Число отброшенных фрагментов.
+        skipped_seconds (float): Длительность отброшенного аудио, о которой
+                                 клиенту еще не сообщено.
+        processed_seconds (float): Длительность обработанного аудио.
+        closed (bool): Очередь закрыта close() и больше не принимает
+                       фрагменты.
+    """
+
+    def __init__(self, handler, policy=QUEUE, max_pending=4):
+        if policy not in (QUEUE, COALESCE, DROP_OLDEST):
+            raise ValueError(f"Неизвестная политика очереди фрагментов: {policy}")
+        self.handler = handler
+        self.policy = policy
+        self.max_pending = max_pending
+        self.jobs = deque()
+        self.current = None
+        self.task = None
+        self.dropped_chunks = 0
+        self.skipped_seconds = 0.0
+        self.processed_seconds = 0.0
+        self.closed = False
+
+    @property
+    def depth(self):
+        """
+        Число заданий в очереди, включая обрабатываемое.
+        """
+        return len(self.jobs) + (1 if self.current is not None else 0)
+
+    @property
+    def lag_seconds(self):
+        """
+        Отставание от реального времени: сколько секунд назад был закрыт
+        самый старый еще не обработанный фрагмент.
+        """
+        oldest = self.current or (self.jobs[0] if self.jobs else None)
+        if oldest is None:
+            return 0.0
+        return time.monotonic() - oldest.captured_at
+
+    @property
+    def pending_seconds(self):
+        """
+        Длительность аудио, ожидающего обработки, в секундах.
+        """
+        pending = sum(job.duration for job in self.jobs)
+        if self.current is not None:
+            pending += self.current.duration
+        return pending
+
+    def submit(self, job):
+        """
+        Ставит фрагмент в очередь и запускает обработчик, если он не
+        работает.
+
+        Аргументы:
+            job (ChunkJob): Закрытый фрагмент.
+        """
+        if self.closed:
+            _cancel_finals(job)
+            return
+        if self.policy == COALESCE and self.jobs:
+            self.jobs[-1].merge(job)
+        else:
+            self.jobs.append(job)
+            if self.policy == DROP_OLDEST:
+                while len(self.jobs) > self.max_pending:
+                    self._discard(self.jobs.popleft())
+
+        if self.task is None:
+            self.task = asyncio.create_task(self._consume())
+
+    def close(self):
+        """
+        Закрывает очередь при отключении клиента или смене стратегии:
+        останавливает обработчик, отбрасывает ожидающие задания и отменяет
+        их итоговые гипотезы, чтобы ни одно задание не обратилось к
+        конвейерам после освобождения сессии.
+        """
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.current is not None:
+            _cancel_finals(self.current)
+            self.current = None
+        while self.jobs:
+            _cancel_finals(self.jobs.popleft())
+
+    def _discard(self, job):
+        """
+        Отбрасывает задание. Итоговые гипотезы его фрагментов все равно
+        вычисляются (распознаватель сессии должен завершить гипотезу), но
+        их результат и ошибки поглощаются.
+        """
+        self.dropped_chunks += 1
+        self.skipped_seconds += job.duration
+        for final in job.finals:
+            final.add_done_callback(_consume_result)
+        logging.warning(
+            f"Обработка не успевает, отброшен фрагмент {job.duration:.2f} с"
+        )
+
+    async def _report_skipped(self, job):
+        websocket = job.context.get("websocket")
+        if not self.skipped_seconds or websocket is None:
+            return
+        seconds, self.skipped_seconds = self.skipped_seconds, 0.0
+        await websocket.send(
+            json.dumps({"type": "skipped", "seconds": round(seconds, 3)})
+        )
+
+    async def _consume(self):
+        try:
+            while self.jobs:
+                self.current = self.jobs.popleft()
+                try:
+                    await self._report_skipped(self.current)
+                    await self.handler(self.current)
+                except Exception as e:
+                    logging.error(f"Ошибка обработки фрагмента: {e}")
+                self.processed_seconds += self.current.duration
+                self.current = None
+        finally:
+            self.current = None
+            self.task = None
+
+
+def _cancel_finals(job):
+    for final in job.finals:
+        if not final.done():
+            final.cancel()
+
+
+def _consume_result(future):
+    # Забирает исключение отброшенной гипотезы, чтобы asyncio не сообщал
+    # "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
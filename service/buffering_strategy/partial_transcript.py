@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+from service.executor.capacity_manager import PARTIALS, get_capacity_manager
+
+
+class PartialTranscriptStreamer:
+    """
+    Передает клиенту промежуточные гипотезы распознавания, пока фрагмент
+    еще накапливается.
+
+    Новые аудиоданные из буфера клиента подаются в распознаватель сессии по
+    мере поступления, а гипотезы PartialResult отправляются клиенту
+    сообщениями {"type": "partial"} не чаще, чем раз в interval_seconds.
+    Когда стратегия буферизации закрывает фрагмент, finalize() ставит в
+    очередь завершение гипотезы, и итоговая транскрипция возвращается с
+    "type": "final" без повторного декодирования фрагмента.
+
+    Подача данных и завершение выполняются одной задачей строго по порядку,
+    поэтому аудио следующего фрагмента не попадает в итог предыдущего.
+
+    Атрибуты:
+        client (Client): Клиент, для которого передаются гипотезы.
+        interval_seconds (float): Минимальный интервал между сообщениями
+                                  {"type": "partial"}.
+        min_feed_bytes (int): Минимальный объем новых данных для подачи в
+                              распознаватель.
+    """
+
+    def __init__(self, client, interval_seconds=0.3, min_feed_seconds=0.1):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.min_feed_bytes = int(
+            min_feed_seconds * client.sampling_rate * client.samples_width
+        )
+        # Курсор чтения буфера клиента: данные читаются без фиксации,
+        # стратегия сама переносит их в scratch_buffer
+        self.reader = client.buffer.reader()
+        self.pending = bytearray()
+        self.operations = deque()
+        self.task = None
+        self.websocket = None
+        self.asr_pipeline = None
+        self.last_sent = 0.0
+        self.last_text = ""
+        # Гипотеза, которую завершает обработчик в данный момент
+        self.finalizing = None
+        self.closed = False
+
+    def feed(self, websocket, asr_pipeline):
+        """
+        Забирает новые данные из буфера клиента и, если их достаточно,
+        ставит их в очередь подачи в распознаватель.
+
+        Аргументы:
+            websocket: Веб-сокет для отправки промежуточных гипотез.
+            asr_pipeline: Конвейер ASR с поддержкой accept_audio().
+        """
+        self.websocket = websocket
+        self.asr_pipeline = asr_pipeline
+
+        for view in self.reader.read():
+            self.pending += memoryview(view)
+
+        # При перегрузке промежуточные гипотезы не строятся: данные копятся
+        # и подаются в распознаватель одним вызовом при finalize()
+        if (
+            len(self.pending) >= self.min_feed_bytes
+            and not get_capacity_manager().should_shed(PARTIALS)
+        ):
+            self._enqueue(("feed", bytes(self.pending)))
+            self.pending.clear()
+
+    def finalize(self, asr_pipeline):
+        """
+        Закрывает текущий фрагмент: ставит в очередь оставшиеся данные и
+        завершение гипотезы.
+
+        Вызывается синхронно перед тем, как стратегия переносит буфер
+        клиента в scratch_buffer.
+
+        Аргументы:
+            asr_pipeline: Конвейер ASR с поддержкой accept_audio() и
+                          finalize().
+
+        Возвращает:
+            asyncio.Future: Итоговая транскрипция фрагмента с
+                            "type": "final".
+        """
+        self.asr_pipeline = asr_pipeline
+        for view in self.reader.read():
+            self.pending += memoryview(view)
+        if self.pending:
+            self._enqueue(("feed", bytes(self.pending)))
+            self.pending.clear()
+
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(("final", future))
+        return future
+
+    def close(self):
+        """
+        Останавливает подачу данных в распознаватель при отключении клиента
+        или смене стратегии: отменяет задачу, отбрасывает очередь и отменяет
+        незавершенные итоговые гипотезы.
+        """
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        futures = [payload for kind, payload in self.operations if kind == "final"]
+        if self.finalizing is not None:
+            futures.append(self.finalizing)
+            self.finalizing = None
+        self.operations.clear()
+        for future in futures:
+            if not future.done():
+                future.cancel()
+
+    def _enqueue(self, operation):
+        if self.closed:
+            if operation[0] == "final":
+                operation[1].cancel()
+            return
+        self.operations.append(operation)
+        if self.task is None:
+            self.task = asyncio.create_task(self._consume())
+
+    async def _consume(self):
+        try:
+            while self.operations:
+                kind, payload = self.operations.popleft()
+                if kind == "feed":
+                    # Если подача отстает, объединяем накопившиеся порции
+                    parts = [payload]
+                    while self.operations and self.operations[0][0] == "feed":
+                        parts.append(self.operations.popleft()[1])
+                    await self._feed(b"".join(parts))
+                else:
+                    await self._finalize(payload)
+        finally:
+            self.task = None
+
+    async def _feed(self, data):
+        try:
+            text = await self.asr_pipeline.accept_audio(self.client, data)
+            await self._send_partial(text)
+        except Exception as e:
+            logging.error(f"Ошибка промежуточного распознавания: {e}")
+
+    async def _finalize(self, future):
+        self.finalizing = future
+        try:
+            transcription = await self.asr_pipeline.finalize(self.client)
+        except Exception as e:
+            future.set_exception(e)
+            return
+        finally:
+            self.finalizing = None
+        transcription["type"] = "final"
+        self.last_text = ""
+        future.set_result(transcription)
+
+    async def _send_partial(self, text):
+        now = time.monotonic()
+        if (
+            not text
+            or text == self.last_text
+            or now - self.last_sent < self.interval_seconds
+        ):
+            return
+        self.last_text = text
+        self.last_sent = now
+        await self.websocket.send(
+            json.dumps({"type": "partial", "text": text})
+        )
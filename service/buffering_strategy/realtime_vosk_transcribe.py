@@ -1,9 +1,11 @@
-import asyncio
 import json
 import os
 import time
 
 from .buffering_strategy_interface import BufferingStrategyInterface
+from .chunk_scheduler import ChunkJob, ChunkScheduler
+from .partial_transcript import PartialTranscriptStreamer
+from service.executor.inference_executor import get_executor
 
 
 class RealtimeVoskTranscribe(BufferingStrategyInterface):
@@ -55,9 +57,31 @@ class RealtimeVoskTranscribe(BufferingStrategyInterface):
                 "error_if_not_realtime", False
             )
 
-        self.processing_flag = False
+        # Промежуточные гипотезы {"type": "partial"} по мере поступления аудио
+        self.partials = None
+        if kwargs.get("partial_results", False):
+            self.partials = PartialTranscriptStreamer(
+                client, kwargs.get("partial_interval_seconds", 0.3)
+            )
+
+        # Очередь фрагментов сессии: захват фрагмента N+1 идет параллельно
+        # с декодированием фрагмента N
+        self.scheduler = ChunkScheduler(
+            self.process_audio_async,
+            kwargs.get("scheduler_policy", "queue"),
+            kwargs.get("max_pending_chunks", 4),
+        )
 
-    def process_audio(self, websocket, asr_pipeline):
+    def close(self):
+        """
+        Останавливает очередь фрагментов и подачу промежуточных данных
+        сессии.
+        """
+        self.scheduler.close()
+        if self.partials is not None:
+            self.partials.close()
+
+    def process_audio(self, websocket, vad_pipeline, asr_pipeline):
         """
         Обрабатывает аудиофрагменты, проверяя их длину и планируя асинхронную
         обработку.
@@ -70,49 +94,61 @@ class RealtimeVoskTranscribe(BufferingStrategyInterface):
             vad_pipeline: Конвейер для детекции голосовой активности.
             asr_pipeline: Конвейер для автоматического распознавания речи.
         """
-        chunk_length_in_bytes = (
-            self.chunk_length_seconds
-            * self.client.sampling_rate
-            * self.client.samples_width
+        if self.partials is not None:
+            self.partials.feed(websocket, asr_pipeline)
+
+        chunk_length_in_samples = int(
+            self.chunk_length_seconds * self.client.sampling_rate
         )
-        if len(self.client.buffer) > chunk_length_in_bytes:
-            if self.processing_flag:
-                exit(
-                    "Ошибка в режиме реального времени: попытка обработки нового "
-                    "фрагмента, пока предыдущий еще обрабатывается."
+        if self.client.buffer.available > chunk_length_in_samples:
+            if get_executor().is_saturated():
+                # Инференс перегружен: продолжаем накапливать аудио и
+                # отправим фрагмент, когда очередь освободится
+                return
+            final_transcription = None
+            if self.partials is not None:
+                final_transcription = self.partials.finalize(asr_pipeline)
+            audio = bytearray()
+            samples = self.client.buffer.drain_into(audio)
+            self.scheduler.submit(
+                ChunkJob(
+                    audio,
+                    samples / self.client.sampling_rate,
+                    final_transcription,
+                    websocket=websocket,
+                    asr_pipeline=asr_pipeline,
                 )
-
-            self.client.scratch_buffer += self.client.buffer
-            self.client.buffer.clear()
-            self.processing_flag = True
-            # Планируем обработку в отдельной задаче
-            asyncio.create_task(
-                self.process_audio_async(websocket, asr_pipeline)
             )
 
-    async def process_audio_async(self, websocket, asr_pipeline):
+    async def process_audio_async(self, job):
         """
-        Асинхронно обрабатывает аудио для детекции активности и транскрипции.
+        Асинхронно обрабатывает фрагмент из очереди сессии.
 
-        Этот метод выполняет ресурсоемкую обработку, включая детекцию голосовой
-        активности и транскрипцию аудиоданных. Он отправляет результаты
-        транскрипции через веб-сокет.
+        Этот метод выполняет ресурсоемкую транскрипцию аудиоданных и
+        отправляет результат через веб-сокет.
 
         Аргументы:
-            websocket (Websocket): Веб-сокет для отправки результатов
-                                   транскрипции.
-            vad_pipeline: Конвейер для детекции голосовой активности.
-            asr_pipeline: Конвейер для автоматического распознавания речи.
+            job (ChunkJob): Фрагмент с веб-сокетом и конвейером ASR в
+                            job.context.
         """
+        websocket = job.context["websocket"]
+        asr_pipeline = job.context["asr_pipeline"]
         start = time.time()
 
-        transcription = await asr_pipeline.transcribe(self.client)
+        if job.finals:
+            # Фрагмент уже подан в распознаватель по мере поступления
+            transcriptions = [await final for final in job.finals]
+            transcription = transcriptions[-1]
+            transcription["text"] = " ".join(
+                t["text"] for t in transcriptions if t["text"]
+            )
+        else:
+            transcription = await asr_pipeline.transcribe(
+                self.client, job.audio
+            )
         if transcription["text"] != "":
             end = time.time()
             transcription["processing_time"] = end - start
             send_transcription = json.dumps(transcription)
             await websocket.send(send_transcription)
-        self.client.scratch_buffer.clear()
         self.client.increment_file_counter()
-
-        self.processing_flag = False
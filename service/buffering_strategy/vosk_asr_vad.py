@@ -1,8 +1,10 @@
-import asyncio
 import json
 import os
 import time
 from .buffering_strategy_interface import BufferingStrategyInterface
+from .chunk_scheduler import COALESCE, ChunkJob, ChunkScheduler
+from .wake_word_gate import WakeWordGate
+from service.executor.inference_executor import get_executor
 
 
 class VoskAsrVad(BufferingStrategyInterface):
@@ -27,10 +29,34 @@ class VoskAsrVad(BufferingStrategyInterface):
             "activation_keywords", ["мульти", "мультиварка", "мультик", "мультиварочка"]
         )
 
+        # Ступень активации: ключевые слова ищет распознаватель с грамматикой
+        # activation_keywords вместо проверки текста сегментов VAD
+        self.wake_word = None
+        if kwargs.get("wake_word", False):
+            self.wake_word = WakeWordGate(
+                client,
+                self.activation_keywords,
+                kwargs.get("wake_word_window_seconds", 3.0),
+            )
+
         self.recording = False
         self.last_voice_activity = time.time()
         self.processing_flag = False
 
+        # Проверки VAD выполняются одна за другой; проверки, запрошенные
+        # пока идет предыдущая, объединяются в одну
+        self.scheduler = ChunkScheduler(
+            self.handle_job,
+            kwargs.get("scheduler_policy", COALESCE),
+            kwargs.get("max_pending_chunks", 4),
+        )
+
+    def close(self):
+        """
+        Останавливает очередь проверок VAD сессии.
+        """
+        self.scheduler.close()
+
     def process_audio(self, websocket, vad_pipeline, asr_pipeline):
         """
         Обрабатывает аудиоданные, управляя записью и транскрипцией.
@@ -43,8 +69,41 @@ class VoskAsrVad(BufferingStrategyInterface):
         if self.processing_flag:
             return
 
+        if self.wake_word is not None and not self.recording:
+            if not self.wake_word.process(asr_pipeline):
+                return
+            self.recording = True
+            self.last_voice_activity = time.time()
+
+        if get_executor().is_saturated():
+            # Инференс перегружен: пропускаем проверку VAD для этого
+            # сообщения, аудио остается в буфере клиента
+            return
+
         # Проверяем наличие голосовой активности
-        asyncio.create_task(self.handle_audio(websocket, vad_pipeline, asr_pipeline))
+        self.scheduler.submit(
+            ChunkJob(
+                bytearray(),
+                0.0,
+                websocket=websocket,
+                vad_pipeline=vad_pipeline,
+                asr_pipeline=asr_pipeline,
+            )
+        )
+
+    async def handle_job(self, job):
+        """
+        Выполняет проверку из очереди сессии.
+
+        Аргументы:
+            job (ChunkJob): Задание с веб-сокетом и конвейерами в
+                            job.context.
+        """
+        await self.handle_audio(
+            job.context["websocket"],
+            job.context["vad_pipeline"],
+            job.context["asr_pipeline"],
+        )
 
     async def handle_audio(self, websocket, vad_pipeline, asr_pipeline):
         """
@@ -69,8 +128,7 @@ class VoskAsrVad(BufferingStrategyInterface):
                 self.last_voice_activity = time.time()
 
         if self.recording:
-            self.client.scratch_buffer += self.client.buffer
-            self.client.buffer.clear()
+            self.client.buffer.drain_into(self.client.scratch_buffer)
             self.last_voice_activity = time.time()
 
             # Завершаем запись, если накоплено более 60 секунд
@@ -97,5 +155,7 @@ class VoskAsrVad(BufferingStrategyInterface):
         # Сброс состояния
         self.client.scratch_buffer.clear()
         self.client.increment_file_counter()
+        if self.wake_word is not None:
+            self.wake_word.reset()
         self.recording = False
         self.processing_flag = False
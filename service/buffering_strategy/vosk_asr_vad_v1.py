@@ -1,20 +1,22 @@
 import asyncio
 import json
+import logging
 import os
 import time
 
 
 
 from .buffering_strategy_interface import BufferingStrategyInterface
+from .chunk_scheduler import ChunkJob, ChunkScheduler
+from .partial_transcript import PartialTranscriptStreamer
+from .wake_word_gate import WakeWordGate
+from service.executor.inference_executor import get_executor
+from service.nlp import call_extractor, qa_system
+from service.nlp.call_extractor import extract_after_call
 from service.nlp.event_parser import parse_event
-from service.nlp.qa_system import get_answer_to_question
-from spacy.matcher import Matcher
-import spacy
-
-from words2numsrus import NumberExtractor
-
-nlp = spacy.load("ru_core_news_sm")
-extractor = NumberExtractor()
+from service.nlp.number_extractor import number_extractor, replace_numbers
+from service.nlp.qa_service import get_qa_service, recipe_step_tokens
+from service.nlp.recipe_store import recipe_store
 
 class VoskAsrVadv1(BufferingStrategyInterface):
     """
@@ -52,7 +54,63 @@ class VoskAsrVadv1(BufferingStrategyInterface):
         self.activation_keywords = kwargs.get(
             "activation_keywords", ["мульти","мультик", "мультиварка", "мультиварочка", "сварка", "ручка", "чка"]
         )
-        self.processing_flag = False
+        # Рецепт сессии и текущий шаг (с нуля) для контекста QA; без
+        # рецепта шаги ищутся по всем рецептам хранилища
+        self.recipe_id = kwargs.get("recipe_id")
+        # Отсев фрагментов без речи с помощью VAD перед распознаванием;
+        # имеет смысл с легковесным VAD ('energy')
+        self.vad_gate = kwargs.get("vad_gate", False)
+        # Промежуточные гипотезы {"type": "partial"} по мере поступления аудио
+        self.partials = None
+        if kwargs.get("partial_results", False):
+            self.partials = PartialTranscriptStreamer(
+                client, kwargs.get("partial_interval_seconds", 0.3)
+            )
+        # Ступень активации: до ключевого слова аудио проверяет только
+        # распознаватель с грамматикой activation_keywords
+        self.wake_word = None
+        if kwargs.get("wake_word", False):
+            self.wake_word = WakeWordGate(
+                client,
+                self.activation_keywords,
+                kwargs.get("wake_word_window_seconds", 3.0),
+            )
+        # Очередь фрагментов сессии: захват фрагмента N+1 идет параллельно
+        # с декодированием фрагмента N
+        self.scheduler = ChunkScheduler(
+            self.process_audio_async,
+            kwargs.get("scheduler_policy", "queue"),
+            kwargs.get("max_pending_chunks", 4),
+        )
+
+        # Шаг рецепта хранится в клиенте, поэтому переживает пересоздание
+        # стратегии новой конфигурацией; он задается заново при смене
+        # рецепта или явном recipe_step. Клиент меняется только после
+        # проверки остальных аргументов, чтобы отклоненная конфигурация
+        # его не затронула
+        if "recipe_step" in kwargs or client.recipe_id != self.recipe_id:
+            client.recipe_step = kwargs.get("recipe_step")
+        client.recipe_id = self.recipe_id
+
+        # Модели стратегии загружаются в фоне, пока накапливается первый
+        # фрагмент; стратегии без NLP их не загружают
+        pool = get_executor().thread_pool
+        for resource in (call_extractor.nlp, number_extractor,
+                         qa_system.qa_pipeline, recipe_store,
+                         recipe_step_tokens):
+            resource.preload(pool)
+
+
+    def close(self):
+        """
+        Останавливает очередь фрагментов, подачу промежуточных данных и
+        детектор ключевых слов сессии.
+        """
+        self.scheduler.close()
+        if self.partials is not None:
+            self.partials.close()
+        if self.wake_word is not None:
+            self.wake_word.close()
 
 
     def process_audio(self, websocket, vad_pipeline, asr_pipeline):
@@ -68,101 +126,172 @@ class VoskAsrVadv1(BufferingStrategyInterface):
             vad_pipeline: Конвейер для детекции голосовой активности.
             asr_pipeline: Конвейер для автоматического распознавания речи.
         """
-        chunk_length_in_bytes = (
-            self.chunk_length_seconds
-            * self.client.sampling_rate
-            * self.client.samples_width
+        if self.wake_word is not None and not self.wake_word.process(
+            asr_pipeline
+        ):
+            return
+
+        if self.partials is not None:
+            self.partials.feed(websocket, asr_pipeline)
+
+        chunk_length_in_samples = int(
+            self.chunk_length_seconds * self.client.sampling_rate
         )
-        if len(self.client.buffer) > chunk_length_in_bytes:
-            if self.processing_flag:
-                exit(
-                    "Ошибка в режиме реального времени: попытка обработки нового "
-                    "фрагмента, пока предыдущий еще обрабатывается."
-                )
+        if self.client.buffer.available > chunk_length_in_samples:
+            if get_executor().is_saturated():
+                # Инференс перегружен: продолжаем накапливать аудио и
+                # отправим фрагмент, когда очередь освободится
+                return
 
-            self.client.scratch_buffer += self.client.buffer
-            self.client.buffer.clear()
-            self.processing_flag = True
-            # Планируем обработку в отдельной задаче
-            asyncio.create_task(
-                self.process_audio_async(websocket, vad_pipeline, asr_pipeline)
+            final_transcription = None
+            if self.partials is not None:
+                final_transcription = self.partials.finalize(asr_pipeline)
+            audio = bytearray()
+            samples = self.client.buffer.drain_into(audio)
+            self.scheduler.submit(
+                ChunkJob(
+                    audio,
+                    samples / self.client.sampling_rate,
+                    final_transcription,
+                    websocket=websocket,
+                    vad_pipeline=vad_pipeline,
+                    asr_pipeline=asr_pipeline,
+                )
             )
+            # Один фрагмент на активацию: следующее аудио снова проверяется
+            # детектором ключевых слов
+            if self.wake_word is not None:
+                self.wake_word.reset()
 
 
-    async def process_audio_async(self, websocket, vad_pipeline, asr_pipeline):
+    async def process_audio_async(self, job):
+        """
+        Обрабатывает фрагмент из очереди сессии: распознает речь, извлекает
+        команду после обращения и отвечает событием или ответом QA.
+
+        Аргументы:
+            job (ChunkJob): Фрагмент с веб-сокетом и конвейерами в
+                            job.context.
+        """
+        websocket = job.context["websocket"]
+        vad_pipeline = job.context["vad_pipeline"]
+        asr_pipeline = job.context["asr_pipeline"]
         try:
-            transcription = await asr_pipeline.transcribe(self.client)
-            text = transcription.get("text", "").strip()
+            if job.finals:
+                # Фрагмент уже подан в распознаватель по мере поступления,
+                # остается дождаться итоговой гипотезы
+                transcriptions = [await final for final in job.finals]
+                text = " ".join(
+                    t.get("text", "").strip() for t in transcriptions
+                ).strip()
+                if text:
+                    await websocket.send(
+                        json.dumps({"type": "final", "text": text}))
+            else:
+                if self.vad_gate:
+                    vad_results = await vad_pipeline.detect_activity(
+                        self.client, job.audio)
+                    if not vad_results:
+                        return
+
+                transcription = await asr_pipeline.transcribe(
+                    self.client, job.audio)
+                text = transcription.get("text", "").strip()
             if not text:
-                self.processing_flag = False
                 return
 
-            # Проверяем на обращение к системе
-            extracted_command = self.extract_after_call(text)
+            executor = get_executor()
+
+            # Проверяем на обращение к системе (только токенизатор, дешевле
+            # передачи задачи в пул потоков, если модель уже загружена)
+            if call_extractor.nlp.loaded:
+                extracted_command = self.extract_after_call(text)
+            else:
+                extracted_command = await executor.run(
+                    self.extract_after_call, text)
             if not extracted_command:
                 await websocket.send(
                     json.dumps({"error": "No system call detected."}))
-                self.processing_flag = False
                 return
 
             # Преобразуем текстовые числа в цифровой формат
-            extracted_command = self.words_num_replace_num(extracted_command)
+            extracted_command = await executor.run(
+                self.words_num_replace_num, extracted_command)
 
             # Проверяем на событие
             event_name, event_data = parse_event(extracted_command)
             if event_name:
+                if self.recipe_id is not None and event_name in (
+                    "NEXT_STEP", "PREV_STEP"
+                ):
+                    store = await self.get_recipe_store()
+                    self.track_step(event_name, store.get(self.recipe_id))
                 response = {
                     "event": event_name,
                     "data": event_data,
                 }
                 await websocket.send(json.dumps(response))
             else:
-                # Если событие не найдено, используем Q&A
-                recipe_text = ("""
-Возьмите 2 стакана муки, 1 стакан сахара, 1 стакан молока, 2 яйца и 1 чайную ложку разрыхлителя.
-Смешайте муку, сахар и разрыхлитель в большой миске.
-Добавьте молоко и яйца, хорошо перемешайте.
-Вылейте тесто в форму для выпекания.
-Выпекайте при температуре 180 градусов Цельсия в течение 30 минут.
-""")  # Добавьте ваш текст рецепта
-                recipe_text = self.words_num_replace_num(recipe_text)
-                answer = get_answer_to_question(recipe_text, extracted_command)
-                print(answer)
-                if (answer.encode() != recipe_text.encode()):
+                # Если событие не найдено, используем Q&A по шагам рецепта,
+                # найденным для вопроса
+                store = await self.get_recipe_store()
+                steps = store.retrieve(
+                    extracted_command, self.recipe_id, self.client.recipe_step)
+                # Шаги нормализованы и токенизированы при загрузке,
+                # повторные вопросы отвечаются из кэша
+                answer = await get_qa_service().answer(
+                    steps, extracted_command)
+                logging.debug(f"Ответ QA: {answer}")
+                # Ответ, совпадающий со всем контекстом, не отправляется
+                if answer != "\n".join(steps):
                     await websocket.send(json.dumps({"answer": answer}))
 
             json.dumps({"error": "Не вопрос и не событие"})
 
         except Exception as e:
             await websocket.send(json.dumps({"error": str(e)}))
-        finally:
-            self.client.scratch_buffer.clear()
-            self.processing_flag = False
 
 
+    async def get_recipe_store(self):
+        """
+        Возвращает хранилище рецептов, загружая его в пуле потоков, если оно
+        еще не загружено.
+        """
+        if recipe_store.loaded:
+            return recipe_store.get()
+        return await get_executor().run(recipe_store.get)
+
+    def track_step(self, event_name, recipe):
+        """
+        Сдвигает текущий шаг рецепта сессии по событиям NEXT_STEP и
+        PREV_STEP в пределах шагов рецепта.
+
+        Аргументы:
+            event_name (str): Имя события.
+            recipe (Recipe): Рецепт сессии.
+        """
+        step = self.client.recipe_step
+        if step is None:
+            step = -1
+        if event_name == "NEXT_STEP":
+            step += 1
+        elif event_name == "PREV_STEP":
+            step -= 1
+        self.client.recipe_step = min(max(step, 0), len(recipe.steps) - 1)
+
     def extract_after_call(self, text):
         """
         Проверяет, содержит ли текст обращение к системе.
         """
-        print(text)
-        matcher = Matcher(nlp.vocab)
-        for keyword in self.activation_keywords:
-            pattern = [{"LOWER": {"REGEX": f"^{keyword}"}}]
-            matcher.add("CALL_PATTERN", [pattern])
-
-        doc = nlp(text.lower())
-        matches = matcher(doc)
-        if matches:
-            _, start, end = matches[0]
-            return doc[end:].text.strip()
-        return None
+        logging.debug(f"Распознанный текст: {text}")
+        return extract_after_call(text, self.activation_keywords)
 
 
     def words_num_replace_num(self, text):
         """
         Преобразует текстовые числа в цифровой формат.
         """
-        return extractor.replace_groups(text)
+        return replace_numbers(text)
 
 
 """ async def process_audio_async(self, websocket, vad_pipeline, asr_pipeline):
@@ -191,7 +320,6 @@ class VoskAsrVadv1(BufferingStrategyInterface):
             if not extracted_command:
                 await websocket.send(
                     json.dumps({"error": "No system call detected."}))
-                self.processing_flag = False
                 return
 
             # Преобразуем текстовые числа в цифровой формат
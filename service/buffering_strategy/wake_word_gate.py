@@ -0,0 +1,97 @@
+import asyncio
+import logging
+
+from service.asr.wake_word import DETECTED, REJECTED, WakeWordSpotter
+from service.executor.inference_executor import get_executor
+
+
+class WakeWordGate:
+    """
+    Ступень активации по ключевому слову перед полным распознаванием.
+
+    Пока активации нет, новое аудио из буфера клиента подается только в
+    WakeWordSpotter с грамматикой ключевых слов, а полная модель ASR не
+    запускается. В буфере хранится не больше window_seconds последнего
+    аудио, поэтому после активации фрагмент для ASR начинается с самого
+    ключевого слова и извлечение команды после обращения работает как
+    прежде.
+
+    Атрибуты:
+        client (Client): Клиент, для которого выполняется активация.
+        keywords (list): Ключевые слова активации из конфигурации стратегии.
+        activated (bool): Было ли распознано ключевое слово.
+    """
+
+    def __init__(self, client, keywords, window_seconds=3.0,
+                 min_feed_seconds=0.1):
+        self.client = client
+        self.keywords = keywords
+        self.window_samples = int(window_seconds * client.sampling_rate)
+        self.min_feed_samples = int(min_feed_seconds * client.sampling_rate)
+        self.reader = client.buffer.reader()
+        self.spotter = None
+        self.task = None
+        self.activated = False
+
+    def process(self, asr_pipeline):
+        """
+        Планирует подачу нового аудио в детектор ключевых слов.
+
+        Аргументы:
+            asr_pipeline: Конвейер ASR, модель которого используется
+                          детектором.
+
+        Возвращает:
+            bool: True, если ключевое слово уже распознано и аудио нужно
+                  передавать полному ASR.
+        """
+        if self.activated:
+            return True
+        if self.task is None and self.reader.unread >= self.min_feed_samples:
+            self.task = asyncio.create_task(self._spot(asr_pipeline))
+        return False
+
+    async def _spot(self, asr_pipeline):
+        try:
+            if self.spotter is None:
+                # Первое обращение к модели может ее загрузить, поэтому
+                # детектор создается вне цикла событий
+                self.spotter = await get_executor().run(
+                    lambda: WakeWordSpotter(
+                        asr_pipeline.model, self.keywords,
+                        self.client.sampling_rate,
+                    )
+                )
+            data = self.reader.read_bytes()
+            result = await get_executor().run(self.spotter.accept, data)
+
+            buffer = self.client.buffer
+            if result == DETECTED:
+                self.activated = True
+                return
+            if result == REJECTED:
+                # Высказывание без ключевого слова больше не нужно
+                buffer.commit(self.reader.position - buffer.commit_pos)
+            excess = buffer.available - self.window_samples
+            if excess > 0:
+                buffer.commit(excess)
+        except Exception as e:
+            logging.error(f"Ошибка детектора ключевых слов: {e}")
+        finally:
+            self.task = None
+
+    def close(self):
+        """
+        Отменяет незавершенную подачу аудио в детектор.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def reset(self):
+        """
+        Возвращает ступень в режим ожидания ключевого слова.
+        """
+        self.activated = False
+        if self.spotter is not None:
+            self.spotter.reset()
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import time
+
+from service.metrics.registry import REGISTRY, CallbackMetric, Counter
+
+from .inference_executor import get_executor
+
+# Виды работы, которые отбрасываются при перегрузке, в порядке снижения
+# приоритета: сначала промежуточные гипотезы всех сессий, затем обработка
+# фоновых сессий (priority < 0)
+PARTIALS = "partials"
+BACKGROUND = "background"
+
+SESSIONS_REJECTED = REGISTRY.register(Counter(
+    "voicestream_sessions_rejected_total",
+    "Number of websocket sessions rejected by admission control",
+    ["reason"],
+))
+WORK_SHED = REGISTRY.register(Counter(
+    "voicestream_work_shed_total",
+    "Number of pieces of work skipped because of overload",
+    ["work"],
+))
+
+
+class CapacityManager:
+    """
+    Контроль допуска сессий и сброс нагрузки при перегрузке.
+
+    Загрузка оценивается по времени, которое задания исполнителя
+    инференса провели в пуле потоков: utilization - доля занятых потоков,
+    rtf - секунды инференса на секунду принятого аудио (суммарный
+    real-time factor всех сессий). Обе величины сглаживаются
+    экспоненциально с постоянной времени window_seconds.
+
+    Новая сессия не допускается, если достигнут предел числа сессий,
+    загрузка выше max_load, очередь исполнителя заполнена или аудио,
+    ожидающего декодирования во всех сессиях, больше max_queued_seconds.
+    Сессия может подождать освобождения ресурсов admission_wait_seconds,
+    после чего получает отказ.
+
+    Допущенные сессии при загрузке выше shed_load теряют промежуточные
+    гипотезы, а при перегрузке фоновые сессии (priority < 0) перестают
+    обрабатываться, пока загрузка не снизится; их аудио остается в
+    ограниченном буфере клиента.
+
+    Атрибуты:
+        max_sessions (int): Предел числа сессий или None.
+        max_load (float): Загрузка, выше которой новые сессии не
+                          допускаются.
+        shed_load (float): Загрузка, выше которой отбрасываются
+                           промежуточные гипотезы.
+        max_queued_seconds (float): Предел аудио, ожидающего декодирования,
+                                    или None.
+        admission_wait_seconds (float): Сколько новая сессия ждет
+                                        освобождения ресурсов.
+        max_buffer_seconds (float): Предел емкости буфера клиента.
+        utilization (float): Сглаженная доля занятых потоков инференса.
+        rtf (float): Сглаженный суммарный real-time factor.
+    """
+
+    def __init__(self, max_sessions=None, max_load=0.9, shed_load=0.75,
+                 max_queued_seconds=None, admission_wait_seconds=0.0,
+                 max_buffer_seconds=60.0, window_seconds=5.0):
+        self.max_sessions = max_sessions
+        self.max_load = max_load
+        self.shed_load = shed_load
+        self.max_queued_seconds = max_queued_seconds
+        self.admission_wait_seconds = admission_wait_seconds
+        self.max_buffer_seconds = max_buffer_seconds
+        self.window_seconds = window_seconds
+        self.clients = {}
+        self.utilization = 0.0
+        self.rtf = 0.0
+        self.audio_seconds = 0.0
+        self._last_sample = None
+
+    def attach(self, clients):
+        """
+        Задает словарь подключенных клиентов (Server.connected_clients).
+        """
+        self.clients = clients
+
+    def register_metrics(self):
+        """
+        Регистрирует метрики оценки загрузки.
+        """
+        REGISTRY.register(CallbackMetric(
+            "voicestream_inference_utilization",
+            "Smoothed fraction of busy inference threads",
+            lambda: self._sampled("utilization"),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_aggregate_rtf",
+            "Smoothed inference seconds per second of received audio",
+            lambda: self._sampled("rtf"),
+        ))
+        REGISTRY.register(CallbackMetric(
+            "voicestream_queued_audio_seconds",
+            "Audio waiting to be decoded across all sessions",
+            self.queued_audio_seconds,
+        ))
+
+    def _sampled(self, name):
+        self.update()
+        return getattr(self, name)
+
+    def record_audio(self, seconds):
+        """
+        Учитывает принятое от клиентов аудио.
+
+        Аргументы:
+            seconds (float): Длительность аудио.
+        """
+        self.audio_seconds += seconds
+
+    def update(self):
+        """
+        Обновляет оценки загрузки, если с прошлого обновления прошло не
+        меньше 0.5 с.
+        """
+        executor = get_executor()
+        now = time.monotonic()
+        sample = (now, executor.busy_seconds, self.audio_seconds)
+        if self._last_sample is None:
+            self._last_sample = sample
+            return
+        elapsed = now - self._last_sample[0]
+        if elapsed < 0.5:
+            return
+        busy = sample[1] - self._last_sample[1]
+        audio = sample[2] - self._last_sample[2]
+        self._last_sample = sample
+
+        weight = min(1.0, elapsed / self.window_seconds)
+        utilization = busy / (elapsed * executor.workers)
+        self.utilization += weight * (utilization - self.utilization)
+        if audio > 0:
+            self.rtf += weight * (busy / audio - self.rtf)
+
+    def queued_audio_seconds(self):
+        """
+        Возвращает длительность аудио в очередях фрагментов всех сессий.
+        """
+        return sum(
+            client.buffering_strategy.scheduler.pending_seconds
+            for client in list(self.clients.values())
+            if hasattr(client.buffering_strategy, "scheduler")
+        )
+
+    def overload_reason(self):
+        """
+        Возвращает причину перегрузки ("load", "queue", "queued_audio") или
+        None.
+        """
+        self.update()
+        if self.max_load is not None and self.utilization >= self.max_load:
+            return "load"
+        if get_executor().is_saturated():
+            return "queue"
+        if (
+            self.max_queued_seconds is not None
+            and self.queued_audio_seconds() >= self.max_queued_seconds
+        ):
+            return "queued_audio"
+        return None
+
+    def admission_error(self):
+        """
+        Проверяет, можно ли допустить новую сессию.
+
+        Возвращает:
+            str: Причина отказа ("sessions" или причина перегрузки) или
+                 None.
+        """
+        if self.max_sessions is not None and len(self.clients) >= self.max_sessions:
+            return "sessions"
+        return self.overload_reason()
+
+    async def admit(self):
+        """
+        Допускает новую сессию, при необходимости ожидая освобождения
+        ресурсов до admission_wait_seconds.
+
+        Возвращает:
+            str: Причина отказа или None, если сессия допущена.
+        """
+        deadline = time.monotonic() + self.admission_wait_seconds
+        reason = self.admission_error()
+        while reason is not None and time.monotonic() < deadline:
+            await asyncio.sleep(min(0.25, self.admission_wait_seconds))
+            reason = self.admission_error()
+        if reason is not None:
+            SESSIONS_REJECTED.inc(reason)
+            logging.warning(f"Сессия отклонена: {reason}")
+        return reason
+
+    def should_shed(self, work, priority=0):
+        """
+        Проверяет, нужно ли пропустить работу из-за перегрузки.
+
+        Аргументы:
+            work (str): PARTIALS или BACKGROUND.
+            priority (int): Приоритет сессии.
+
+        Возвращает:
+            bool: True, если работу нужно пропустить.
+        """
+        if work == PARTIALS:
+            self.update()
+            shed = self.shed_load is not None and self.utilization >= self.shed_load
+        else:
+            shed = priority < 0 and self.overload_reason() is not None
+        if shed:
+            WORK_SHED.inc(work)
+        return shed
+
+
+_capacity_manager = None
+
+
+def configure_capacity_manager(**kwargs):
+    """
+    Создает общий для процесса менеджер допуска с заданными параметрами.
+
+    Аргументы:
+        **kwargs: Параметры CapacityManager.
+
+    Возвращает:
+        CapacityManager: Новый менеджер.
+    """
+    global _capacity_manager
+    _capacity_manager = CapacityManager(**kwargs)
+    return _capacity_manager
+
+
+def get_capacity_manager():
+    """
+    Возвращает общий менеджер допуска, создавая его с параметрами по
+    умолчанию, если он еще не настроен.
+
+    Возвращает:
+        CapacityManager: Менеджер процесса.
+    """
+    global _capacity_manager
+    if _capacity_manager is None:
+        _capacity_manager = CapacityManager()
+    return _capacity_manager
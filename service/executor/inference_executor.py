@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class InferenceExecutor:
+    """
+    Исполнитель ресурсоемких вызовов инференса вне цикла событий asyncio.
+
+    Декодер Kaldi (Vosk) и spaCy выполняются в пуле потоков: декодер
+    отпускает GIL, поэтому потоки загружают все ядра. Модель QA
+    (transformers) по желанию выполняется в пуле процессов.
+
+    Очередь ограничена: число заданий, ожидающих или выполняющихся в пулах,
+    сравнивается с queue_size, и стратегии буферизации через is_saturated()
+    узнают о перегрузке и откладывают отправку новых фрагментов
+    (backpressure), вместо того чтобы наращивать очередь без предела.
+
+    Атрибуты:
+        workers (int): Число потоков пула инференса.
+        queue_size (int): Порог числа заданий, после которого исполнитель
+                          считается перегруженным.
+        pending (int): Число заданий, ожидающих или выполняющихся сейчас.
+        busy_seconds (float): Суммарное время выполнения заданий в пуле
+                              потоков (для оценки загрузки).
+    """
+
+    def __init__(self, workers=None, queue_size=None, qa_process_pool=False,
+                 qa_workers=1):
+        """
+        Аргументы:
+            workers (int): Число потоков пула (по умолчанию число ядер).
+            queue_size (int): Порог перегрузки (по умолчанию 4 * workers).
+            qa_process_pool (bool): Выполнять QA в пуле процессов.
+            qa_workers (int): Число процессов пула QA.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.workers * 4
+        self.thread_pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="inference"
+        )
+        self.process_pool = (
+            ProcessPoolExecutor(max_workers=qa_workers)
+            if qa_process_pool
+            else None
+        )
+        self.pending = 0
+        self.busy_seconds = 0.0
+        self._busy_lock = threading.Lock()
+
+    def _timed(self, func):
+        started = time.perf_counter()
+        try:
+            return func()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._busy_lock:
+                self.busy_seconds += elapsed
+
+    def is_saturated(self):
+        """
+        Сообщает, заполнена ли очередь исполнителя.
+
+        Возвращает:
+            bool: True, если новые фрагменты лучше отложить.
+        """
+        return self.pending >= self.queue_size
+
+    async def run(self, func, *args, kind="cpu", **kwargs):
+        """
+        Выполняет синхронную функцию в пуле и ожидает результат.
+
+        Аргументы:
+            func: Синхронная функция.
+            *args, **kwargs: Аргументы функции.
+            kind (str): "cpu" - пул потоков; "qa" - пул процессов, если он
+                        включен (функция и аргументы должны сериализоваться
+                        pickle), иначе пул потоков.
+
+        Возвращает:
+            Результат func.
+        """
+        pool = self.thread_pool
+        if kind == "qa" and self.process_pool is not None:
+            pool = self.process_pool
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        if self.pending > self.queue_size:
+            logging.warning(
+                f"Очередь инференса переполнена: {self.pending} заданий"
+            )
+        call = functools.partial(func, *args, **kwargs)
+        if pool is self.thread_pool:
+            call = functools.partial(self._timed, call)
+        try:
+            return await loop.run_in_executor(pool, call)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait=True):
+        """
+        Останавливает пулы исполнителя.
+        """
+        self.thread_pool.shutdown(wait=wait)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=wait)
+
+
+_executor = None
+
+
+def configure_executor(**kwargs):
+    """
+    Создает общий для процесса исполнитель с заданными параметрами.
+
+    Аргументы:
+        **kwargs: Параметры InferenceExecutor.
+
+    Возвращает:
+        InferenceExecutor: Новый исполнитель.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = InferenceExecutor(**kwargs)
+    return _executor
+
+
+def get_executor():
+    """
+    Возвращает общий исполнитель, создавая его с параметрами по умолчанию,
+    если он еще не настроен.
+
+    Возвращает:
+        InferenceExecutor: Исполнитель процесса.
+    """
+    global _executor
+    if _executor is None:
+        _executor = InferenceExecutor()
+    return _executor
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from .registry import REGISTRY
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+async def _handle(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5.0)
+        # Заголовки запроса не нужны, но их нужно дочитать
+        while (await asyncio.wait_for(reader.readline(), 5.0)) not in (
+            b"\r\n", b"\n", b"",
+        ):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in (
+            "/metrics", "/",
+        ):
+            status, body = "200 OK", REGISTRY.render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"Not Found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logging.debug(f"Ошибка запроса метрик: {e}")
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host, port):
+    """
+    Запускает HTTP-эндпоинт /metrics с метриками процесса в текстовом
+    формате Prometheus. Метрики формируются только при запросе.
+
+    Аргументы:
+        host (str): Адрес.
+        port (int): Порт.
+
+    Возвращает:
+        asyncio.Server: Запущенный сервер.
+    """
+    server = await asyncio.start_server(_handle, host, port)
+    logging.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
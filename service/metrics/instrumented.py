@@ -0,0 +1,69 @@
+from service.asr.asr_interface import ASRInterface
+from service.vad.vad_interface import VADInterface
+
+from .registry import WEBSOCKET_MESSAGES, stage
+
+
+class InstrumentedASR(ASRInterface):
+    """
+    Обертка конвейера ASR, измеряющая длительность его вызовов. Остальные
+    атрибуты (model, sessions, ...) берутся из обернутого конвейера.
+    """
+
+    def __init__(self, asr_pipeline):
+        self.pipeline = asr_pipeline
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+    async def transcribe(self, client, audio=None):
+        with stage("asr"):
+            return await self.pipeline.transcribe(client, audio)
+
+    async def accept_audio(self, client, data):
+        with stage("asr_stream"):
+            return await self.pipeline.accept_audio(client, data)
+
+    async def finalize(self, client):
+        with stage("asr_finalize"):
+            return await self.pipeline.finalize(client)
+
+    def release(self, client):
+        self.pipeline.release(client)
+
+
+class InstrumentedVAD(VADInterface):
+    """
+    Обертка конвейера VAD, измеряющая длительность детекции.
+    """
+
+    def __init__(self, vad_pipeline):
+        self.pipeline = vad_pipeline
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+    async def detect_activity(self, client, audio=None):
+        with stage("vad"):
+            return await self.pipeline.detect_activity(client, audio)
+
+    def release(self, client):
+        self.pipeline.release(client)
+
+
+class MeteredWebSocket:
+    """
+    Обертка соединения websocket, измеряющая отправку сообщений
+    стратегиями буферизации.
+    """
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    def __getattr__(self, name):
+        return getattr(self.websocket, name)
+
+    async def send(self, message):
+        with stage("websocket_send"):
+            await self.websocket.send(message)
+        WEBSOCKET_MESSAGES.inc("sent")
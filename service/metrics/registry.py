@@ -0,0 +1,240 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм длительности этапов, в секундах
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Монотонный счетчик с метками.
+
+    Атрибуты:
+        name (str): Имя метрики.
+        labelnames (tuple): Имена меток.
+    """
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        """
+        Увеличивает счетчик для значений меток labels.
+        """
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """
+    Гистограмма значений (длительностей) с метками.
+
+    Наблюдение стоит один двоичный поиск по границам корзин и несколько
+    сложений под блокировкой, поэтому подходит для измерения каждого
+    фрагмента и сообщения. Значения накопленных корзин вычисляются только
+    при выгрузке.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счетчики корзин (последняя - +Inf), сумма, число]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        """
+        Добавляет наблюдение для значений меток labels.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Измеряет длительность блока with (включая ожидание await внутри
+        него) и добавляет ее как наблюдение.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        with self.lock:
+            items = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self.values.items()
+            ]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                yield (
+                    self.name + "_bucket",
+                    _format_labels(
+                        self.labelnames, labels, [("le", _format_value(bound))]
+                    ),
+                    cumulative,
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield self.name + "_sum", label_text, total
+            yield self.name + "_count", label_text, count
+
+
+class CallbackMetric:
+    """
+    Метрика, значение которой вычисляется при выгрузке (число клиентов,
+    глубина очередей), поэтому не стоит ничего между выгрузками.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=(),
+                 metric_type="gauge"):
+        """
+        Аргументы:
+            callback: Функция без аргументов, возвращающая число (метрика
+                      без меток) или список пар (значения меток, число).
+            metric_type (str): "gauge" или "counter".
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type = metric_type
+
+    def samples(self):
+        value = self.callback()
+        if not self.labelnames:
+            yield self.name, "", value
+            return
+        for labels, sample in value:
+            yield self.name, _format_labels(self.labelnames, labels), sample
+
+
+class Registry:
+    """
+    Набор метрик процесса с выгрузкой в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        """
+        Регистрирует метрику; метрика с тем же именем заменяется.
+
+        Возвращает:
+            Зарегистрированная метрика.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        Возвращает все метрики в текстовом формате Prometheus 0.0.4.
+        """
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Длительность этапов конвейера: vad, asr, asr_stream, asr_finalize, intent,
+# numbers, qa, websocket_send
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "voicestream_stage_seconds",
+    "Duration of audio pipeline stages in seconds",
+    ["stage"],
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "voicestream_stage_errors_total",
+    "Number of failed audio pipeline stage calls",
+    ["stage"],
+))
+WEBSOCKET_MESSAGES = REGISTRY.register(Counter(
+    "voicestream_websocket_messages_total",
+    "Number of websocket messages by direction",
+    ["direction"],
+))
+STRATEGY_DISPATCHES = REGISTRY.register(Counter(
+    "voicestream_strategy_dispatches_total",
+    "Number of buffering strategy invocations for received audio",
+))
+
+
+@contextmanager
+def stage(name):
+    """
+    Измеряет длительность этапа конвейера и считает его ошибки.
+
+    Аргументы:
+        name (str): Имя этапа (значение метки stage).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, name)
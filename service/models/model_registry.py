@@ -0,0 +1,217 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from service.metrics.registry import REGISTRY, CallbackMetric
+
+
+def _rss_bytes():
+    """
+    Возвращает резидентную память процесса (Linux), либо None.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def download_and_extract_model(model_url, model_zip, model_dir):
+    """
+    Скачивает и извлекает модель Vosk, если она не установлена.
+
+    Аргументы:
+        model_url (str): URL для скачивания модели.
+        model_zip (str): Имя zip-файла модели.
+        model_dir (str): Директория для установки модели.
+    """
+    if not os.path.exists(model_dir):
+        print("Скачивание модели...")
+        subprocess.run(["wget", model_url, "-O", model_zip], check=True)
+        subprocess.run(["unzip", model_zip], check=True)
+        extracted_dir = model_zip.replace(".zip", "")
+        shutil.move(extracted_dir, model_dir)
+        os.remove(model_zip)
+        print("Модель успешно скачана и установлена.")
+
+
+def load_vosk_model(path, url=None, zip_path=None):
+    """
+    Загружает модель Vosk из каталога, предварительно скачав ее, если
+    задан url и каталога нет.
+
+    Аргументы:
+        path (str): Каталог модели.
+        url (str): URL архива модели или None.
+        zip_path (str): Путь для архива; по умолчанию path + ".zip".
+    """
+    from vosk import Model
+
+    if url:
+        download_and_extract_model(url, zip_path or path + ".zip", path)
+    return Model(path)
+
+
+class SharedModel:
+    """
+    Загруженная модель и число ее пользователей.
+
+    Атрибуты:
+        path (str): Абсолютный путь к модели.
+        model: Загруженная модель.
+        refs (int): Число конвейеров, использующих модель.
+        load_seconds (float): Время загрузки.
+        rss_bytes (int): Прирост резидентной памяти процесса при загрузке
+                         (оценка занимаемой моделью памяти) или None.
+        disk_bytes (int): Размер каталога модели на диске.
+    """
+
+    def __init__(self, path, model, load_seconds, rss_bytes):
+        self.path = path
+        self.model = model
+        self.refs = 0
+        self.load_seconds = load_seconds
+        self.rss_bytes = rss_bytes
+        self.disk_bytes = _directory_size(path)
+
+
+class ModelRegistry:
+    """
+    Общий для процесса реестр загруженных моделей.
+
+    Конвейеры ASR и VAD, указывающие на одну и ту же модель (по умолчанию
+    оба используют values/vosk-model-small-ru-0.22), получают один и тот же
+    экземпляр: модель загружается один раз и удаляется из реестра, когда
+    ее освобождает последний пользователь. Ключ - абсолютный путь к модели
+    и параметры загрузки.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path, **options):
+        return (os.path.realpath(path), tuple(sorted(options.items())))
+
+    def acquire(self, path, loader=None, **options):
+        """
+        Возвращает общую модель, загружая ее при первом запросе, и
+        увеличивает число ее пользователей.
+
+        Аргументы:
+            path (str): Каталог модели.
+            loader: Функция loader(path, **options), загружающая модель; по
+                    умолчанию модель Vosk.
+            **options: Параметры загрузки, входящие в ключ реестра.
+
+        Возвращает:
+            Загруженная модель.
+        """
+        key = self.key(path, **options)
+        # Загрузка выполняется под блокировкой реестра: параллельный запрос
+        # той же модели дождется ее вместо повторной загрузки
+        with self.lock:
+            shared = self.models.get(key)
+            if shared is None:
+                rss_before = _rss_bytes()
+                started = time.perf_counter()
+                model = (loader or load_vosk_model)(path, **options)
+                load_seconds = time.perf_counter() - started
+                rss_after = _rss_bytes()
+                shared = SharedModel(
+                    key[0], model, load_seconds,
+                    rss_after - rss_before
+                    if rss_before is not None and rss_after is not None
+                    else None,
+                )
+                self.models[key] = shared
+                logging.info(
+                    f"Загружена модель {key[0]} за {load_seconds:.2f} с"
+                )
+            shared.refs += 1
+            return shared.model
+
+    def release(self, path, **options):
+        """
+        Уменьшает число пользователей модели и удаляет ее из реестра, если
+        пользователей не осталось.
+
+        Аргументы:
+            path (str): Каталог модели.
+            **options: Параметры загрузки, как при acquire().
+        """
+        key = self.key(path, **options)
+        with self.lock:
+            shared = self.models.get(key)
+            if shared is None:
+                return
+            shared.refs -= 1
+            if shared.refs <= 0:
+                del self.models[key]
+                logging.info(f"Модель {key[0]} выгружена")
+
+    def report(self):
+        """
+        Возвращает сведения о загруженных моделях.
+
+        Возвращает:
+            list: Словари с ключами "path", "refs", "load_seconds",
+                  "rss_bytes" и "disk_bytes".
+        """
+        with self.lock:
+            return [
+                {
+                    "path": shared.path,
+                    "refs": shared.refs,
+                    "load_seconds": shared.load_seconds,
+                    "rss_bytes": shared.rss_bytes,
+                    "disk_bytes": shared.disk_bytes,
+                }
+                for shared in self.models.values()
+            ]
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    """
+    Возвращает реестр моделей процесса.
+
+    Возвращает:
+        ModelRegistry: Реестр.
+    """
+    return _registry
+
+
+REGISTRY.register(CallbackMetric(
+    "voicestream_model_refs",
+    "Pipelines sharing a loaded model",
+    lambda: [((m["path"],), m["refs"]) for m in _registry.report()],
+    ["path"],
+))
+REGISTRY.register(CallbackMetric(
+    "voicestream_model_rss_bytes",
+    "Resident memory added by loading a model",
+    lambda: [
+        ((m["path"],), m["rss_bytes"])
+        for m in _registry.report()
+        if m["rss_bytes"] is not None
+    ],
+    ["path"],
+))
@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+from utils.lazy_resource import LazyResource
+
+
+def _load_tokenizer_pipeline():
+    import spacy
+
+    # Для поиска обращения нужен только токенизатор: теггер, парсер, NER и
+    # лемматизатор не загружаются и не запускаются на каждой транскрипции
+    return spacy.load(
+        "ru_core_news_sm",
+        exclude=["tok2vec", "morphologizer", "parser", "senter",
+                 "attribute_ruler", "lemmatizer", "ner"],
+    )
+
+
+# Модель spaCy загружается при первом поиске обращения
+nlp = LazyResource("spaCy ru_core_news_sm (tokenizer)", _load_tokenizer_pipeline)
+
+
+@lru_cache(maxsize=32)
+def get_call_matcher(keywords):
+    """
+    Возвращает Matcher обращения для набора ключевых слов. Matcher
+    компилируется один раз для каждого набора и кэшируется.
+
+    :param keywords: Кортеж ключевых слов (регулярных выражений начала
+                     токена).
+    :return: spacy.matcher.Matcher с правилом CALL_PATTERN.
+    """
+    from spacy.matcher import Matcher
+
+    matcher = Matcher(nlp.get().vocab)
+    for keyword in keywords:
+        pattern = [{"LOWER": {"REGEX": f"^{keyword}"}}]
+        matcher.add("CALL_PATTERN", [pattern])
+    return matcher
+
+
+def extract_after_call(text, keywords):
+    """
+    Извлекает команду, следующую за обращением к системе.
+
+    :param text: Текст транскрипции.
+    :param keywords: Ключевые слова обращения.
+    :return: Текст после первого токена, начинающегося с ключевого слова,
+             или None, если обращения нет.
+    """
+    doc = nlp.get().tokenizer(text.lower())
+    matches = get_call_matcher(tuple(keywords))(doc)
+    if matches:
+        _, start, end = matches[0]
+        return doc[end:].text.strip()
+    return None
@@ -0,0 +1,164 @@
+import json
+import re
+
+try:
+    from re import _constants as _sre_constants, _parser as _sre_parser
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre_constants
+    import sre_parse as _sre_parser
+
+
+def required_literals(pattern):
+    """
+    Находит строки, хотя бы одна из которых входит в любое совпадение
+    регулярного выражения.
+
+    Разбор выполняется по дереву шаблона: подряд идущие символы дают
+    строку, альтернатива - объединение вариантов своих ветвей,
+    повторение с минимумом не меньше одного - варианты своего тела. Из
+    всех обязательных элементов последовательности выбирается самый
+    избирательный (с самой длинной кратчайшей строкой).
+
+    Аргументы:
+        pattern (str): Регулярное выражение.
+
+    Возвращает:
+        frozenset: Строки-триггеры или None, если их не удалось выделить
+                   (тогда шаблон проверяется всегда).
+    """
+    try:
+        parsed = _sre_parser.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    return _sequence_literals(list(parsed))
+
+
+def _sequence_literals(items):
+    candidates = []
+    run = []
+    for op, value in items + [(None, None)]:
+        if op is _sre_constants.LITERAL:
+            run.append(chr(value))
+            continue
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run = []
+        if op is _sre_constants.SUBPATTERN:
+            if value[1] & re.IGNORECASE:
+                continue
+            candidates.append(_sequence_literals(list(value[-1])))
+        elif op is _sre_constants.BRANCH:
+            branches = [_sequence_literals(list(branch)) for branch in value[1]]
+            if all(branches):
+                candidates.append(frozenset().union(*branches))
+        elif op in (_sre_constants.MAX_REPEAT, _sre_constants.MIN_REPEAT):
+            if value[0] >= 1:
+                candidates.append(_sequence_literals(list(value[2])))
+    candidates = [c for c in candidates if c and all(c)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+class IntentMatcher:
+    """
+    Сопоставитель текста команд с интентами (событиями).
+
+    Шаблоны проверяются в порядке приоритета, как при последовательном
+    переборе re.search: побеждает первый интент, шаблон которого
+    встречается в тексте. Регулярное выражение запускается, только если в
+    тексте есть хотя бы одна из его обязательных подстрок (см.
+    required_literals). Если подстроки выделены у всех шаблонов, текст
+    сначала проверяется одним выражением из одних литералов (альтернатива
+    всех подстрок), поэтому текст без команд (самый частый случай, после
+    которого запускается QA) не запускает ни одного шаблона.
+
+    Именованные группы шаблонов (?P<name>...) возвращаются как значения
+    слотов; значения из одних цифр преобразуются в int.
+
+    Атрибуты:
+        intents (list): Имена интентов в порядке приоритета.
+        checks (list): (номер интента, подстроки-триггеры или None,
+                       скомпилированный шаблон) в порядке приоритета.
+        prefilter (re.Pattern): Альтернатива всех подстрок-триггеров или
+                                None, если у какого-то шаблона их нет.
+    """
+
+    def __init__(self, patterns):
+        """
+        Аргументы:
+            patterns (dict): Интент -> список регулярных выражений, в порядке
+                             приоритета.
+        """
+        self.intents = list(patterns)
+        self.checks = []
+        for intent_index, intent in enumerate(self.intents):
+            for pattern in patterns[intent]:
+                literals = required_literals(pattern)
+                self.checks.append((
+                    intent_index,
+                    tuple(literals) if literals is not None else None,
+                    re.compile(pattern),
+                ))
+
+        self.prefilter = None
+        if self.checks and all(check[1] for check in self.checks):
+            literals = {literal for check in self.checks for literal in check[1]}
+            self.prefilter = re.compile("|".join(
+                re.escape(literal)
+                for literal in sorted(literals, key=len, reverse=True)
+            ))
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Загружает шаблоны интентов из JSON-файла вида
+        {"ИНТЕНТ": ["шаблон", ...], ...}.
+
+        Аргументы:
+            path (str): Путь к файлу.
+
+        Возвращает:
+            IntentMatcher: Сопоставитель с шаблонами из файла.
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def match(self, text):
+        """
+        Определяет интент команды.
+
+        Аргументы:
+            text (str): Текст команды.
+
+        Возвращает:
+            tuple: (имя интента, словарь слотов или None), либо (None, None),
+                   если ни один шаблон не подошел.
+        """
+        text = text.lower()
+        if self.prefilter is not None and self.prefilter.search(text) is None:
+            return None, None
+        for intent_index, literals, regex in self.checks:
+            if literals is not None:
+                for literal in literals:
+                    if literal in text:
+                        break
+                else:
+                    continue
+            match = regex.search(text)
+            if match is not None:
+                if not regex.groupindex:
+                    return self.intents[intent_index], None
+                return self.intents[intent_index], self._slots(match)
+        return None, None
+
+    @staticmethod
+    def _slots(match):
+        slots = {
+            name: int(value) if value.isdigit() else value
+            for name, value in match.groupdict().items()
+            if value is not None
+        }
+        return slots or None
@@ -0,0 +1,25 @@
+from service.metrics.registry import stage
+from utils.lazy_resource import LazyResource
+
+
+def _load_number_extractor():
+    from words2numsrus import NumberExtractor
+
+    return NumberExtractor()
+
+
+# Преобразователь чисел словами в цифры, общий для стратегий и QA; создается
+# при первом использовании
+number_extractor = LazyResource("words2numsrus NumberExtractor",
+                                _load_number_extractor)
+
+
+def replace_numbers(text):
+    """
+    Преобразует текстовые числа в цифровой формат.
+
+    :param text: Исходный текст.
+    :return: Текст с числами, записанными цифрами.
+    """
+    with stage("numbers"):
+        return number_extractor.get().replace_groups(text)
@@ -0,0 +1,90 @@
+import os
+
+# Бэкенды модели QA: исходная модель fp32, динамически квантованная в int8
+# модель PyTorch и экспортированная в ONNX модель (onnxruntime через optimum).
+# Артефакты int8 и onnx создаются командой python -m service.nlp.qa_convert
+QA_BACKENDS = ("torch", "int8", "onnx")
+
+# Файл весов квантованной модели в каталоге артефакта int8
+INT8_WEIGHTS = "quantized_state_dict.pt"
+
+
+def quantize_dynamic_int8(model):
+    """
+    Динамически квантует линейные слои модели в int8.
+    """
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_qa_model(backend, directory):
+    """
+    Загружает модель QA выбранного бэкенда.
+
+    Аргументы:
+        backend (str): "torch", "int8" или "onnx".
+        directory (str): Каталог модели или артефакта конвертации.
+
+    Возвращает:
+        Модель question-answering, совместимая с pipeline transformers.
+    """
+    from transformers import AutoModelForQuestionAnswering
+
+    if backend == "torch":
+        return AutoModelForQuestionAnswering.from_pretrained(directory)
+
+    if backend == "int8":
+        import torch
+        from transformers import AutoConfig
+
+        config = AutoConfig.from_pretrained(directory)
+        model = quantize_dynamic_int8(
+            AutoModelForQuestionAnswering.from_config(config)
+        )
+        model.load_state_dict(
+            torch.load(os.path.join(directory, INT8_WEIGHTS))
+        )
+        return model.eval()
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForQuestionAnswering
+        except ImportError:
+            raise RuntimeError(
+                "Для бэкенда QA 'onnx' установите optimum[onnxruntime]"
+            )
+        file_names = [
+            name for name in os.listdir(directory) if name.endswith(".onnx")
+        ]
+        # Квантованная модель (model_quantized.onnx) предпочтительнее
+        file_names.sort(key=lambda name: "quantized" not in name)
+        if not file_names:
+            raise RuntimeError(f"В каталоге {directory} нет модели ONNX")
+        return ORTModelForQuestionAnswering.from_pretrained(
+            directory, file_name=file_names[0]
+        )
+
+    raise ValueError(f"Неизвестный бэкенд QA: {backend}")
+
+
+def load_qa_pipeline(backend, directory):
+    """
+    Создает question-answering pipeline для выбранного бэкенда.
+
+    Аргументы:
+        backend (str): "torch", "int8" или "onnx".
+        directory (str): Каталог модели или артефакта конвертации.
+
+    Возвращает:
+        transformers.Pipeline: Пайплайн question-answering.
+    """
+    from transformers import AutoTokenizer, pipeline
+
+    return pipeline(
+        task='question-answering',
+        model=load_qa_model(backend, directory),
+        tokenizer=AutoTokenizer.from_pretrained(directory)
+    )
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+
+from service.executor.inference_executor import get_executor
+from service.nlp.qa_service import answer_batch
+
+
+class QABatcher:
+    """
+    Общий для всех сессий процесса пакетировщик вопросов к модели QA.
+
+    Вопросы собираются в течение max_wait_ms миллисекунд после первого
+    вопроса пакета или до max_batch штук и выполняются одним дополненным
+    (padded) проходом модели в исполнителе инференса; каждый вызывающий
+    получает свой ответ через asyncio.Future. При многих одновременных
+    сессиях накладные расходы вызова модели делятся на весь пакет.
+
+    Атрибуты:
+        max_batch (int): Максимальный размер пакета.
+        max_wait_ms (float): Максимальное ожидание заполнения пакета.
+        batches (int): Число выполненных пакетов.
+        items (int): Число обработанных вопросов.
+    """
+
+    def __init__(self, max_batch=8, max_wait_ms=5.0):
+        if max_batch < 1:
+            raise ValueError("Размер пакета QA должен быть не меньше 1")
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.pending = []
+        self.timer = None
+        self.batches = 0
+        self.items = 0
+        self.total_latency = 0.0
+        self.started_at = time.monotonic()
+
+    async def submit(self, context, question):
+        """
+        Ставит вопрос в текущий пакет и ожидает ответ.
+
+        Аргументы:
+            context (PreparedContext): Подготовленный контекст.
+            question (str): Вопрос.
+
+        Возвращает:
+            str: Ответ.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((context, question, future, time.monotonic()))
+
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait_ms / 1000, self.flush)
+        return await future
+
+    def flush(self):
+        """
+        Отправляет накопленные вопросы на выполнение.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.pending:
+            batch = self.pending[: self.max_batch]
+            del self.pending[: self.max_batch]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        items = [(context, question) for context, question, _, _ in batch]
+        try:
+            answers = await get_executor().run(answer_batch, items, kind="qa")
+        except Exception as e:
+            logging.error(f"Ошибка пакета QA: {e}")
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        self.batches += 1
+        self.items += len(batch)
+        for (_, _, future, enqueued_at), answer in zip(batch, answers):
+            self.total_latency += now - enqueued_at
+            if not future.done():
+                future.set_result(answer)
+
+    def stats(self):
+        """
+        Возвращает статистику пакетирования.
+
+        Возвращает:
+            dict: Число пакетов и вопросов, средний размер пакета, средняя
+                  задержка ответа (мс) и пропускная способность (вопросов
+                  в секунду) с момента создания.
+        """
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "mean_latency_ms": (
+                self.total_latency / self.items * 1000 if self.items else 0.0
+            ),
+            "throughput_per_second": self.items / elapsed if elapsed else 0.0,
+        }
@@ -0,0 +1,98 @@
+"""
+Офлайн-конвертация сохраненной модели QA в оптимизированные для CPU
+артефакты.
+
+    python -m service.nlp.qa_convert --backend int8 \\
+        --output-dir ./models/mdeberta-v3-base-squad2-int8
+    python -m service.nlp.qa_convert --backend onnx --quantize \\
+        --output-dir ./models/mdeberta-v3-base-squad2-onnx
+
+Сервер использует артефакт, если задать переменные окружения QA_BACKEND
+(int8 или onnx) и QA_MODEL_DIR (каталог артефакта).
+"""
+import argparse
+import os
+
+from transformers import AutoModelForQuestionAnswering, AutoTokenizer
+
+from service.nlp.qa_backends import INT8_WEIGHTS, quantize_dynamic_int8
+
+
+def convert_int8(model_dir, output_dir):
+    """
+    Сохраняет динамически квантованные (int8) веса модели вместе с
+    конфигурацией и токенизатором.
+    """
+    import torch
+
+    model = AutoModelForQuestionAnswering.from_pretrained(model_dir).eval()
+    quantized = quantize_dynamic_int8(model)
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.config.save_pretrained(output_dir)
+    torch.save(quantized.state_dict(), os.path.join(output_dir, INT8_WEIGHTS))
+
+
+def convert_onnx(model_dir, output_dir, quantize=False):
+    """
+    Экспортирует модель в ONNX и, по желанию, квантует ее динамически для
+    onnxruntime.
+    """
+    try:
+        from optimum.onnxruntime import (
+            ORTModelForQuestionAnswering,
+            ORTQuantizer,
+        )
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    except ImportError:
+        raise RuntimeError(
+            "Для экспорта в ONNX установите optimum[onnxruntime]"
+        )
+
+    model = ORTModelForQuestionAnswering.from_pretrained(model_dir, export=True)
+    model.save_pretrained(output_dir)
+
+    if quantize:
+        quantizer = ORTQuantizer.from_pretrained(model)
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=output_dir, quantization_config=config)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the question-answering model to an optimized "
+        "CPU backend"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["int8", "onnx"],
+        required=True,
+        help="int8: PyTorch dynamic quantization; onnx: ONNX Runtime export",
+    )
+    parser.add_argument(
+        "--model-dir",
+        default="./models/mdeberta-v3-base-squad2",
+        help="Directory of the saved fp32 model (see gg.py)",
+    )
+    parser.add_argument(
+        "--output-dir", required=True, help="Directory for the artifact"
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Also apply dynamic int8 quantization to the ONNX model",
+    )
+    args = parser.parse_args()
+
+    if args.backend == "int8":
+        convert_int8(args.model_dir, args.output_dir)
+    else:
+        convert_onnx(args.model_dir, args.output_dir, args.quantize)
+    AutoTokenizer.from_pretrained(args.model_dir).save_pretrained(
+        args.output_dir
+    )
+    print(f"Артефакт {args.backend} сохранен в {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from service.executor.inference_executor import get_executor
+from service.metrics.registry import REGISTRY, CallbackMetric, stage
+from service.nlp.number_extractor import replace_numbers
+from service.nlp.qa_system import qa_pipeline
+from service.nlp.recipe_store import recipe_store
+from utils.lazy_resource import LazyResource
+
+# Максимальная длина ответа в токенах, как у question-answering pipeline
+MAX_ANSWER_TOKENS = 15
+
+_SPACES = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
+
+# Предел числа шагов, токены которых хранятся в кэше
+MAX_CACHED_STEPS = 4096
+
+# Текст шага -> (input_ids, offsets) или None (токенизатор без смещений);
+# заполняется из потоков исполнителя
+_step_encodings = OrderedDict()
+_step_lock = threading.Lock()
+_MISSING = object()
+
+
+def split_context(context):
+    """
+    Приводит контекст к списку нормализованных шагов.
+
+    Аргументы:
+        context: Список шагов, уже нормализованных (например, шаги
+                 RecipeStore), или исходный текст, который разбивается на
+                 строки, а числа в нем преобразуются в цифры.
+
+    Возвращает:
+        list: Тексты шагов.
+    """
+    if not isinstance(context, str):
+        return list(context)
+    return [
+        replace_numbers(line.strip())
+        for line in context.splitlines()
+        if line.strip()
+    ]
+
+
+def steps_encoded(steps):
+    """
+    Проверяет, что все шаги уже токенизированы.
+    """
+    with _step_lock:
+        return all(step in _step_encodings for step in steps)
+
+
+def encode_steps(steps):
+    """
+    Возвращает токены шагов, токенизируя каждый шаг только при первом
+    обращении.
+
+    Аргументы:
+        steps (list): Нормализованные тексты шагов.
+
+    Возвращает:
+        list: Для каждого шага пара (input_ids, offsets) без специальных
+              токенов или None, если токенизатор не возвращает смещения.
+    """
+    encodings = []
+    missing = []
+    with _step_lock:
+        for index, step in enumerate(steps):
+            encoding = _step_encodings.get(step, _MISSING)
+            if encoding is _MISSING:
+                missing.append(index)
+            else:
+                _step_encodings.move_to_end(step)
+            encodings.append(encoding)
+    if not missing:
+        return encodings
+
+    tokenizer = qa_pipeline.get().tokenizer
+    for index in missing:
+        encoding = None
+        if tokenizer.is_fast:
+            result = tokenizer(
+                steps[index], add_special_tokens=False,
+                return_offsets_mapping=True,
+            )
+            encoding = (result["input_ids"], result["offset_mapping"])
+        encodings[index] = encoding
+    with _step_lock:
+        for index in missing:
+            _step_encodings[steps[index]] = encodings[index]
+        while len(_step_encodings) > MAX_CACHED_STEPS:
+            _step_encodings.popitem(last=False)
+    return encodings
+
+
+def _encode_recipe_steps():
+    encode_steps(recipe_store.get().all_steps())
+    return True
+
+
+# Токены всех шагов хранилища рецептов вычисляются один раз после
+# загрузки хранилища и модели (в фоне, вместе с остальными моделями)
+recipe_step_tokens = LazyResource("recipe step tokens", _encode_recipe_steps)
+
+
+class PreparedContext:
+    """
+    Контекст QA: шаги рецепта, объединенные через перевод строки, и их
+    токены.
+
+    Токены контекста - конкатенация заранее вычисленных токенов шагов
+    (encode_steps), смещения сдвигаются на позицию шага в тексте, поэтому
+    новый набор найденных шагов не токенизируется заново. Объект содержит
+    только строки и списки, поэтому передается в пул процессов QA без
+    пересериализации модели.
+
+    Атрибуты:
+        key (str): Хэш текста, ключ кэша ответов.
+        text (str): Шаги через перевод строки (числа записаны цифрами).
+        input_ids (list): Токены контекста без специальных токенов, либо
+                          None, если токенизатор не возвращает смещения.
+        offsets (list): Смещения (начало, конец) токенов в text.
+    """
+
+    def __init__(self, steps, encodings):
+        """
+        Аргументы:
+            steps (list): Нормализованные тексты шагов.
+            encodings (list): Результат encode_steps(steps).
+        """
+        self.text = "\n".join(steps)
+        self.key = hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+        self.input_ids = None
+        self.offsets = None
+
+        if all(encoding is not None for encoding in encodings):
+            self.input_ids = []
+            self.offsets = []
+            position = 0
+            for step, (input_ids, offsets) in zip(steps, encodings):
+                self.input_ids.extend(input_ids)
+                self.offsets.extend(
+                    (start + position, end + position) for start, end in offsets
+                )
+                position += len(step) + 1
+
+
+def normalize_question(question):
+    """
+    Приводит вопрос к ключу кэша: нижний регистр, одиночные пробелы, без
+    знаков препинания по краям.
+    """
+    question = _SPACES.sub(" ", question.lower())
+    return _EDGE_PUNCTUATION.sub("", question)
+
+
+def encode_question(context, question):
+    """
+    Собирает вход модели из токенов вопроса и заранее вычисленных токенов
+    контекста.
+
+    Аргументы:
+        context (PreparedContext): Подготовленный контекст.
+        question (str): Вопрос.
+
+    Возвращает:
+        tuple: (input_ids, token_type_ids или None, позиция начала
+               контекста), либо None, если вход нужно обработать обычным
+               pipeline (нет смещений или вход длиннее модели).
+    """
+    tokenizer = qa_pipeline.get().tokenizer
+    if context.input_ids is None:
+        return None
+
+    question_ids = tokenizer(question, add_special_tokens=False)["input_ids"]
+    input_ids = tokenizer.build_inputs_with_special_tokens(
+        question_ids, context.input_ids
+    )
+    if len(input_ids) > tokenizer.model_max_length:
+        return None
+
+    token_type_ids = None
+    if "token_type_ids" in tokenizer.model_input_names:
+        token_type_ids = tokenizer.create_token_type_ids_from_sequences(
+            question_ids, context.input_ids
+        )
+    # Контекст идет после [CLS] вопрос [SEP] и заканчивается перед [SEP]
+    context_start = len(input_ids) - len(context.input_ids) - 1
+    return input_ids, token_type_ids, context_start
+
+
+def best_span(start_logits, end_logits):
+    """
+    Находит лучший отрезок start <= end < start + MAX_ANSWER_TOKENS по
+    сумме логитов (эквивалентно произведению вероятностей).
+
+    Возвращает:
+        tuple: (start, end) - индексы токенов контекста.
+    """
+    import torch
+
+    scores = start_logits[:, None] + end_logits[None, :]
+    positions = torch.arange(scores.shape[0])
+    length = positions[None, :] - positions[:, None]
+    scores = scores.masked_fill(
+        (length < 0) | (length >= MAX_ANSWER_TOKENS), float("-inf")
+    )
+    return divmod(int(torch.argmax(scores)), scores.shape[1])
+
+
+def answer_batch(items):
+    """
+    Отвечает на несколько вопросов одним проходом модели.
+
+    Входы дополняются pad-токенами до общей длины; вопросы, которые нельзя
+    собрать из подготовленного контекста, обрабатываются обычным
+    question-answering pipeline.
+
+    Аргументы:
+        items (list): Пары (PreparedContext, вопрос).
+
+    Возвращает:
+        list: Ответы в порядке items.
+    """
+    import torch
+
+    tokenizer = qa_pipeline.get().tokenizer
+    answers = [None] * len(items)
+    encoded = []
+    for index, (context, question) in enumerate(items):
+        encoding = encode_question(context, question)
+        if encoding is None:
+            answers[index] = qa_pipeline.get()(
+                question=question, context=context.text
+            )["answer"]
+        else:
+            encoded.append((index, encoding))
+    if not encoded:
+        return answers
+
+    width = max(len(input_ids) for _, (input_ids, _, _) in encoded)
+    input_ids = torch.full(
+        (len(encoded), width), tokenizer.pad_token_id, dtype=torch.long
+    )
+    attention_mask = torch.zeros((len(encoded), width), dtype=torch.long)
+    token_type_ids = torch.zeros((len(encoded), width), dtype=torch.long)
+    for row, (_, (ids, types, _)) in enumerate(encoded):
+        input_ids[row, : len(ids)] = torch.tensor(ids)
+        attention_mask[row, : len(ids)] = 1
+        if types is not None:
+            token_type_ids[row, : len(ids)] = torch.tensor(types)
+
+    inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if "token_type_ids" in tokenizer.model_input_names:
+        inputs["token_type_ids"] = token_type_ids
+    with torch.no_grad():
+        output = qa_pipeline.get().model(**inputs)
+
+    for row, (index, (ids, _, context_start)) in enumerate(encoded):
+        context = items[index][0]
+        context_end = len(ids) - 1
+        start, end = best_span(
+            output.start_logits[row, context_start:context_end],
+            output.end_logits[row, context_start:context_end],
+        )
+        answers[index] = context.text[
+            context.offsets[start][0]:context.offsets[end][1]
+        ].strip()
+    return answers
+
+
+def answer_prepared(context, question):
+    """
+    Находит ответ на вопрос в подготовленном контексте.
+
+    Аргументы:
+        context (PreparedContext): Подготовленный контекст.
+        question (str): Вопрос.
+
+    Возвращает:
+        str: Ответ - фрагмент текста контекста.
+    """
+    return answer_batch([(context, question)])[0]
+
+
+class QAService:
+    """
+    Слой ответов на вопросы по рецепту поверх модели QA.
+
+    Контекст - шаги рецепта; каждый шаг нормализуется (числа словами ->
+    цифры) и токенизируется один раз, контекст из найденных шагов
+    собирается конкатенацией их токенов. Ответы хранятся в LRU-кэше, ограниченном размером и временем
+    жизни записей, с ключом (хэш контекста, нормализованный вопрос), поэтому
+    повторные вопросы ("сколько сахара") не запускают модель.
+
+    Кэш используется только из цикла событий, модель вызывается через
+    исполнитель инференса (kind="qa") напрямую или через общий
+    пакетировщик QABatcher.
+
+    Атрибуты:
+        max_entries (int): Максимальное число ответов в кэше.
+        ttl_seconds (float): Время жизни ответа в кэше.
+        hits (int): Число ответов из кэша.
+        misses (int): Число вызовов модели.
+        batcher (QABatcher): Пакетировщик вопросов или None.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=600.0, batcher=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.batcher = batcher
+        self.contexts = OrderedDict()
+        self.answers = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare_context(self, context):
+        """
+        Возвращает подготовленный контекст, создавая его при первом
+        обращении.
+
+        Аргументы:
+            context: Список нормализованных шагов или исходный текст (см.
+                     split_context).
+
+        Возвращает:
+            PreparedContext: Контекст с токенами.
+        """
+        key = self._context_key(context)
+        prepared = self.contexts.get(key)
+        if prepared is None:
+            steps = split_context(context)
+            prepared = self.contexts[key] = PreparedContext(
+                steps, encode_steps(steps)
+            )
+            # Контексты из найденных шагов разнообразны, храним не больше
+            # max_entries последних
+            while len(self.contexts) > self.max_entries:
+                self.contexts.popitem(last=False)
+        return prepared
+
+    @staticmethod
+    def _context_key(context):
+        return context if isinstance(context, str) else tuple(context)
+
+    async def answer(self, context, question):
+        """
+        Отвечает на вопрос по контексту, по возможности из кэша.
+
+        Аргументы:
+            context: Список нормализованных шагов или исходный текст.
+            question (str): Вопрос.
+
+        Возвращает:
+            str: Ответ.
+        """
+        with stage("qa"):
+            return await self._answer(context, question)
+
+    async def _answer(self, context, question):
+        key = self._context_key(context)
+        prepared = self.contexts.get(key)
+        if prepared is not None:
+            self.contexts.move_to_end(key)
+        elif not isinstance(context, str) and steps_encoded(context):
+            # Шаги уже токенизированы: остается конкатенация списков
+            prepared = self.prepare_context(context)
+        else:
+            # Нормализация текста и токенизация новых шагов (первая
+            # загружает токенизатор модели) выполняются вне цикла событий
+            prepared = await get_executor().run(self.prepare_context, context)
+        key = (prepared.key, normalize_question(question))
+
+        cached = self.answers.get(key)
+        if cached is not None:
+            answer, expires_at = cached
+            if expires_at > time.monotonic():
+                self.answers.move_to_end(key)
+                self.hits += 1
+                return answer
+            del self.answers[key]
+
+        self.misses += 1
+        if self.batcher is not None:
+            answer = await self.batcher.submit(prepared, question)
+        else:
+            answer = await get_executor().run(
+                answer_prepared, prepared, question, kind="qa"
+            )
+        self.answers[key] = (answer, time.monotonic() + self.ttl_seconds)
+        self.answers.move_to_end(key)
+        while len(self.answers) > self.max_entries:
+            self.answers.popitem(last=False)
+        return answer
+
+    def stats(self):
+        """
+        Возвращает счетчики кэша ответов.
+        """
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.answers),
+        }
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
+    def clear(self):
+        """
+        Очищает кэш ответов, подготовленных контекстов и токенов шагов
+        (например, после смены модели QA).
+        """
+        self.contexts.clear()
+        self.answers.clear()
+        with _step_lock:
+            _step_encodings.clear()
+
+
+_qa_service = None
+
+
+def configure_qa_service(**kwargs):
+    """
+    Создает общий для процесса сервис QA с заданными параметрами.
+
+    Аргументы:
+        **kwargs: Параметры QAService.
+
+    Возвращает:
+        QAService: Новый сервис.
+    """
+    global _qa_service
+    _qa_service = QAService(**kwargs)
+    return _qa_service
+
+
+def get_qa_service():
+    """
+    Возвращает общий сервис QA, создавая его с параметрами по умолчанию,
+    если он еще не настроен.
+
+    Возвращает:
+        QAService: Сервис процесса.
+    """
+    global _qa_service
+    if _qa_service is None:
+        _qa_service = QAService()
+    return _qa_service
+
+
+REGISTRY.register(CallbackMetric(
+    "voicestream_qa_cache_hits_total",
+    "Questions answered from the QA answer cache",
+    lambda: get_qa_service().hits,
+    metric_type="counter",
+))
+REGISTRY.register(CallbackMetric(
+    "voicestream_qa_cache_misses_total",
+    "Questions answered by running the QA model",
+    lambda: get_qa_service().misses,
+    metric_type="counter",
+))
+REGISTRY.register(CallbackMetric(
+    "voicestream_qa_batch_pending",
+    "Questions waiting for the next QA batch",
+    lambda: (
+        len(get_qa_service().batcher.pending)
+        if get_qa_service().batcher is not None else 0
+    ),
+))
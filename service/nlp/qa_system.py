@@ -1,17 +1,25 @@
-from transformers import pipeline, AutoModelForQuestionAnswering, AutoTokenizer
 import json
+import os
+
+from service.nlp.qa_backends import load_qa_pipeline
+from utils.lazy_resource import LazyResource
+
 # Путь к локальной модели
 model_directory = "./models/mdeberta-v3-base-squad2"
 
-# Инициализация пайплайна с использованием локальной модели
-qa_pipeline = pipeline(
-    task='question-answering',
-    model=AutoModelForQuestionAnswering.from_pretrained(model_directory),
-    tokenizer=AutoTokenizer.from_pretrained(model_directory)
+# Пайплайн с использованием локальной модели создается при первом вопросе;
+# бэкенд и каталог можно переопределить переменными окружения QA_BACKEND и
+# QA_MODEL_DIR
+qa_pipeline = LazyResource(
+    "question-answering pipeline",
+    lambda: load_qa_pipeline(
+        os.environ.get("QA_BACKEND", "torch"),
+        os.environ.get("QA_MODEL_DIR", model_directory),
+    ),
 )
 
 # Функция для получения ответа на вопрос по рецепту
 def get_answer_to_question(context, question):
-    result = qa_pipeline(question=question, context=context)
+    result = qa_pipeline.get()(question=question, context=context)
     raw_answer = result['answer']
     return raw_answer
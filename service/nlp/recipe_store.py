@@ -0,0 +1,309 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from service.nlp.number_extractor import replace_numbers
+from utils.lazy_resource import LazyResource
+
+# Рецепт по умолчанию, если каталог рецептов не задан или пуст
+DEFAULT_RECIPE_ID = "default"
+DEFAULT_RECIPE_TEXT = """
+Возьмите 2 стакана муки, 1 стакан сахара, 1 стакан молока, 2 яйца и 1 чайную ложку разрыхлителя.
+Смешайте муку, сахар и разрыхлитель в большой миске.
+Добавьте молоко и яйца, хорошо перемешайте.
+Вылейте тесто в форму для выпекания.
+Выпекайте при температуре 180 градусов Цельсия в течение 30 минут.
+"""
+
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Длина псевдоосновы слова: грубая замена стемминга для русских словоформ
+# ("сахара", "сахаром" -> "сахар")
+STEM_LENGTH = 5
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Разбивает текст на термины индекса: слова в нижнем регистре, усеченные
+    до STEM_LENGTH символов; числа сохраняются целиком.
+    """
+    return [
+        word if word.isdigit() else word[:STEM_LENGTH]
+        for word in _WORD.findall(text.lower())
+    ]
+
+
+class Recipe:
+    """
+    Рецепт, разбитый на шаги.
+
+    Атрибуты:
+        recipe_id (str): Идентификатор рецепта.
+        title (str): Название.
+        steps (list): Тексты шагов с числами, записанными цифрами.
+    """
+
+    def __init__(self, recipe_id, title, steps):
+        self.recipe_id = recipe_id
+        self.title = title
+        self.steps = [replace_numbers(step.strip()) for step in steps
+                      if step.strip()]
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Загружает рецепт из файла.
+
+        Форматы:
+            .json - {"id": ..., "title": ..., "steps": ["шаг", ...]};
+            .txt  - необязательная первая строка "# Название", далее по
+                    одному шагу на строку.
+
+        Аргументы:
+            path (str): Путь к файлу.
+
+        Возвращает:
+            Recipe: Загруженный рецепт.
+        """
+        recipe_id = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                data = json.load(f)
+                return cls(
+                    data.get("id", recipe_id),
+                    data.get("title", recipe_id),
+                    data["steps"],
+                )
+            lines = f.read().splitlines()
+
+        title = recipe_id
+        if lines and lines[0].startswith("#"):
+            title = lines.pop(0).lstrip("#").strip()
+        return cls(recipe_id, title, lines)
+
+
+class StepIndex:
+    """
+    Лексический индекс BM25 по шагам рецептов.
+    """
+
+    def __init__(self, steps):
+        """
+        Аргументы:
+            steps (list): Пары (рецепт, номер шага).
+        """
+        self.steps = steps
+        self.term_counts = [
+            Counter(tokenize(recipe.steps[number])) for recipe, number in steps
+        ]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        )
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(steps)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def search(self, query, top_k):
+        """
+        Возвращает лучшие по BM25 шаги для запроса.
+
+        Аргументы:
+            query (str): Текст запроса.
+            top_k (int): Число шагов.
+
+        Возвращает:
+            list: Пары (рецепт, номер шага) с положительной оценкой, по
+                  убыванию оценки.
+        """
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        if not terms:
+            return []
+
+        scores = []
+        for index, counts in enumerate(self.term_counts):
+            norm = BM25_K1 * (
+                1 - BM25_B + BM25_B * self.lengths[index] / self.average_length
+            )
+            score = sum(
+                self.idf[term] * counts[term] * (BM25_K1 + 1)
+                / (counts[term] + norm)
+                for term in terms
+                if counts[term]
+            )
+            if score > 0:
+                scores.append((score, index))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [self.steps[index] for _, index in scores[:top_k]]
+
+
+class RecipeStore:
+    """
+    Хранилище рецептов с поиском шагов для QA.
+
+    Вместо всего рецепта модели QA передаются только шаги, наиболее
+    похожие на вопрос (BM25), поэтому длина контекста и задержка ответа не
+    растут с длиной рецептов. Числа в рецептах нормализуются один раз при
+    загрузке.
+
+    Атрибуты:
+        recipes (dict): Идентификатор -> Recipe.
+    """
+
+    def __init__(self, recipes, top_k=2):
+        """
+        Аргументы:
+            recipes (list): Рецепты.
+            top_k (int): Число шагов в контексте QA.
+        """
+        self.recipes = {recipe.recipe_id: recipe for recipe in recipes}
+        self.top_k = top_k
+        self.indexes = {
+            recipe.recipe_id: StepIndex(
+                [(recipe, number) for number in range(len(recipe.steps))]
+            )
+            for recipe in recipes
+        }
+        self.index = StepIndex([
+            (recipe, number)
+            for recipe in recipes
+            for number in range(len(recipe.steps))
+        ])
+
+    @classmethod
+    def from_directory(cls, directory, top_k=2):
+        """
+        Загружает рецепты (*.json, *.txt) из каталога. Если каталог не
+        задан или в нем нет рецептов, хранилище содержит рецепт по
+        умолчанию.
+
+        Аргументы:
+            directory (str): Каталог рецептов или None.
+            top_k (int): Число шагов в контексте QA.
+
+        Возвращает:
+            RecipeStore: Хранилище.
+        """
+        recipes = []
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith((".json", ".txt")):
+                    recipes.append(
+                        Recipe.from_file(os.path.join(directory, name))
+                    )
+        elif directory:
+            logging.warning(f"Каталог рецептов {directory} не найден")
+        if not recipes:
+            recipes.append(Recipe(
+                DEFAULT_RECIPE_ID, DEFAULT_RECIPE_ID,
+                DEFAULT_RECIPE_TEXT.splitlines(),
+            ))
+        return cls(recipes, top_k)
+
+    def get(self, recipe_id):
+        """
+        Возвращает рецепт по идентификатору.
+        """
+        recipe = self.recipes.get(recipe_id)
+        if recipe is None:
+            raise ValueError(f"Неизвестный рецепт: {recipe_id}")
+        return recipe
+
+    def window(self, recipe, current_step=None):
+        """
+        Возвращает top_k подряд идущих шагов рецепта вокруг текущего шага
+        или с начала рецепта.
+
+        Аргументы:
+            recipe (Recipe): Рецепт.
+            current_step (int): Текущий шаг (с нуля) или None.
+
+        Возвращает:
+            list: Тексты шагов.
+        """
+        center = current_step if current_step is not None else 0
+        start = max(0, min(center - (self.top_k - 1) // 2,
+                           len(recipe.steps) - self.top_k))
+        return recipe.steps[start:start + self.top_k]
+
+    def all_steps(self):
+        """
+        Возвращает тексты шагов всех рецептов хранилища.
+        """
+        return [
+            step for recipe in self.recipes.values() for step in recipe.steps
+        ]
+
+    def retrieve(self, question, recipe_id=None, current_step=None):
+        """
+        Собирает контекст QA из шагов, относящихся к вопросу.
+
+        Аргументы:
+            question (str): Вопрос.
+            recipe_id (str): Рецепт сессии; None - поиск по всем рецептам.
+            current_step (int): Текущий шаг сессии (с нуля); добавляется в
+                                контекст выбранного рецепта. Если похожих
+                                шагов нет, контекст - top_k шагов вокруг
+                                него.
+
+        Возвращает:
+            list: Тексты шагов (с числами, записанными цифрами) в порядке
+                  рецепта.
+        """
+        if recipe_id is not None:
+            recipe = self.get(recipe_id)
+            found = self.indexes[recipe_id].search(question, self.top_k)
+            if current_step is not None and 0 <= current_step < len(recipe.steps):
+                found.append((recipe, current_step))
+        else:
+            recipe = next(iter(self.recipes.values()))
+            found = self.index.search(question, self.top_k)
+        if not found:
+            # Вопрос не похож ни на один шаг: контекст - top_k шагов вокруг
+            # текущего (или с начала рецепта), а не весь рецепт
+            return self.window(recipe, current_step)
+
+        # Шаги в исходном порядке, без повторов
+        return [
+            recipe.steps[number]
+            for recipe, number in sorted(
+                set(found), key=lambda item: (item[0].recipe_id, item[1])
+            )
+        ]
+
+
+# Параметры хранилища процесса, задаются configure_recipe_store до первого
+# использования
+_settings = {"directory": None, "top_k": 2}
+
+# Хранилище рецептов процесса; загружается при первом вопросе
+recipe_store = LazyResource(
+    "recipe store",
+    lambda: RecipeStore.from_directory(
+        _settings["directory"], _settings["top_k"]
+    ),
+)
+
+
+def configure_recipe_store(directory, top_k=2):
+    """
+    Задает каталог рецептов и число шагов в контексте QA.
+
+    Аргументы:
+        directory (str): Каталог рецептов.
+        top_k (int): Число шагов в контексте QA.
+    """
+    _settings["directory"] = directory
+    _settings["top_k"] = top_k
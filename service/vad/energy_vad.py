@@ -0,0 +1,205 @@
+import numpy as np
+
+from .vad_interface import VADInterface
+
+
+class EnergyVAD(VADInterface):
+    """
+    Легковесная реализация VADInterface на основе признаков кадров.
+
+    Аудио разбивается на кадры, для которых векторно (NumPy) вычисляются
+    энергия, доля пересечений нуля и спектральная плоскостность. Кадр
+    считается речью, если его энергия выше порога, а спектр не похож на
+    широкополосный шум. Решения сглаживаются удержанием (hangover), после
+    чего соседние речевые кадры объединяются в сегменты.
+
+    Порог энергии - уровень шума сессии плюс noise_margin_db, но не ниже
+    energy_threshold_db. Уровень шума оценивается отдельно для каждого
+    клиента экспоненциальным сглаживанием энергии только тех кадров, которые
+    классифицированы как не-речь, поэтому буфер, целиком занятый речью, не
+    поднимает порог над самой речью. Пока оценки нет (начало сессии, одни
+    речевые кадры), используется абсолютный порог energy_threshold_db.
+
+    В отличие от VoskVAD, здесь не запускается распознаватель речи, поэтому
+    детекция стоит долю процента от стоимости ASR и может использоваться для
+    отсева фрагментов без речи перед распознаванием.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Инициализация конвейера VAD.
+
+        Аргументы:
+            sample_rate (int): Частота дискретизации в Гц.
+            frame_ms (float): Длина кадра в миллисекундах.
+            energy_threshold_db (float): Минимальная энергия речи в dBFS.
+            noise_margin_db (float): Превышение над уровнем шума сессии в
+                                     дБ.
+            noise_adapt_ms (float): Постоянная времени оценки уровня шума
+                                    в миллисекундах кадров не-речи.
+            zcr_threshold (float): Доля пересечений нуля, ниже которой кадр
+                                   похож на вокализованную речь.
+            flatness_threshold (float): Спектральная плоскостность, ниже
+                                        которой спектр считается тональным.
+            hangover_ms (float): Время удержания речи после последнего
+                                 речевого кадра в миллисекундах.
+            min_speech_ms (float): Минимальная длительность сегмента речи.
+        """
+        self.sample_rate = kwargs.get("sample_rate", 16000)
+        self.frame_ms = kwargs.get("frame_ms", 30)
+        self.energy_threshold_db = kwargs.get("energy_threshold_db", -50.0)
+        self.noise_margin_db = kwargs.get("noise_margin_db", 10.0)
+        self.noise_adapt_ms = kwargs.get("noise_adapt_ms", 2000)
+        self.zcr_threshold = kwargs.get("zcr_threshold", 0.25)
+        self.flatness_threshold = kwargs.get("flatness_threshold", 0.5)
+        self.hangover_ms = kwargs.get("hangover_ms", 300)
+        self.min_speech_ms = kwargs.get("min_speech_ms", 90)
+
+        self.frame_length = int(self.sample_rate * self.frame_ms / 1000)
+        self.hangover_frames = int(round(self.hangover_ms / self.frame_ms))
+        self.min_speech_frames = max(
+            1, int(round(self.min_speech_ms / self.frame_ms))
+        )
+        self.window = np.hanning(self.frame_length).astype(np.float32)
+        # Вес одного кадра не-речи в оценке уровня шума
+        self.noise_alpha = min(1.0, self.frame_ms / self.noise_adapt_ms)
+        # Уровни шума сессий в dBFS: client_id -> float
+        self.noise_floors = {}
+
+    async def detect_activity(self, client, audio=None):
+        """
+        Определяет голосовую активность в аудиоданных клиента.
+
+        Аргументы:
+            client (src.Client): Клиент, для которого проводится детекция.
+            audio (bytes): Аудиоданные фрагмента; по умолчанию
+                           client.scratch_buffer.
+
+        Возвращает:
+            List: Список сегментов с голосовой активностью, содержащий
+                  "start", "end" и "confidence".
+        """
+        if audio is None:
+            audio = client.scratch_buffer
+        samples = np.frombuffer(audio, dtype=np.int16)
+        return self.detect_segments(samples, client.client_id)
+
+    def release(self, client):
+        """
+        Забывает уровень шума сессии отключившегося клиента.
+
+        Аргументы:
+            client (src.Client): Клиент.
+        """
+        self.noise_floors.pop(client.client_id, None)
+
+    def detect_segments(self, samples, session_id=None):
+        """
+        Находит сегменты речи в массиве сэмплов int16 и обновляет уровень
+        шума сессии по кадрам без речи.
+
+        Аргументы:
+            samples (np.ndarray): Моно-сэмплы int16.
+            session_id (str): Ключ сессии для уровня шума; None - без
+                              адаптации (только абсолютный порог).
+
+        Возвращает:
+            List: Сегменты {"start", "end", "confidence"} в секундах.
+        """
+        n_frames = len(samples) // self.frame_length
+        if n_frames == 0:
+            return []
+
+        frames = (
+            samples[: n_frames * self.frame_length]
+            .reshape(n_frames, self.frame_length)
+            .astype(np.float32)
+            / 32768.0
+        )
+
+        # Энергия кадра в dBFS
+        energy_db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        # Доля пересечений нуля
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        # Спектральная плоскостность: отношение геометрического среднего
+        # спектра мощности к арифметическому (около 1 для белого шума)
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2 + 1e-10
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(
+            power, axis=1
+        )
+
+        noise_floor_db = self.noise_floors.get(session_id)
+        threshold_db = self.energy_threshold_db
+        if noise_floor_db is not None:
+            threshold_db = max(threshold_db, noise_floor_db + self.noise_margin_db)
+        speech = (energy_db > threshold_db) & (
+            (zcr < self.zcr_threshold) | (flatness < self.flatness_threshold)
+        )
+
+        speech = self._remove_short_runs(speech)
+        smoothed = self._apply_hangover(speech)
+        if session_id is not None:
+            self._update_noise_floor(session_id, energy_db[~smoothed])
+
+        # Границы сегментов по перепадам сглаженной маски
+        edges = np.diff(np.concatenate(([0], smoothed.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        # Уверенность: насколько энергия кадров сегмента превышает порог
+        confidence = 1.0 / (1.0 + np.exp(-(energy_db - threshold_db) / 6.0))
+        frame_seconds = self.frame_length / self.sample_rate
+
+        return [
+            {
+                "start": round(float(start * frame_seconds), 3),
+                "end": round(float(end * frame_seconds), 3),
+                "confidence": round(float(confidence[start:end].mean()), 3),
+            }
+            for start, end in zip(starts, ends)
+        ]
+
+    def _update_noise_floor(self, session_id, noise_db):
+        """
+        Сдвигает уровень шума сессии к средней энергии кадров не-речи с
+        весом, соответствующим их числу.
+        """
+        if len(noise_db) == 0:
+            return
+        level = float(noise_db.mean())
+        floor = self.noise_floors.get(session_id)
+        if floor is None:
+            self.noise_floors[session_id] = level
+            return
+        weight = 1.0 - (1.0 - self.noise_alpha) ** len(noise_db)
+        self.noise_floors[session_id] = floor + weight * (level - floor)
+
+    def _remove_short_runs(self, mask):
+        """
+        Убирает из маски серии речевых кадров короче min_speech_frames.
+        """
+        if self.min_speech_frames <= 1:
+            return mask
+        edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        short = (ends - starts) < self.min_speech_frames
+        if not short.any():
+            return mask
+        # Разметка кадров коротких серий через накопленную сумму перепадов
+        marks = np.zeros(len(mask) + 1, dtype=np.int32)
+        np.add.at(marks, starts[short], 1)
+        np.add.at(marks, ends[short], -1)
+        return mask & (np.cumsum(marks[:-1]) == 0)
+
+    def _apply_hangover(self, mask):
+        """
+        Продлевает каждый речевой кадр на hangover_frames кадров вперед.
+        """
+        if self.hangover_frames <= 0:
+            return mask
+        kernel = np.ones(self.hangover_frames + 1, dtype=np.int32)
+        return np.convolve(mask.astype(np.int32), kernel)[: len(mask)] > 0
@@ -1,3 +1,6 @@
+from service.models.model_registry import get_model_registry
+
+from .energy_vad import EnergyVAD
 from .vosk_vad import VoskVAD
 
 
@@ -12,7 +15,8 @@ class VADFactory:
         Создает конвейер VAD на основе указанного типа.
 
         Аргументы:
-            type (str): Тип конвейера VAD для создания (например, 'pyannote').
+            type (str): Тип конвейера VAD для создания: 'vosk' или
+                        'energy'.
             kwargs: Дополнительные аргументы для создания конвейера VAD.
 
         Возвращает:
@@ -22,8 +26,11 @@ class VADFactory:
             ValueError: Если указанный тип конвейера VAD не поддерживается.
         """
 
-        return VoskVAD(**kwargs)
-        if type == "pyannote":
-            return PyannoteVAD(**kwargs)
+        if type == "vosk":
+            # Модели берутся из общего реестра процесса
+            kwargs.setdefault("model_registry", get_model_registry())
+            return VoskVAD(**kwargs)
+        elif type == "energy":
+            return EnergyVAD(**kwargs)
         else:
             raise ValueError(f"Неизвестный тип конвейера VAD: {type}")
@@ -3,12 +3,14 @@ class VADInterface:
     Интерфейс для систем детекции голосовой активности (VAD).
     """
 
-    async def detect_activity(self, client):
+    async def detect_activity(self, client, audio=None):
         """
         Определяет голосовую активность в переданных аудиоданных.
 
         Аргументы:
             client (src.Client): Клиент, для которого проводится детекция.
+            audio (bytes): Аудиоданные фрагмента; по умолчанию
+                           client.scratch_buffer.
 
         Возвращает:
             List: Результат работы VAD в виде списка объектов, содержащих
@@ -17,3 +19,14 @@ class VADInterface:
         raise NotImplementedError(
             "Этот метод должен быть реализован в подклассах."
         )
+
+    def release(self, client):
+        """
+        Освобождает состояние, закрепленное за сессией клиента.
+
+        Вызывается сервером при отключении клиента. По умолчанию ничего не
+        делает.
+
+        Аргументы:
+            client (src.Client): Клиент.
+        """
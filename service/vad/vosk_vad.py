@@ -1,8 +1,11 @@
 import wave
 import json
 import os
-from vosk import Model as VoskModel, KaldiRecognizer
+from vosk import KaldiRecognizer
 from utils.audio_utils import save_audio_to_file
+from service.executor.inference_executor import get_executor
+from service.models.model_registry import get_model_registry, load_vosk_model
+from utils.lazy_resource import LazyResource
 from .vad_interface import VADInterface
 
 
@@ -17,74 +20,75 @@ class VoskVAD(VADInterface):
 
         Аргументы:
             model_path (str): Путь к директории с моделью Vosk.
+            model_url (str): URL архива модели, скачиваемого, если
+                             директории нет (тот же, что у VoskASR);
+                             None - не скачивать.
+            model_zip (str): Путь для скачиваемого архива.
+            model_registry (ModelRegistry): Реестр общих моделей; по
+                                            умолчанию реестр процесса.
         """
         self.model_path = kwargs.get("model_path", "values/vosk-model-small-ru-0.22")
-
-        if not os.path.exists(self.model_path):
+        self.model_url = kwargs.get(
+            "model_url", "https://alphacephei.com/vosk/models/vosk-model-small-ru-0.22.zip"
+        )
+        self.model_zip = kwargs.get("model_zip", "values/vosk-model-small-ru.zip")
+        self.model_registry = kwargs.get("model_registry") or get_model_registry()
+
+        # Модель загружается при первой детекции (в потоке исполнителя); с
+        # путем по умолчанию это тот же экземпляр, что и у VoskASR
+        self._model = LazyResource(
+            f"Vosk VAD model {self.model_path}", self.load_model
+        )
+
+    def load_model(self):
+        """
+        Получает общую модель Vosk из реестра. VAD вызывается раньше ASR,
+        поэтому модель скачивается тем же загрузчиком, что и у VoskASR,
+        если ее еще нет.
+        """
+        if not self.model_url and not os.path.exists(self.model_path):
             raise FileNotFoundError(
                 f"Модель Vosk не найдена в {self.model_path}. Убедитесь, что модель загружена."
             )
+        return self.model_registry.acquire(
+            self.model_path,
+            lambda path: load_vosk_model(path, self.model_url, self.model_zip),
+        )
 
-        self.model = VoskModel(self.model_path)
+    @property
+    def model(self):
+        """
+        Модель Vosk, загружаемая при первом обращении.
+        """
+        return self._model.get()
 
-    async def detect_activity(self, client):
+    async def detect_activity(self, client, audio=None):
         """
         Определяет голосовую активность в аудиоданных клиента.
 
         Аргументы:
             client (src.Client): Клиент, для которого проводится детекция.
+            audio (bytes): Аудиоданные фрагмента; по умолчанию
+                           client.scratch_buffer.
 
         Возвращает:
             List: Список сегментов с голосовой активностью, содержащий "start", "end" и "confidence".
         """
         audio_file_path = None
-        vad_segments = []
 
         try:
             # Сохранение аудиофайла из клиентского буфера
             audio_file_path = await save_audio_to_file(
-                client.scratch_buffer, client.get_file_name()
+                client.scratch_buffer if audio is None else audio,
+                client.get_file_name(),
+                sample_rate=client.sampling_rate,
             )
 
-            with wave.open(audio_file_path, "rb") as wf:
-                # Проверка формата WAV-файла
-                if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
-                    raise ValueError(
-                        "Аудиофайл должен быть в формате WAV, моно, 16-bit, 16 kHz"
-                    )
-
-                recognizer = KaldiRecognizer(self.model, wf.getframerate())
-                recognizer.SetWords(True)
-                recognizer.SetPartialWords(True)
-
-                # Чтение фреймов и обработка результатов
-                while True:
-                    data = wf.readframes(4000)
-                    if len(data) == 0:
-                        break
-                    if recognizer.AcceptWaveform(data):
-                        result = json.loads(recognizer.Result())
-                        if "result" in result:
-                            vad_segments.extend(
-                                {
-                                    "start": word["start"],
-                                    "end": word["end"],
-                                    "confidence": word.get("conf", 1.0),
-                                }
-                                for word in result["result"]
-                            )
-
-                # Финальный результат (если есть)
-                final_result = json.loads(recognizer.FinalResult())
-                if "result" in final_result:
-                    vad_segments.extend(
-                        {
-                            "start": word["start"],
-                            "end": word["end"],
-                            "confidence": word.get("conf", 1.0),
-                        }
-                        for word in final_result["result"]
-                    )
+            # Распознавание выполняется в пуле потоков, не блокируя цикл
+            # событий
+            vad_segments = await get_executor().run(
+                self.detect_activity_file, audio_file_path
+            )
 
         except wave.Error as e:
             raise RuntimeError(f"Ошибка обработки WAV-файла: {e}")
@@ -98,3 +102,57 @@ class VoskVAD(VADInterface):
                 os.remove(audio_file_path)
 
         return vad_segments
+
+    def detect_activity_file(self, audio_file_path):
+        """
+        Синхронно определяет голосовую активность в WAV-файле.
+
+        Аргументы:
+            audio_file_path (str): Путь к WAV-файлу.
+
+        Возвращает:
+            List: Список сегментов с голосовой активностью.
+        """
+        vad_segments = []
+
+        with wave.open(audio_file_path, "rb") as wf:
+            # Проверка формата WAV-файла
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                raise ValueError(
+                    "Аудиофайл должен быть в формате WAV, моно, 16-bit"
+                )
+
+            recognizer = KaldiRecognizer(self.model, wf.getframerate())
+            recognizer.SetWords(True)
+            recognizer.SetPartialWords(True)
+
+            # Чтение фреймов и обработка результатов
+            while True:
+                data = wf.readframes(4000)
+                if len(data) == 0:
+                    break
+                if recognizer.AcceptWaveform(data):
+                    result = json.loads(recognizer.Result())
+                    if "result" in result:
+                        vad_segments.extend(
+                            {
+                                "start": word["start"],
+                                "end": word["end"],
+                                "confidence": word.get("conf", 1.0),
+                            }
+                            for word in result["result"]
+                        )
+
+            # Финальный результат (если есть)
+            final_result = json.loads(recognizer.FinalResult())
+            if "result" in final_result:
+                vad_segments.extend(
+                    {
+                        "start": word["start"],
+                        "end": word["end"],
+                        "confidence": word.get("conf", 1.0),
+                    }
+                    for word in final_result["result"]
+                )
+
+        return vad_segments
@@ -0,0 +1,178 @@
+import gc
+import logging
+import os
+import select
+import signal
+import time
+
+
+class WorkerSupervisor:
+    """
+    Запускает и контролирует рабочие процессы сервера.
+
+    Модели загружаются в родительском процессе до вызова start(), после чего
+    рабочие процессы создаются через fork() и разделяют страницы памяти с
+    моделями в режиме copy-on-write. Каждый рабочий процесс открывает свой
+    сокет на том же хосте и порту с SO_REUSEPORT, и ядро распределяет
+    входящие соединения между ними.
+
+    Супервизор перезапускает рабочий процесс, если тот завершился или
+    перестал присылать heartbeat (например, заблокирован цикл событий).
+
+    Атрибуты:
+        worker_target: Функция worker_target(index, heartbeat_fd), которая
+                       выполняется в рабочем процессе.
+        workers (int): Число рабочих процессов.
+        heartbeat_timeout (float): Время без heartbeat в секундах, после
+                                   которого процесс считается зависшим.
+        restart_delay (float): Пауза перед перезапуском процесса в секундах.
+    """
+
+    def __init__(self, worker_target, workers, heartbeat_timeout=30.0,
+                 restart_delay=1.0):
+        self.worker_target = worker_target
+        self.workers = workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        # pid -> {"index", "fd", "last_seen", "started", "eof", "killed"}
+        self.processes = {}
+        self.stopping = False
+
+    def start(self):
+        """
+        Создает рабочие процессы и контролирует их до получения SIGTERM или
+        SIGINT.
+        """
+        # Переносим уже созданные объекты в постоянное поколение сборщика
+        # мусора, чтобы его обходы не изменяли страницы, общие с потомками
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            self._supervise()
+        finally:
+            self._stop_workers()
+
+    def _spawn(self, index):
+        """
+        Создает рабочий процесс с указанным номером.
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                self.worker_target(index, write_fd)
+            except BaseException:
+                logging.exception(f"Рабочий процесс {index} завершился с ошибкой")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        now = time.monotonic()
+        self.processes[pid] = {
+            "index": index,
+            "fd": read_fd,
+            "last_seen": now,
+            "started": now,
+            "eof": False,
+            "killed": False,
+        }
+        print(f"Рабочий процесс {index} запущен (pid {pid})")
+
+    def _supervise(self):
+        """
+        Основной цикл: принимает heartbeat, собирает завершенные процессы и
+        перезапускает их.
+        """
+        while not self.stopping:
+            fds = {
+                info["fd"]: pid
+                for pid, info in self.processes.items()
+                if not info["eof"]
+            }
+            try:
+                ready, _, _ = select.select(list(fds), [], [], 1.0)
+            except InterruptedError:
+                ready = []
+
+            now = time.monotonic()
+            for fd in ready:
+                try:
+                    data = os.read(fd, 4096)
+                except BlockingIOError:
+                    continue
+                if data:
+                    self.processes[fds[fd]]["last_seen"] = now
+                else:
+                    # Процесс закрыл канал (завершается), ждем его в _reap
+                    self.processes[fds[fd]]["eof"] = True
+
+            self._reap()
+
+            for pid, info in list(self.processes.items()):
+                if info["killed"]:
+                    continue
+                if now - info["last_seen"] > self.heartbeat_timeout:
+                    logging.error(
+                        f"Рабочий процесс {info['index']} (pid {pid}) не "
+                        f"отвечает, перезапуск"
+                    )
+                    info["killed"] = True
+                    os.kill(pid, signal.SIGKILL)
+
+    def _reap(self):
+        """
+        Собирает завершившиеся рабочие процессы и запускает им замену.
+        """
+        while self.processes:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            info = self.processes.pop(pid, None)
+            if info is None:
+                continue
+            os.close(info["fd"])
+            if self.stopping:
+                continue
+
+            print(
+                f"Рабочий процесс {info['index']} (pid {pid}) завершился "
+                f"с кодом {os.waitstatus_to_exitcode(status)}"
+            )
+            # Процесс, упавший сразу после старта, перезапускаем с паузой,
+            # чтобы не создавать процессы в цикле
+            if time.monotonic() - info["started"] < self.restart_delay * 5:
+                time.sleep(self.restart_delay)
+            self._spawn(info["index"])
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _stop_workers(self):
+        """
+        Отправляет SIGTERM рабочим процессам и дожидается их завершения.
+        """
+        self.stopping = True
+        for pid in list(self.processes):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid, info in list(self.processes.items()):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            os.close(info["fd"])
+        self.processes.clear()
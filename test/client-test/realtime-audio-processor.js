@@ -1,11 +1,42 @@
 class RealtimeAudioProcessor extends AudioWorkletProcessor {
     constructor(options) {
         super();
+        // Render quanta (128 samples) are collected into batches of
+        // batchDurationMs so that the page sends one websocket frame per
+        // batch instead of one per quantum.
+        const batchDurationMs = (options.processorOptions || {}).batchDurationMs || 100;
+        this.batch = new Float32Array(Math.max(128, Math.round(sampleRate * batchDurationMs / 1000)));
+        this.length = 0;
+        this.port.onmessage = (event) => {
+            if (event.data === 'flush') {
+                this.flush();
+            }
+        };
+    }
+
+    flush() {
+        if (this.length > 0) {
+            this.port.postMessage(this.batch.slice(0, this.length));
+            this.length = 0;
+        }
     }
 
     process(inputs, outputs, params) {
         // ASR and VAD models typically require a mono audio.
-        this.port.postMessage(inputs[0][0]);
+        const input = inputs[0][0];
+        if (!input) {
+            return true;
+        }
+        let offset = 0;
+        while (offset < input.length) {
+            const count = Math.min(input.length - offset, this.batch.length - this.length);
+            this.batch.set(input.subarray(offset, offset + count), this.length);
+            this.length += count;
+            offset += count;
+            if (this.length === this.batch.length) {
+                this.flush();
+            }
+        }
         return true;
     }
 }
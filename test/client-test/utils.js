@@ -12,7 +12,9 @@ let globalStream;
 let isRecording = false;
 
 const websocketAddress = document.querySelector('#websocketAddress');
+const websocketToken = document.querySelector('#websocketToken');
 const selectedLanguage = document.querySelector('#languageSelect');
+const selectedEncoding = document.querySelector('#audioEncodingSelect');
 const websocketStatus = document.querySelector('#webSocketStatus');
 const connectButton = document.querySelector("#connectButton");
 const startButton = document.querySelector('#startButton');
@@ -24,8 +26,19 @@ const panel = document.querySelector('#silence_at_end_of_chunk_options_panel');
 const selectedStrategy = document.querySelector('#bufferingStrategySelect');
 const chunk_length_seconds = document.querySelector('#chunk_length_seconds');
 const chunk_offset_seconds = document.querySelector('#chunk_offset_seconds');
+const partial_results = document.querySelector('#partial_results');
+let partialSpan = null;
+let audioEncoding = 'pcm_s16le';
+// IMA-ADPCM encoder state carried between blocks: the step index and a
+// sample left over when a block would end in half a byte
+let adpcmState = {index: 0, pending: null};
+// Sample rates the server accepts in the `sample_rate` config key
+const SUPPORTED_SAMPLE_RATES = [8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000];
 
 websocketAddress.addEventListener("input", resetWebsocketHandler);
+websocketToken.addEventListener("input", resetWebsocketHandler);
+// A token can also be passed in the page URL: index.html?token=...
+websocketToken.value = new URLSearchParams(window.location.search).get('token') || '';
 
 websocketAddress.addEventListener("keydown", (event) => {
     if (event.key === 'Enter') {
@@ -52,7 +65,13 @@ function connectWebsocketHandler() {
         return;
     }
 
-    websocket = new WebSocket(websocketAddress.value);
+    // Browsers cannot set an Authorization header on a WebSocket, so the
+    // JWT goes into the `token` query parameter
+    const url = new URL(websocketAddress.value);
+    if (websocketToken.value) {
+        url.searchParams.set('token', websocketToken.value);
+    }
+    websocket = new WebSocket(url.toString());
     websocket.onopen = () => {
         console.log("WebSocket connection established");
         websocketStatus.textContent = 'Connected';
@@ -69,11 +88,30 @@ function connectWebsocketHandler() {
     websocket.onmessage = event => {
         console.log("Message from server:", event.data);
         const transcript_data = JSON.parse(event.data);
+        if (transcript_data.type === 'partial') {
+            updatePartialTranscription(transcript_data.text);
+            return;
+        }
         updateTranscription(transcript_data);
     };
 }
 
+function updatePartialTranscription(text) {
+    // The partial hypothesis is redrawn in place until the final result
+    if (!partialSpan) {
+        partialSpan = document.createElement('span');
+        partialSpan.className = 'partial';
+        transcriptionDiv.appendChild(partialSpan);
+    }
+    partialSpan.textContent = text;
+}
+
 function updateTranscription(transcript_data) {
+    if (partialSpan) {
+        partialSpan.remove();
+        partialSpan = null;
+    }
+
     if (Array.isArray(transcript_data.words) && transcript_data.words.length > 0) {
         // Append words with color based on their probability
         transcript_data.words.forEach(wordData => {
@@ -123,6 +161,12 @@ function startRecordingHandler() {
     isRecording = true;
 
     context = new AudioContext();
+    if (!SUPPORTED_SAMPLE_RATES.includes(context.sampleRate)) {
+        // The server only resamples from common rates; let the browser
+        // convert anything else
+        context.close();
+        context = new AudioContext({sampleRate: 48000});
+    }
 
     let onSuccess = async (stream) => {
         // Push user config to server
@@ -132,6 +176,7 @@ function startRecordingHandler() {
         globalStream = stream;
         const input = context.createMediaStreamSource(stream);
         const recordingNode = await setupRecordingWorkletNode();
+        processor = recordingNode;
         recordingNode.port.onmessage = (event) => {
             processAudio(event.data);
         };
@@ -159,7 +204,8 @@ async function setupRecordingWorkletNode() {
 
     return new AudioWorkletNode(
         context,
-        'realtime-audio-processor'
+        'realtime-audio-processor',
+        {processorOptions: {batchDurationMs: 100}}
     );
 }
 
@@ -173,6 +219,8 @@ function stopRecordingHandler() {
         globalStream.getTracks().forEach(track => track.stop());
     }
     if (processor) {
+        // Send the audio of the last, incomplete batch
+        processor.port.postMessage('flush');
         processor.disconnect();
         processor = null;
     }
@@ -184,21 +232,26 @@ function stopRecordingHandler() {
 }
 
 function sendAudioConfig(language) {
+    audioEncoding = selectedEncoding.value;
+    adpcmState = {index: 0, pending: null};
     let processingArgs = {};
 
     if (selectedStrategy.value === 'silence_at_end_of_chunk') {
         processingArgs = {
             chunk_length_seconds: parseFloat(chunk_length_seconds.value),
-            chunk_offset_seconds: parseFloat(chunk_offset_seconds.value)
+            chunk_offset_seconds: parseFloat(chunk_offset_seconds.value),
+            partial_results: partial_results.checked
         };
     }
 
     const audioConfig = {
         type: 'config',
         data: {
-            sampleRate: context.sampleRate,
+            sample_rate: context.sampleRate,
             channels: 1,
+            sample_format: 'int16',
             language: language,
+            audio_encoding: audioEncoding,
             processing_strategy: selectedStrategy.value,
             processing_args: processingArgs
         }
@@ -208,55 +261,143 @@ function sendAudioConfig(language) {
 }
 
 function processAudio(sampleData) {
-    // ASR (Automatic Speech Recognition) and VAD (Voice Activity Detection)
-    // models typically require mono audio with a sampling rate of 16 kHz,
-    // represented as a signed int16 array type.
-    //
-    // Implementing changes to the sampling rate using JavaScript can reduce
-    // computational costs on the server.
-    const outputSampleRate = 16000;
-    const decreaseResultBuffer = decreaseSampleRate(sampleData, context.sampleRate, outputSampleRate);
-    const audioData = convertFloat32ToInt16(decreaseResultBuffer);
-
-    if (websocket && websocket.readyState === WebSocket.OPEN) {
+    // The audio is sent at the AudioContext sample rate declared in the
+    // config message; the server mixes it down and resamples it to the
+    // 16 kHz mono int16 the ASR and VAD models expect, with a proper
+    // anti-aliasing filter.
+    const audioData = encodeAudio(new Int16Array(convertFloat32ToInt16(sampleData)));
+
+    if (audioData.byteLength > 0 && websocket && websocket.readyState === WebSocket.OPEN) {
         websocket.send(audioData);
     }
 }
 
-function decreaseSampleRate(buffer, inputSampleRate, outputSampleRate) {
-    if (inputSampleRate < outputSampleRate) {
-        console.error("Sample rate too small.");
-        return;
-    } else if (inputSampleRate === outputSampleRate) {
-        return;
+function convertFloat32ToInt16(buffer) {
+    let l = buffer.length;
+    const buf = new Int16Array(l);
+    while (l--) {
+        buf[l] = Math.max(-1, Math.min(1, buffer[l])) * 0x7FFF;
     }
+    return buf.buffer;
+}
+
+// Compact encodings negotiated through the `audio_encoding` config key:
+// G.711 halves and IMA-ADPCM quarters the upload bandwidth of 16-bit PCM.
+function encodeAudio(samples) {
+    if (audioEncoding === 'mulaw') {
+        return encodeG711(samples, linearToMuLaw);
+    } else if (audioEncoding === 'alaw') {
+        return encodeG711(samples, linearToALaw);
+    } else if (audioEncoding === 'ima_adpcm') {
+        return encodeImaAdpcm(samples);
+    }
+    return samples.buffer;
+}
 
-    let sampleRateRatio = inputSampleRate / outputSampleRate;
-    let newLength = Math.ceil(buffer.length / sampleRateRatio);
-    let result = new Float32Array(newLength);
-    let offsetResult = 0;
-    let offsetBuffer = 0;
-    while (offsetResult < result.length) {
-        let nextOffsetBuffer = Math.round((offsetResult + 1) * sampleRateRatio);
-        let accum = 0, count = 0;
-        for (let i = offsetBuffer; i < nextOffsetBuffer && i < buffer.length; i++) {
-            accum += buffer[i];
-            count++;
+function encodeG711(samples, encodeSample) {
+    const out = new Uint8Array(samples.length);
+    for (let i = 0; i < samples.length; i++) {
+        out[i] = encodeSample(samples[i]);
+    }
+    return out.buffer;
+}
+
+function linearToMuLaw(sample) {
+    const BIAS = 0x84;
+    const sign = sample < 0 ? 0x80 : 0;
+    let magnitude = Math.min(Math.abs(sample), 32635) + BIAS;
+    let exponent = 7;
+    for (let mask = 0x4000; (magnitude & mask) === 0 && exponent > 0; mask >>= 1) {
+        exponent--;
+    }
+    const mantissa = (magnitude >> (exponent + 3)) & 0x0F;
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF;
+}
+
+function linearToALaw(sample) {
+    const sign = sample >= 0 ? 0x80 : 0;
+    let magnitude = Math.min(Math.abs(sample), 32767) >> 3;
+    let code;
+    if (magnitude < 32) {
+        code = magnitude >> 1;
+    } else {
+        let exponent = 1;
+        while (magnitude >= 64 && exponent < 7) {
+            magnitude >>= 1;
+            exponent++;
         }
-        result[offsetResult] = accum / count;
-        offsetResult++;
-        offsetBuffer = nextOffsetBuffer;
+        code = (exponent << 4) | ((magnitude >> 1) & 0x0F);
     }
-    return result;
+    return (sign | code) ^ 0x55;
 }
 
-function convertFloat32ToInt16(buffer) {
-    let l = buffer.length;
-    const buf = new Int16Array(l);
-    while (l--) {
-        buf[l] = Math.min(1, buffer[l]) * 0x7FFF;
+const IMA_STEP_TABLE = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41,
+    45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190,
+    209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724,
+    796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272,
+    2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132,
+    7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+    20350, 22385, 24623, 27086, 29794, 32767
+];
+const IMA_INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8];
+
+// Each websocket frame is a self-contained block: the first sample and
+// step index in a 4-byte header, then the remaining samples as 4-bit codes
+// (low nibble first), so a lost or reordered frame cannot desync the decoder.
+function encodeImaAdpcm(input) {
+    let samples = input;
+    if (adpcmState.pending !== null) {
+        samples = new Int16Array(input.length + 1);
+        samples[0] = adpcmState.pending;
+        samples.set(input, 1);
     }
-    return buf.buffer;
+    // Blocks carry an odd number of samples: the header one plus whole bytes
+    adpcmState.pending = samples.length % 2 === 0 ? samples[samples.length - 1] : null;
+    if (adpcmState.pending !== null) {
+        samples = samples.subarray(0, samples.length - 1);
+    }
+    if (samples.length === 0) {
+        return new ArrayBuffer(0);
+    }
+    const codeCount = samples.length - 1;
+    const block = new Uint8Array(4 + Math.ceil(codeCount / 2));
+    const view = new DataView(block.buffer);
+    let predictor = samples[0];
+    let index = adpcmState.index;
+    view.setInt16(0, predictor, true);
+    block[2] = index;
+
+    for (let i = 0; i < codeCount; i++) {
+        const step = IMA_STEP_TABLE[index];
+        let diff = samples[i + 1] - predictor;
+        let code = 0;
+        if (diff < 0) {
+            code = 8;
+            diff = -diff;
+        }
+        let delta = step >> 3;
+        if (diff >= step) {
+            code |= 4;
+            diff -= step;
+            delta += step;
+        }
+        if (diff >= step >> 1) {
+            code |= 2;
+            diff -= step >> 1;
+            delta += step >> 1;
+        }
+        if (diff >= step >> 2) {
+            code |= 1;
+            delta += step >> 2;
+        }
+        predictor += (code & 8) ? -delta : delta;
+        predictor = Math.max(-32768, Math.min(32767, predictor));
+        index = Math.max(0, Math.min(88, index + IMA_INDEX_TABLE[code & 7]));
+        block[4 + (i >> 1)] |= (i & 1) ? code << 4 : code;
+    }
+    adpcmState.index = index;
+    return block.buffer;
 }
 
 // Initialize WebSocket on page load
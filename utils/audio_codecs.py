@@ -0,0 +1,179 @@
+import struct
+from itertools import accumulate
+
+import numpy as np
+
+PCM_S16LE = "pcm_s16le"
+MULAW = "mulaw"
+ALAW = "alaw"
+IMA_ADPCM = "ima_adpcm"
+
+# Заголовок блока IMA-ADPCM: начальный предиктор (int16), индекс шага
+# (uint8), резервный байт - как в моно-блоке IMA-ADPCM формата WAV
+IMA_ADPCM_HEADER = struct.Struct("<hBx")
+
+IMA_STEP_TABLE = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41,
+    45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190,
+    209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724,
+    796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272,
+    2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132,
+    7845, 8630, 9493, 10442, 11487, 12635, 13899, 15289, 16818, 18500,
+    20350, 22385, 24623, 27086, 29794, 32767,
+], dtype=np.int32)
+IMA_INDEX_DELTAS = [-1, -1, -1, -1, 2, 4, 6, 8] * 2
+# Следующий индекс шага для каждой пары (индекс шага, 4-битный код);
+# вложенный список, так как рекурсия вычисляется поэлементно в Python
+IMA_NEXT_INDEX = [
+    [min(max(index + delta, 0), 88) for delta in IMA_INDEX_DELTAS]
+    for index in range(89)
+]
+
+
+def _build_mulaw_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_alaw_table():
+    codes = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0),
+    )
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+def _build_ima_diff_table():
+    # Приращение предиктора для каждой пары (индекс шага, 4-битный код)
+    step = IMA_STEP_TABLE[:, None]
+    code = np.arange(16, dtype=np.int32)[None, :]
+    diff = (
+        (step >> 3)
+        + np.where(code & 4, step, 0)
+        + np.where(code & 2, step >> 1, 0)
+        + np.where(code & 1, step >> 2, 0)
+    )
+    return np.where(code & 8, -diff, diff)
+
+
+MULAW_TABLE = _build_mulaw_table()
+ALAW_TABLE = _build_alaw_table()
+IMA_DIFF_TABLE = _build_ima_diff_table()
+
+
+def decode_mulaw(data):
+    """
+    Декодирует G.711 mu-law по таблице из 256 значений.
+
+    Аргументы:
+        data (bytes): bytes-подобный объект, один байт на сэмпл.
+
+    Возвращает:
+        numpy.ndarray: Сэмплы int16.
+    """
+    return MULAW_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def decode_alaw(data):
+    """
+    Декодирует G.711 A-law по таблице из 256 значений.
+
+    Аргументы:
+        data (bytes): bytes-подобный объект, один байт на сэмпл.
+
+    Возвращает:
+        numpy.ndarray: Сэмплы int16.
+    """
+    return ALAW_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def _next_index(index, code):
+    return IMA_NEXT_INDEX[index][code]
+
+
+def decode_ima_adpcm(data):
+    """
+    Декодирует один самостоятельный блок IMA-ADPCM.
+
+    Блок начинается с 4-байтного заголовка (начальный предиктор int16 LE,
+    индекс шага, резервный байт), за которым следуют 4-битные коды, младший
+    полубайт первым. Предиктор из заголовка - первый сэмпл результата,
+    поэтому блок из n байт дает 1 + 2 * (n - 4) сэмплов.
+
+    Последовательно вычисляется только рекурсия индекса шага; предиктор -
+    накопленная сумма приращений из таблицы, и поэлементно он ограничивается
+    только если выходит за диапазон int16.
+
+    Аргументы:
+        data (bytes): bytes-подобный объект с блоком.
+
+    Возвращает:
+        numpy.ndarray: Сэмплы int16.
+
+    Исключения:
+        ValueError: Если блок короче заголовка или индекс шага некорректен.
+    """
+    if len(data) < IMA_ADPCM_HEADER.size:
+        raise ValueError("IMA-ADPCM block is shorter than its header")
+    predictor, index = IMA_ADPCM_HEADER.unpack_from(data)
+    if index > 88:
+        raise ValueError(f"Invalid IMA-ADPCM step index: {index}")
+
+    codes = np.frombuffer(data, dtype=np.uint8, offset=IMA_ADPCM_HEADER.size)
+    nibbles = np.empty(codes.size * 2, dtype=np.uint8)
+    nibbles[0::2] = codes & 0x0F
+    nibbles[1::2] = codes >> 4
+
+    indices = np.fromiter(
+        accumulate(nibbles.tolist(), _next_index, initial=index),
+        dtype=np.intp,
+        count=nibbles.size + 1,
+    )[:-1]
+    diffs = IMA_DIFF_TABLE[indices, nibbles]
+
+    samples = np.empty(nibbles.size + 1, dtype=np.int64)
+    samples[0] = predictor
+    np.cumsum(diffs, out=samples[1:])
+    samples[1:] += predictor
+    if samples.size > 1 and (samples.min() < -32768 or samples.max() > 32767):
+        value = predictor
+        clamped = [predictor]
+        for diff in diffs.tolist():
+            value = min(max(value + diff, -32768), 32767)
+            clamped.append(value)
+        samples = np.array(clamped)
+    return samples.astype(np.int16)
+
+
+# Кодирование -> декодер в сэмплы int16; None - сырой PCM int16
+AUDIO_DECODERS = {
+    PCM_S16LE: None,
+    MULAW: decode_mulaw,
+    ALAW: decode_alaw,
+    IMA_ADPCM: decode_ima_adpcm,
+}
+
+
+def get_decoder(encoding):
+    """
+    Возвращает декодер для кодирования входящего аудио.
+
+    Аргументы:
+        encoding (str): Один из ключей AUDIO_DECODERS.
+
+    Возвращает:
+        callable: Функция-декодер или None для сырого PCM int16.
+
+    Исключения:
+        ValueError: Если кодирование неизвестно.
+    """
+    if encoding not in AUDIO_DECODERS:
+        raise ValueError(f"Unknown audio encoding: {encoding}")
+    return AUDIO_DECODERS[encoding]
@@ -3,7 +3,8 @@ import wave
 
 
 async def save_audio_to_file(
-    audio_data, file_name, audio_dir="audio_files", audio_format="wav"
+    audio_data, file_name, audio_dir="audio_files", audio_format="wav",
+    sample_rate=16000,
 ):
     """
     Saves the audio data to a file.
@@ -12,6 +13,7 @@ async def save_audio_to_file(
     :param file_name: The name of the file.
     :param audio_dir: Directory where audio files will be saved.
     :param audio_format: Format of the audio file.
+    :param sample_rate: Sample rate of the mono int16 audio data.
     :return: Path to the saved audio file.
     """
 
@@ -22,7 +24,7 @@ async def save_audio_to_file(
     with wave.open(file_path, "wb") as wav_file:
         wav_file.setnchannels(1)  # Assuming mono audio
         wav_file.setsampwidth(2)
-        wav_file.setframerate(16000)
+        wav_file.setframerate(sample_rate)
         wav_file.writeframes(audio_data)
 
     return file_path
@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+
+# Все LazyResource, созданные в процессе, в порядке создания
+_registry = []
+
+
+class LazyResource:
+    """
+    Тяжелый ресурс (модель, конвейер), создаваемый при первом обращении.
+
+    get() потокобезопасен: загрузчик выполняется ровно один раз, даже если
+    ресурс одновременно запрашивают несколько потоков инференса, а
+    последующие вызовы возвращают готовый объект без блокировки.
+
+    Атрибуты:
+        name (str): Понятное имя ресурса для отчета о запуске.
+        loader (callable): Функция без аргументов, создающая ресурс.
+        load_seconds (float): Время загрузки в секундах или None, если
+                              ресурс не загружен.
+    """
+
+    def __init__(self, name, loader):
+        """
+        Аргументы:
+            name (str): Понятное имя ресурса для отчета о запуске.
+            loader (callable): Функция без аргументов, создающая ресурс.
+        """
+        self.name = name
+        self.loader = loader
+        self.load_seconds = None
+        self._value = None
+        self._loaded = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    @property
+    def loaded(self):
+        """
+        Возвращает:
+            bool: True, если ресурс уже создан.
+        """
+        return self._loaded
+
+    def get(self):
+        """
+        Возвращает ресурс, создавая его при первом вызове.
+
+        Возвращает:
+            Загруженный ресурс.
+        """
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                self._value = self.loader()
+                self.load_seconds = time.perf_counter() - started
+                self._loaded = True
+                logging.info(
+                    f"Loaded {self.name} in {self.load_seconds:.2f} s"
+                )
+        return self._value
+
+    def reset(self):
+        """
+        Сбрасывает загруженный ресурс; следующий get() снова вызовет
+        загрузчик.
+        """
+        with self._lock:
+            self._value = None
+            self._loaded = False
+            self.load_seconds = None
+
+    def preload(self, pool):
+        """
+        Запускает фоновую загрузку ресурса, если он еще не загружен и не
+        загружается.
+
+        Аргументы:
+            pool (concurrent.futures.Executor): Исполнитель, в котором
+                                                выполняется загрузчик.
+        """
+        if self._loaded or self._scheduled:
+            return
+        self._scheduled = True
+        pool.submit(self._preload)
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception as e:
+            logging.error(f"Failed to load {self.name}: {e}")
+        finally:
+            self._scheduled = False
+
+
+def preload_all():
+    """
+    Загружает все зарегистрированные ресурсы, например перед созданием
+    рабочих процессов, чтобы они разделяли модели через copy-on-write.
+    """
+    for resource in list(_registry):
+        resource.get()
+
+
+def resource_report():
+    """
+    Возвращает:
+        list: Пары (имя, время загрузки в секундах или None, если ресурс не
+              загружен) для всех зарегистрированных ресурсов.
+    """
+    return [(resource.name, resource.load_seconds) for resource in _registry]
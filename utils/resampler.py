@@ -0,0 +1,242 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+INT16 = "int16"
+FLOAT32 = "float32"
+SAMPLE_FORMATS = {INT16: np.dtype("<i2"), FLOAT32: np.dtype("<f4")}
+# Частоты клиента, которые принимает AudioFormatConverter. Произвольная
+# частота после сокращения на НОД может дать огромные коэффициенты up/down
+# (200003 Гц -> 16 кГц требует фильтра в сотни МБ), поэтому разрешены только
+# распространенные частоты
+SUPPORTED_SAMPLE_RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100,
+                          48000)
+MAX_CHANNELS = 8
+
+
+@lru_cache(maxsize=32)
+def design_polyphase_filter(up, down, zero_crossings=16, rolloff=0.94,
+                            beta=8.6):
+    """
+    Рассчитывает фильтр нижних частот (sinc с окном Кайзера), разбитый на
+    полифазные ветви.
+
+    Частота среза ниже меньшей из двух частот Найквиста, поэтому один фильтр
+    служит и интерполирующим, и антиалиасинговым. Фильтры кэшируются по
+    аргументам и общие для всех сессий, поэтому возвращаемый массив доступен
+    только для чтения.
+
+    Аргументы:
+        up (int): Коэффициент интерполяции L.
+        down (int): Коэффициент децимации M.
+        zero_crossings (int): Число нулей sinc с каждой стороны от центра
+                              на меньшей из двух частот.
+        rolloff (float): Частота среза как доля меньшей частоты Найквиста.
+        beta (float): Параметр формы окна Кайзера.
+
+    Возвращает:
+        numpy.ndarray: Массив float32 формы (up, taps_per_phase); строка p
+                       содержит коэффициенты фазы p, начиная с самого
+                       нового входного сэмпла.
+    """
+    taps_per_phase = math.ceil(2 * zero_crossings * max(up, down) / up)
+    length = taps_per_phase * up
+    cutoff = rolloff / (2 * max(up, down))
+    t = np.arange(length) - (length - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(length, beta)
+    # Единичное усиление на нулевой частоте для каждой фазы после
+    # интерполяции в up раз
+    h *= up / h.sum()
+    filters = h.reshape(taps_per_phase, up).T.astype(np.float32)
+    filters.flags.writeable = False
+    return filters
+
+
+class PolyphaseResampler:
+    """
+    Потоковый передискретизатор моно-аудио float с рациональным
+    коэффициентом.
+
+    Выходной сэмпл n находится во входной позиции n * down / up и равен
+    скалярному произведению фазы фильтра (n * down) % up на taps_per_phase
+    входных сэмплов, заканчивающихся на (n * down) // up. Каждый вызов
+    одной векторной выборкой вычисляет все выходные сэмплы, которые позволяет
+    доступный вход, и сохраняет последние taps_per_phase - 1 входных сэмплов
+    как историю, поэтому на границах фрагментов нет щелчков, а результат не
+    зависит от того, как разбит поток.
+
+    Атрибуты:
+        up (int): Коэффициент интерполяции.
+        down (int): Коэффициент децимации.
+        filters (numpy.ndarray): Полифазные ветви фильтра.
+        taps (int): Число коэффициентов в каждой фазе.
+    """
+
+    def __init__(self, input_rate, output_rate, **filter_args):
+        """
+        Аргументы:
+            input_rate (int): Входная частота дискретизации в Гц.
+            output_rate (int): Выходная частота дискретизации в Гц.
+            **filter_args: Дополнительные аргументы
+                           design_polyphase_filter().
+        """
+        divisor = math.gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        self.filters = design_polyphase_filter(
+            self.up, self.down, **filter_args
+        )
+        self.taps = self.filters.shape[1]
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)
+        # Абсолютные индексы входного сэмпла history[0] и следующего
+        # выходного сэмпла
+        self.history_start = -(self.taps - 1)
+        self.next_output = 0
+
+    def process(self, samples):
+        """
+        Передискретизирует следующую часть потока.
+
+        Аргументы:
+            samples (numpy.ndarray): Одномерный массив float.
+
+        Возвращает:
+            numpy.ndarray: Массив float32 выходных сэмплов, которые
+                           завершает эта часть.
+        """
+        buffer = np.concatenate(
+            (self.history, np.asarray(samples, dtype=np.float32))
+        )
+        end = self.history_start + len(buffer)
+        # Выходные сэмплы, самый новый входной сэмпл которых раньше end
+        stop = -(-end * self.up // self.down)
+        outputs = np.arange(self.next_output, stop, dtype=np.int64)
+        if len(outputs) == 0:
+            self.history = buffer[len(buffer) - (self.taps - 1):].copy()
+            self.history_start = end - (self.taps - 1)
+            return np.zeros(0, dtype=np.float32)
+
+        positions = outputs * self.down
+        newest = positions // self.up - self.history_start
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+        # Окна начинаются с самого старого сэмпла, фильтры - с самого нового
+        taps = windows[newest - (self.taps - 1), ::-1]
+        result = np.einsum("nk,nk->n", taps, self.filters[positions % self.up])
+
+        self.next_output = stop
+        self.history = buffer[len(buffer) - (self.taps - 1):].copy()
+        self.history_start = end - (self.taps - 1)
+        return result
+
+
+class AudioFormatConverter:
+    """
+    Преобразует аудиопоток клиента в моно int16 с частотой конвейера.
+
+    Чередующиеся каналы усредняются, сэмплы float32 в [-1, 1] и int16
+    нормализуются, а частота дискретизации меняется PolyphaseResampler
+    сессии. Неполный последний фрейм сообщения сохраняется и дописывается в
+    начало следующего.
+
+    Атрибуты:
+        sample_rate (int): Частота дискретизации клиента в Гц.
+        output_rate (int): Частота дискретизации конвейера в Гц.
+        channels (int): Число чередующихся каналов.
+        sample_format (str): Формат сэмплов, "int16" или "float32".
+        resampler (PolyphaseResampler): Передискретизатор или None, если
+                                        частоты совпадают.
+    """
+
+    def __init__(self, sample_rate, output_rate, channels=1,
+                 sample_format=INT16):
+        """
+        Аргументы:
+            sample_rate (int): Частота дискретизации клиента в Гц, одна из
+                               SUPPORTED_SAMPLE_RATES или output_rate.
+            output_rate (int): Частота дискретизации конвейера в Гц.
+            channels (int): Число чередующихся каналов, не больше
+                            MAX_CHANNELS.
+            sample_format (str): "int16" или "float32" (little-endian).
+
+        Исключения:
+            ValueError: Если формат, частота или число каналов не
+                        поддерживаются.
+        """
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unknown sample format: {sample_format}")
+        supported = SUPPORTED_SAMPLE_RATES + (int(output_rate),)
+        if int(sample_rate) != sample_rate or int(sample_rate) not in supported:
+            raise ValueError(
+                f"Unsupported sample rate: {sample_rate} Hz (supported: "
+                f"{', '.join(map(str, SUPPORTED_SAMPLE_RATES))})"
+            )
+        if int(channels) != channels or not 1 <= int(channels) <= MAX_CHANNELS:
+            raise ValueError(
+                f"Unsupported number of channels: {channels} (1 to "
+                f"{MAX_CHANNELS})"
+            )
+        self.sample_rate = int(sample_rate)
+        self.output_rate = int(output_rate)
+        self.channels = int(channels)
+        self.sample_format = sample_format
+        self.dtype = SAMPLE_FORMATS[sample_format]
+        self.frame_bytes = self.dtype.itemsize * self.channels
+        self.resampler = (
+            PolyphaseResampler(self.sample_rate, self.output_rate)
+            if self.sample_rate != self.output_rate
+            else None
+        )
+        self._partial = b""
+
+    @staticmethod
+    def is_needed(sample_rate, output_rate, channels=1, sample_format=INT16):
+        """
+        Проверяет, нужно ли преобразование аудио клиента.
+
+        Аргументы:
+            sample_rate (int): Частота дискретизации клиента в Гц.
+            output_rate (int): Частота дискретизации конвейера в Гц.
+            channels (int): Число каналов.
+            sample_format (str): Формат сэмплов.
+
+        Возвращает:
+            bool: False, если поток уже моно int16 с частотой output_rate.
+        """
+        return not (
+            int(sample_rate) == int(output_rate)
+            and int(channels) == 1
+            and sample_format == INT16
+        )
+
+    def convert(self, audio_data):
+        """
+        Преобразует следующую часть потока.
+
+        Аргументы:
+            audio_data: Байты в заявленном формате или массив int16
+                        чередующихся сэмплов (после декодера).
+
+        Возвращает:
+            numpy.ndarray: Массив int16 моно-сэмплов с частотой конвейера.
+        """
+        if isinstance(audio_data, np.ndarray):
+            samples = audio_data[:len(audio_data) - len(audio_data) % self.channels]
+        else:
+            data = self._partial + bytes(audio_data)
+            usable = len(data) - len(data) % self.frame_bytes
+            self._partial = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=self.dtype)
+
+        if samples.dtype.kind == "f":
+            signal = samples.astype(np.float32)
+        else:
+            signal = samples.astype(np.float32) / 32768.0
+        if self.channels > 1:
+            signal = signal.reshape(-1, self.channels).mean(axis=1)
+
+        if self.resampler is not None:
+            signal = self.resampler.process(signal)
+        return np.clip(np.rint(signal * 32768.0), -32768, 32767).astype(
+            np.int16
+        )
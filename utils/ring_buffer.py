@@ -0,0 +1,266 @@
+import logging
+
+import numpy as np
+
+DROP_OLDEST = "drop_oldest"
+REJECT = "reject"
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер сэмплов int16 фиксированной емкости.
+
+    Память выделяется один раз, поэтому прием аудио только копирует в нее
+    сэмплы. Позиции - абсолютные счетчики сэмплов (только растут); индекс в
+    хранилище равен position % capacity.
+
+    При записи, которая не помещается, действует политика переполнения:
+    "drop_oldest" сдвигает commit_pos (теряется самое старое аудио),
+    "reject" отклоняет всю запись.
+
+    Атрибуты:
+        capacity (int): Емкость буфера в сэмплах.
+        overflow (str): Политика переполнения, "drop_oldest" или "reject".
+        data (numpy.ndarray): Хранилище сэмплов.
+        write_pos (int): Сколько всего сэмплов записано.
+        commit_pos (int): Сэмплы до этой позиции обработаны, их место можно
+                          переиспользовать.
+        dropped_samples (int): Сколько сэмплов потеряно при переполнении.
+    """
+
+    def __init__(self, capacity, overflow=DROP_OLDEST):
+        """
+        Аргументы:
+            capacity (int): Емкость в сэмплах.
+            overflow (str): Политика переполнения, "drop_oldest" или "reject".
+
+        Исключения:
+            ValueError: Если политика переполнения неизвестна.
+        """
+        if overflow not in (DROP_OLDEST, REJECT):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.capacity = int(capacity)
+        self.overflow = overflow
+        self.data = np.zeros(self.capacity, dtype=np.int16)
+        self.write_pos = 0
+        self.commit_pos = 0
+        self.dropped_samples = 0
+        self._odd_byte = b""
+
+    def __len__(self):
+        """
+        Возвращает:
+            int: Число необработанных байт в буфере.
+        """
+        return self.available * self.data.itemsize
+
+    @property
+    def available(self):
+        """
+        Возвращает:
+            int: Число необработанных сэмплов в буфере.
+        """
+        return self.write_pos - self.commit_pos
+
+    @property
+    def free(self):
+        """
+        Возвращает:
+            int: Сколько сэмплов можно записать без переполнения.
+        """
+        return self.capacity - self.available
+
+    def write(self, audio_data):
+        """
+        Добавляет в буфер PCM int16 little-endian.
+
+        Непарный последний байт сохраняется и дописывается в начало
+        следующей записи.
+
+        Аргументы:
+            audio_data (bytes): bytes-подобный объект с PCM.
+
+        Возвращает:
+            int: Число записанных сэмплов.
+        """
+        if self._odd_byte:
+            audio_data = self._odd_byte + bytes(audio_data)
+            self._odd_byte = b""
+        if len(audio_data) % 2:
+            self._odd_byte = bytes(audio_data[-1:])
+            audio_data = audio_data[:-1]
+
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        return self.write_samples(samples)
+
+    def write_samples(self, samples):
+        """
+        Добавляет в буфер сэмплы int16.
+
+        Аргументы:
+            samples (numpy.ndarray): Одномерный массив int16.
+
+        Возвращает:
+            int: Число записанных сэмплов.
+        """
+        count = len(samples)
+        if count == 0:
+            return 0
+
+        if count > self.free:
+            if self.overflow == REJECT:
+                self.dropped_samples += count
+                logging.warning(
+                    f"Audio buffer full, rejected {count} samples"
+                )
+                return 0
+            if count > self.capacity:
+                # Сохранить можно только последние capacity сэмплов
+                skipped = count - self.capacity
+                samples = samples[skipped:]
+                self.write_pos += skipped
+                count = self.capacity
+            overflow = count - self.free
+            if overflow > 0:
+                self.commit_pos += overflow
+                self.dropped_samples += overflow
+
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        if first < count:
+            self.data[:count - first] = samples[first:]
+        self.write_pos += count
+        return count
+
+    def views(self, start=None, end=None):
+        """
+        Возвращает представления NumPy сэмплов между двумя абсолютными
+        позициями.
+
+        Представления используют память буфера и действительны, пока
+        покрытые ими сэмплы не перезаписаны.
+
+        Аргументы:
+            start (int): Начальная позиция; по умолчанию commit_pos.
+            end (int): Конечная позиция; по умолчанию write_pos.
+
+        Возвращает:
+            list: Один или два массива int16.
+        """
+        start = self.commit_pos if start is None else max(start, self.commit_pos)
+        end = self.write_pos if end is None else min(end, self.write_pos)
+        if end <= start:
+            return []
+
+        first = start % self.capacity
+        count = end - start
+        if first + count <= self.capacity:
+            return [self.data[first:first + count]]
+        return [
+            self.data[first:],
+            self.data[:count - (self.capacity - first)],
+        ]
+
+    def commit(self, count=None):
+        """
+        Отмечает сэмплы буфера как обработанные.
+
+        Аргументы:
+            count (int): Число сэмплов; по умолчанию все сэмплы буфера.
+        """
+        if count is None:
+            self.commit_pos = self.write_pos
+        else:
+            self.commit_pos = min(self.write_pos, self.commit_pos + count)
+
+    def drain_into(self, target, count=None):
+        """
+        Дописывает сэмплы буфера в bytearray и отмечает их обработанными.
+
+        Аргументы:
+            target (bytearray): Дополняемый массив.
+            count (int): Число сэмплов; по умолчанию все сэмплы буфера.
+
+        Возвращает:
+            int: Число перенесенных сэмплов.
+        """
+        end = self.write_pos
+        if count is not None:
+            end = min(end, self.commit_pos + count)
+        moved = end - self.commit_pos
+        for view in self.views(self.commit_pos, end):
+            target += memoryview(view)
+        self.commit(moved)
+        return moved
+
+    def clear(self):
+        """
+        Отмечает все сэмплы буфера обработанными.
+        """
+        self.commit()
+
+    def reader(self):
+        """
+        Создает курсор чтения, установленный на самый старый сэмпл буфера.
+
+        Возвращает:
+            RingBufferReader: Курсор чтения.
+        """
+        return RingBufferReader(self)
+
+
+class RingBufferReader:
+    """
+    Курсор чтения AudioRingBuffer.
+
+    Чтение не отмечает данные обработанными; курсор никогда не отстает от
+    commit_pos буфера.
+
+    Атрибуты:
+        ring (AudioRingBuffer): Читаемый буфер.
+        position (int): Абсолютная позиция следующего непрочитанного сэмпла.
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.position = ring.commit_pos
+
+    @property
+    def unread(self):
+        """
+        Возвращает:
+            int: Число сэмплов, записанных после последнего чтения.
+        """
+        return self.ring.write_pos - max(self.position, self.ring.commit_pos)
+
+    def read(self, count=None):
+        """
+        Возвращает представления непрочитанных сэмплов и сдвигает курсор.
+
+        Аргументы:
+            count (int): Наибольшее число сэмплов; по умолчанию все
+                         непрочитанные.
+
+        Возвращает:
+            list: Один или два массива int16.
+        """
+        start = max(self.position, self.ring.commit_pos)
+        end = self.ring.write_pos
+        if count is not None:
+            end = min(end, start + count)
+        self.position = end
+        return self.ring.views(start, end)
+
+    def read_bytes(self, count=None):
+        """
+        Возвращает непрочитанные сэмплы в виде bytes и сдвигает курсор.
+
+        Аргументы:
+            count (int): Наибольшее число сэмплов; по умолчанию все
+                         непрочитанные.
+
+        Возвращает:
+            bytes: PCM int16 little-endian.
+        """
+        return b"".join(view.tobytes() for view in self.read(count))